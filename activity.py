@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+抽卡活跃度统计模块
+
+按用户、按群记录最近几天每天的抽数与★★★数，全服另按小时记录抽数用于观察负载曲线。
+计数保存在固定槽数的环形缓冲中，记录时 O(1) 更新，跨天/跨小时的槽位在访问时才惰性清零，
+不为每条历史记录保存时间戳，每位用户的内存占用与活跃时长无关。
+用户的计数环属于运气追踪器中的用户记录，随用户一起计入内存预算、淘汰与重新载入。
+"""
+import struct
+import time
+from array import array
+from typing import Optional
+
+
+# 按日计数保留的天数（覆盖一个自然周）
+DAY_SLOTS = 7
+# 全服按小时计数保留的小时数
+HOUR_SLOTS = 24 * 7
+
+# 单个用户按日计数环的内存开销估算：对象本身约 64 字节，两个数组各约 64 + 4×槽数 字节，另加字典条目
+USER_RING_BYTES = 64 + 2 * (64 + 4 * DAY_SLOTS) + 100
+
+# 计数环编码的记录头：最新槽对应的时间段序号（-1 表示尚无记录）
+_RING_HEADER = struct.Struct("<q")
+
+
+def local_hour(timestamp: Optional[float] = None) -> int:
+    """
+    计算本地时间的小时序号（自 1970-01-01 00:00 本地时间起的小时数）
+
+    Args:
+        timestamp: Unix 时间戳，None 表示当前时间
+
+    Returns:
+        小时序号，整除 24 即为日序号
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    return (int(timestamp) + time.localtime(timestamp).tm_gmtoff) // 3600
+
+
+def weekday(day: int) -> int:
+    """
+    日序号对应的星期（周一为 0）
+
+    Args:
+        day: 日序号
+
+    Returns:
+        0-6
+    """
+    # 1970-01-01 为周四
+    return (day + 3) % 7
+
+
+class CounterRing:
+    """固定槽数的时间分桶计数环，最新槽之后的槽位在写入时惰性清零"""
+
+    __slots__ = ("latest", "pulls", "sss")
+
+    def __init__(self, slots: int):
+        """
+        初始化计数环
+
+        Args:
+            slots: 槽数（保留的时间段数）
+        """
+        # 最新槽对应的时间段序号，None 表示尚无记录
+        self.latest: Optional[int] = None
+        self.pulls = array("I", [0]) * slots
+        self.sss = array("I", [0]) * slots
+
+    def add(self, index: int, pulls: int, sss: int) -> None:
+        """
+        累加某个时间段的计数
+
+        Args:
+            index: 时间段序号（日序号或小时序号）
+            pulls: 抽数
+            sss: ★★★数
+        """
+        slots = len(self.pulls)
+        if self.latest is None or index - self.latest >= slots:
+            for slot in range(slots):
+                self.pulls[slot] = 0
+                self.sss[slot] = 0
+            self.latest = index
+        elif index > self.latest:
+            for stale in range(self.latest + 1, index + 1):
+                self.pulls[stale % slots] = 0
+                self.sss[stale % slots] = 0
+            self.latest = index
+        elif index <= self.latest - slots:
+            # 早于保留范围（如系统时间回拨），忽略
+            return
+        self.pulls[index % slots] += pulls
+        self.sss[index % slots] += sss
+
+    def get(self, index: int) -> tuple[int, int]:
+        """
+        读取某个时间段的计数
+
+        Args:
+            index: 时间段序号
+
+        Returns:
+            (抽数, ★★★数)，超出保留范围时为 (0, 0)
+        """
+        if self.latest is None or index > self.latest or index <= self.latest - len(self.pulls):
+            return 0, 0
+        return self.pulls[index % len(self.pulls)], self.sss[index % len(self.sss)]
+
+    def is_stale(self, index: int) -> bool:
+        """
+        截至某个时间段，计数是否已全部过期
+
+        Args:
+            index: 当前时间段序号
+
+        Returns:
+            是否已无有效计数
+        """
+        return self.latest is None or index - self.latest >= len(self.pulls)
+
+    def to_bytes(self) -> bytes:
+        """
+        编码为字节串（记录头、抽数数组、★★★数数组），用于溢出存储
+
+        Returns:
+            编码后的字节串
+        """
+        latest = -1 if self.latest is None else self.latest
+        return _RING_HEADER.pack(latest) + self.pulls.tobytes() + self.sss.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CounterRing":
+        """
+        从 to_bytes 的结果还原
+
+        Args:
+            data: 编码后的字节串
+
+        Returns:
+            计数环
+        """
+        (latest,) = _RING_HEADER.unpack_from(data)
+        counts = array("I", data[_RING_HEADER.size:])
+        slots = len(counts) // 2
+        ring = cls(0)
+        ring.latest = None if latest < 0 else latest
+        ring.pulls = counts[:slots]
+        ring.sss = counts[slots:]
+        return ring
+
+
+class ActivityCounters:
+    """按用户、按群的每日计数与全服每小时计数"""
+
+    def __init__(self):
+        self.users: dict[str, CounterRing] = {}
+        self.groups: dict[str, CounterRing] = {}
+        self.hourly = CounterRing(HOUR_SLOTS)
+
+    def record(
+        self,
+        user_id: str,
+        group_id: Optional[str],
+        pulls: int,
+        sss: int,
+        timestamp: Optional[float] = None
+    ) -> None:
+        """
+        记录一次（或一组）抽卡
+
+        Args:
+            user_id: 用户ID
+            group_id: 群ID，私聊时为 None
+            pulls: 抽数
+            sss: 其中的★★★数
+            timestamp: Unix 时间戳，None 表示当前时间
+        """
+        hour = local_hour(timestamp)
+        day = hour // 24
+        self.hourly.add(hour, pulls, sss)
+
+        ring = self.users.get(user_id)
+        if ring is None:
+            ring = self.users[user_id] = CounterRing(DAY_SLOTS)
+        ring.add(day, pulls, sss)
+
+        if group_id:
+            ring = self.groups.get(group_id)
+            if ring is None:
+                ring = self.groups[group_id] = CounterRing(DAY_SLOTS)
+            ring.add(day, pulls, sss)
+
+    @staticmethod
+    def today(timestamp: Optional[float] = None) -> int:
+        """
+        获取本地日期的日序号
+
+        Args:
+            timestamp: Unix 时间戳，None 表示当前时间
+
+        Returns:
+            日序号
+        """
+        return local_hour(timestamp) // 24
+
+    def user_day(self, user_id: str, day: int) -> tuple[int, int]:
+        """
+        获取用户某天的计数
+
+        Args:
+            user_id: 用户ID
+            day: 日序号
+
+        Returns:
+            (抽数, ★★★数)
+        """
+        ring = self.users.get(user_id)
+        return ring.get(day) if ring is not None else (0, 0)
+
+    def group_day(self, group_id: str, day: int) -> tuple[int, int]:
+        """
+        获取群某天的计数
+
+        Args:
+            group_id: 群ID
+            day: 日序号
+
+        Returns:
+            (抽数, ★★★数)
+        """
+        ring = self.groups.get(group_id)
+        return ring.get(day) if ring is not None else (0, 0)
+
+    def hourly_load(self, hours: int = 24, timestamp: Optional[float] = None) -> list[int]:
+        """
+        获取最近若干小时的全服抽数（最早的在前，最后一项为当前小时）
+
+        Args:
+            hours: 小时数，不超过 HOUR_SLOTS
+            timestamp: Unix 时间戳，None 表示当前时间
+
+        Returns:
+            每小时抽数列表
+        """
+        current = local_hour(timestamp)
+        return [self.hourly.get(hour)[0] for hour in range(current - hours + 1, current + 1)]
+
+    def clear_user(self, user_id: str) -> None:
+        """
+        清除用户的计数
+
+        Args:
+            user_id: 用户ID
+        """
+        self.users.pop(user_id, None)
+
+    def pop_user(self, user_id: str) -> Optional[CounterRing]:
+        """
+        取出用户的计数环（用户移出内存时调用）
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            计数环，没有时返回 None
+        """
+        return self.users.pop(user_id, None)
+
+    def restore_user(self, user_id: str, ring: CounterRing) -> None:
+        """
+        放回用户的计数环（用户重新载入时调用）
+
+        Args:
+            user_id: 用户ID
+            ring: 计数环
+        """
+        self.users[user_id] = ring
+
+    def prune(self, timestamp: Optional[float] = None) -> int:
+        """
+        移除计数已全部过期的群（用户的计数随用户记录一起淘汰）
+
+        Args:
+            timestamp: Unix 时间戳，None 表示当前时间
+
+        Returns:
+            移除的数量
+        """
+        day = self.today(timestamp)
+        stale = [group_id for group_id, ring in self.groups.items() if ring.is_stale(day)]
+        for group_id in stale:
+            del self.groups[group_id]
+        return len(stale)
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取负载指标
+
+        Returns:
+            指标字典
+        """
+        load = self.hourly_load(24)
+        today = self.today()
+        peak = max(range(len(load)), key=lambda i: load[i])
+        peak_hour = (local_hour() - len(load) + 1 + peak) % 24
+        top = max(load) or 1
+        return {
+            "近24小时抽数": sum(load),
+            "峰值时段": f"{peak_hour:02d}:00（{load[peak]}抽）" if load[peak] else "-",
+            "每小时曲线": "".join("▁▂▃▄▅▆▇█"[round(count / top * 7)] for count in load),
+            "今日活跃用户": sum(1 for ring in self.users.values() if ring.latest == today),
+            "跟踪用户/群": f"{len(self.users)}/{len(self.groups)}",
+        }
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+单抽图片转码缓存模块
+
+将 images/ 下的人格头像统一转码为尺寸受限的 JPEG，缓存到以内容哈希命名的目录中。
+源文件的修改时间或内容哈希变化时才会重新转码。
+使用图片资源包时，发送所需的原图（未转码或转码后不更小的图片）同样写入缓存目录。
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image as PILImage
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+def file_sha1(path: Path) -> str:
+    """
+    计算文件内容的 SHA1
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SingleImageCache:
+    """单抽图片转码缓存"""
+
+    def __init__(
+        self,
+        images_dir: Path,
+        cache_dir: Path,
+        max_size: int = 256,
+        quality: int = 85,
+        background_color: tuple[int, int, int] = (255, 255, 255),
+        transcode: bool = True,
+        asset_pack=None
+    ):
+        """
+        初始化转码缓存
+
+        Args:
+            images_dir: 原始图片目录
+            cache_dir: 转码结果缓存目录
+            max_size: 转码后图片的最大边长（像素）
+            quality: JPEG 质量
+            background_color: 透明部分的填充颜色 (R, G, B)
+            transcode: 是否转码，关闭时只从资源包中导出原图
+            asset_pack: 图片资源包（AssetPack），None 表示只读取散装文件
+        """
+        self.images_dir = images_dir
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.quality = quality
+        self.background_color = background_color
+        self.transcode = transcode
+        self.asset_pack = asset_pack
+        # 已校验可用的缓存：{image_name: 缓存文件路径}
+        self._ready: dict[str, str] = {}
+        # 单抽实际发送的文件的内容标识：{image_name: 源图哈希[_转码参数]}
+        self._content_keys: dict[str, str] = {}
+
+    def get(self, image_name: str) -> Optional[str]:
+        """
+        获取图片的转码版本
+
+        Args:
+            image_name: identities.py 中的 image 字段
+
+        Returns:
+            缓存文件路径，尚未转码或无需转码时返回 None
+        """
+        return self._ready.get(image_name)
+
+    def get_content_key(self, image_name: str) -> Optional[str]:
+        """
+        获取单抽实际发送的文件（转码版本或原图）的内容标识
+
+        Args:
+            image_name: identities.py 中的 image 字段
+
+        Returns:
+            内容标识，尚未校验时返回 None
+        """
+        return self._content_keys.get(image_name)
+
+    def build(self, image_names: list[str]) -> dict[str, int]:
+        """
+        校验并生成所有图片的转码版本（阻塞操作，应在线程池中执行）
+
+        Args:
+            image_names: 需要转码的图片名称列表
+
+        Returns:
+            统计信息 {"reused": 复用数, "transcoded": 转码数, "skipped": 跳过数, "missing": 缺失数}
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        manifest = self._load_manifest()
+        params = f"{self.max_size}q{self.quality}" if self.transcode else "raw"
+        new_manifest = {}
+        stats = {"reused": 0, "transcoded": 0, "skipped": 0, "missing": 0}
+
+        for image_name in dict.fromkeys(image_names):
+            source = self.images_dir / image_name
+            entry = manifest.get(image_name, {})
+            packed_data = self.asset_pack.get(str(source)) if self.asset_pack is not None else None
+            if packed_data is not None:
+                # 资源包自带内容哈希，无需 stat 与重新计算
+                source_mtime, source_size = None, len(packed_data)
+                source_hash = self.asset_pack.content_hash(str(source))
+            else:
+                try:
+                    source_stat = source.stat()
+                except OSError:
+                    stats["missing"] += 1
+                    continue
+                source_mtime, source_size = source_stat.st_mtime, source_stat.st_size
+                unchanged = (
+                    entry.get("params") == params
+                    and entry.get("mtime") == source_mtime
+                    and entry.get("size") == source_size
+                )
+                source_hash = entry.get("hash") if unchanged else file_sha1(source)
+
+            output = entry.get("output")
+            if (
+                entry.get("params") == params
+                and entry.get("hash") == source_hash
+                and (
+                    (self.cache_dir / output).exists() if output is not None
+                    else packed_data is None
+                )
+            ):
+                stats["reused"] += 1
+            else:
+                output = self._transcode(source, source_hash, params, source_size) if self.transcode else None
+                stats["transcoded" if output else "skipped"] += 1
+                if output is None and packed_data is not None:
+                    # 资源包中的原图没有散装文件可发送，导出一份到缓存目录
+                    output = self._export(packed_data, source, source_hash)
+
+            new_manifest[image_name] = {
+                "mtime": source_mtime,
+                "size": source_size,
+                "hash": source_hash,
+                "params": params,
+                "output": output,
+            }
+
+        self._save_manifest(new_manifest)
+        self._remove_orphans(new_manifest)
+
+        self._ready = {
+            image_name: str(self.cache_dir / entry["output"])
+            for image_name, entry in new_manifest.items()
+            if entry["output"]
+        }
+        self._content_keys = {
+            image_name: f"{entry['hash']}_{entry['params']}" if entry["output"] else entry["hash"]
+            for image_name, entry in new_manifest.items()
+        }
+        return stats
+
+    def _transcode(self, source: Path, source_hash: str, params: str, source_size: int) -> Optional[str]:
+        """
+        转码单张图片
+
+        Args:
+            source: 原始图片路径
+            source_hash: 原始图片内容哈希
+            params: 转码参数标识
+            source_size: 原始文件大小（字节）
+
+        Returns:
+            缓存文件名；转码失败或结果不比原图小时返回 None（直接使用原图）
+        """
+        output = f"{source_hash[:16]}_{params}.jpg"
+        output_path = self.cache_dir / output
+        try:
+            img = self.asset_pack.open_image(str(source)) if self.asset_pack is not None else None
+            if img is None:
+                img = PILImage.open(source)
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+            img.thumbnail((self.max_size, self.max_size), PILImage.Resampling.LANCZOS)
+
+            flat = PILImage.new('RGB', img.size, self.background_color)
+            flat.paste(img, mask=img.split()[3])
+            flat.save(output_path, 'JPEG', quality=self.quality, optimize=True)
+        except (IOError, OSError):
+            return None
+
+        if output_path.stat().st_size >= source_size:
+            output_path.unlink()
+            return None
+        return output
+
+    def _export(self, data: memoryview, source: Path, source_hash: str) -> Optional[str]:
+        """
+        将资源包中的原图写入缓存目录
+
+        Args:
+            data: 原图编码数据
+            source: 原始图片路径（用于确定扩展名）
+            source_hash: 原始图片内容哈希
+
+        Returns:
+            缓存文件名，写入失败时返回 None
+        """
+        output = f"{source_hash[:16]}_raw{source.suffix}"
+        try:
+            with open(self.cache_dir / output, 'wb') as f:
+                f.write(data)
+        except OSError:
+            return None
+        return output
+
+    def _load_manifest(self) -> dict:
+        """读取缓存清单"""
+        try:
+            with open(self.cache_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: dict) -> None:
+        """写入缓存清单"""
+        temp_path = self.cache_dir / (MANIFEST_NAME + ".tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, self.cache_dir / MANIFEST_NAME)
+
+    def _remove_orphans(self, manifest: dict) -> None:
+        """删除清单中不再引用的缓存文件"""
+        referenced = {entry["output"] for entry in manifest.values() if entry["output"]}
+        referenced.add(MANIFEST_NAME)
+        for path in self.cache_dir.iterdir():
+            if path.name not in referenced:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
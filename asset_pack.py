@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+图片资源包模块
+
+将 images/ 下的全部人格图片（原始编码，不重新压缩）打包为单个文件，
+按 identities.py 的 image 字段建立偏移/长度索引，并为每张图片记录内容哈希。
+运行时以只读 mmap 映射资源包，解码直接从映射内存读取，省去逐个文件的打开、stat 与读取；
+资源包不存在或损坏时回退到 images/ 下的散装文件，开发时无需打包。
+
+资源包由 tools/build_asset_pack.py 生成。
+"""
+import hashlib
+import io
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image as PILImage
+
+
+# 文件格式：魔数、格式版本、图片数、索引偏移
+MAGIC = b"LAPK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHIQ")
+# 索引项：数据偏移、长度、SHA1、图片名长度，其后紧跟 UTF-8 图片名
+INDEX_ENTRY = struct.Struct("<QI20sH")
+
+# 默认的资源包文件名（相对插件目录）
+DEFAULT_PACK_NAME = "images.pack"
+
+
+class _ViewReader(io.RawIOBase):
+    """只读文件对象，直接从 memoryview 复制到调用方的缓冲区，不产生整份中间副本"""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+class AssetPack:
+    """只读映射的图片资源包"""
+
+    def __init__(self, path: Path, mapped: mmap.mmap, entries: dict[str, tuple[int, int, str]]):
+        """
+        初始化资源包，应通过 open 创建
+
+        Args:
+            path: 资源包路径
+            mapped: 只读内存映射
+            entries: {图片路径: (偏移, 长度, SHA1)}
+        """
+        self.path = path
+        self._mapped = mapped
+        self._view = memoryview(mapped)
+        self._entries = entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._entries
+
+    @classmethod
+    def open(cls, path: Path, images_dir: Path) -> Optional["AssetPack"]:
+        """
+        映射资源包
+
+        Args:
+            path: 资源包路径
+            images_dir: 本进程的图片目录，条目按其中的完整路径索引，与散装文件的路径一致
+
+        Returns:
+            资源包，文件不存在或损坏时返回 None
+        """
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        entries = cls._read_index(mapped, images_dir)
+        if entries is None:
+            mapped.close()
+            return None
+        return cls(path, mapped, entries)
+
+    @staticmethod
+    def _read_index(mapped: mmap.mmap, images_dir: Path) -> Optional[dict[str, tuple[int, int, str]]]:
+        """校验文件头并读取索引，任何不一致都返回 None"""
+        size = len(mapped)
+        if size < HEADER.size:
+            return None
+        magic, version, count, index_offset = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+
+        entries = {}
+        position = index_offset
+        for _ in range(count):
+            if position + INDEX_ENTRY.size > size:
+                return None
+            offset, length, digest, name_length = INDEX_ENTRY.unpack_from(mapped, position)
+            position += INDEX_ENTRY.size
+            if position + name_length > size or offset + length > index_offset:
+                return None
+            image_name = mapped[position:position + name_length].decode("utf-8")
+            position += name_length
+            entries[str(images_dir / image_name)] = (offset, length, digest.hex())
+        return entries
+
+    def get(self, path: str) -> Optional[memoryview]:
+        """
+        获取图片的原始编码数据（零拷贝）
+
+        Args:
+            path: 图片路径
+
+        Returns:
+            指向映射内存的只读视图，不在资源包中时返回 None
+        """
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        return self._view[offset:offset + length]
+
+    def content_hash(self, path: str) -> Optional[str]:
+        """
+        获取图片的内容哈希
+
+        Args:
+            path: 图片路径
+
+        Returns:
+            SHA1 十六进制字符串，不在资源包中时返回 None
+        """
+        entry = self._entries.get(path)
+        return entry[2] if entry is not None else None
+
+    def open_image(self, path: str) -> Optional[PILImage.Image]:
+        """
+        从资源包打开图片，解码器直接读取映射内存
+
+        Args:
+            path: 图片路径
+
+        Returns:
+            PIL 图片（惰性解码），不在资源包中时返回 None
+
+        Raises:
+            OSError: 图片数据无法识别
+        """
+        data = self.get(path)
+        if data is None:
+            return None
+        return PILImage.open(_ViewReader(data))
+
+    def verify(self) -> list[str]:
+        """
+        逐条校验内容哈希
+
+        Returns:
+            哈希不一致的图片路径列表
+        """
+        return [
+            path for path, (offset, length, digest) in self._entries.items()
+            if hashlib.sha1(self._view[offset:offset + length]).hexdigest() != digest
+        ]
+
+
+def build_pack(images_dir: Path, image_names: list[str], output: Path) -> tuple[int, list[str]]:
+    """
+    将图片打包为资源包，先写入同目录的临时文件再原子替换
+
+    Args:
+        images_dir: 图片目录
+        image_names: 需要打包的图片文件名列表（相对图片目录）
+        output: 资源包路径
+
+    Returns:
+        (打包的图片数, 缺失的图片列表)
+
+    Raises:
+        OSError: 写入资源包失败
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=output.name + ".", suffix=".tmp", dir=output.parent)
+    missing = []
+    index = []
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(bytes(HEADER.size))
+            offset = HEADER.size
+            for image_name in dict.fromkeys(image_names):
+                try:
+                    with open(images_dir / image_name, "rb") as source:
+                        data = source.read()
+                except OSError:
+                    missing.append(image_name)
+                    continue
+                f.write(data)
+                index.append((offset, len(data), hashlib.sha1(data).digest(), image_name.encode("utf-8")))
+                offset += len(data)
+
+            for entry_offset, length, digest, encoded_name in index:
+                f.write(INDEX_ENTRY.pack(entry_offset, length, digest, len(encoded_name)))
+                f.write(encoded_name)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index), offset))
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, output)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return len(index), missing
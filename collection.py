@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+人格图鉴模块
+
+每位用户的收集情况以整数位图保存（第 i 位对应 IDENTITIES 中编号为 i 的人格），
+重复次数保存在紧凑的 array('H') 中；按罪人统计完成度时与预先计算的罪人掩码按位与后数 1 的个数。
+集齐卡池的期望抽数按稀有度分类做优惠券收集问题的动态规划，每个卡池只计算一次。
+"""
+from array import array
+from itertools import product
+from typing import Optional
+
+from .identities import IDENTITIES, SINNERS, get_identity_id
+
+
+def popcount(mask: int) -> int:
+    """
+    统计整数中 1 的个数
+
+    Args:
+        mask: 位图
+
+    Returns:
+        1 的个数
+    """
+    return bin(mask).count("1")
+
+
+def identities_mask(identities: list[dict]) -> int:
+    """
+    将人格列表转换为位图
+
+    Args:
+        identities: 人格列表
+
+    Returns:
+        位图
+    """
+    mask = 0
+    for identity in identities:
+        identity_id = get_identity_id(identity)
+        if identity_id < len(IDENTITIES):
+            mask |= 1 << identity_id
+    return mask
+
+
+# 各罪人的人格掩码
+SINNER_MASKS = {
+    sinner: identities_mask([identity for identity in IDENTITIES if identity["sinner"] == sinner])
+    for sinner in SINNERS
+}
+
+
+# 单个用户收集记录的内存开销估算：位图整数约 48 字节，重复计数数组约 64 + 2×人格数 字节，对象本身约 56 字节
+COLLECTION_BYTES = 48 + 64 + 2 * len(IDENTITIES) + 56
+
+
+class UserCollection:
+    """单个用户的收集记录"""
+
+    __slots__ = ("owned", "dups")
+
+    def __init__(self):
+        self.owned = 0
+        # 各人格的重复获得次数（不含首次），上限 65535
+        self.dups = array("H", bytes(2 * len(IDENTITIES)))
+
+    def add(self, identity_id: int) -> None:
+        """
+        记录获得一个人格
+
+        Args:
+            identity_id: 人格编号
+        """
+        bit = 1 << identity_id
+        if self.owned & bit:
+            if self.dups[identity_id] < 0xFFFF:
+                self.dups[identity_id] += 1
+        else:
+            self.owned |= bit
+
+    def to_bytes(self) -> bytes:
+        """
+        编码为定长字节串（位图在前，重复计数在后），用于溢出存储
+
+        Returns:
+            编码后的字节串
+        """
+        return self.owned.to_bytes((len(IDENTITIES) + 7) // 8, "little") + self.dups.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "UserCollection":
+        """
+        从 to_bytes 的结果还原
+
+        Args:
+            data: 编码后的字节串
+
+        Returns:
+            收集记录
+        """
+        mask_size = (len(IDENTITIES) + 7) // 8
+        collection = cls()
+        collection.owned = int.from_bytes(data[:mask_size], "little")
+        collection.dups = array("H", data[mask_size:])
+        return collection
+
+
+class CollectionBook:
+    """全部用户的图鉴记录"""
+
+    def __init__(self):
+        self.collections: dict[str, UserCollection] = {}
+
+    def __len__(self) -> int:
+        return len(self.collections)
+
+    def record(self, user_id: str, results: list[dict]) -> None:
+        """
+        记录抽卡获得的人格
+
+        Args:
+            user_id: 用户ID
+            results: 抽取结果列表
+        """
+        collection = self.collections.get(user_id)
+        if collection is None:
+            collection = self.collections[user_id] = UserCollection()
+        for result in results:
+            identity_id = get_identity_id(result)
+            if identity_id < len(IDENTITIES):
+                collection.add(identity_id)
+
+    def get(self, user_id: str) -> Optional[UserCollection]:
+        """
+        获取用户的收集记录
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            收集记录，没有抽过卡时返回 None
+        """
+        return self.collections.get(user_id)
+
+    def clear(self, user_id: str) -> None:
+        """
+        清除用户的收集记录
+
+        Args:
+            user_id: 用户ID
+        """
+        self.collections.pop(user_id, None)
+
+    def pop(self, user_id: str) -> Optional[UserCollection]:
+        """
+        取出用户的收集记录（用户移出内存时调用）
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            收集记录，没有时返回 None
+        """
+        return self.collections.pop(user_id, None)
+
+    def restore(self, user_id: str, collection: UserCollection) -> None:
+        """
+        放回用户的收集记录（用户重新载入时调用）
+
+        Args:
+            user_id: 用户ID
+            collection: 收集记录
+        """
+        self.collections[user_id] = collection
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取图鉴指标
+
+        Returns:
+            指标字典
+        """
+        return {
+            "常驻用户": len(self.collections),
+            "估算内存(KB)": round(len(self.collections) * COLLECTION_BYTES / 1024, 1),
+        }
+
+
+class CollectorEstimate:
+    """卡池集齐期望抽数表"""
+
+    def __init__(self, pool: list[dict], rarity_probs: dict[str, float]):
+        """
+        按稀有度分类构建优惠券收集问题的期望表
+
+        同一稀有度内的人格等概率出现，因此只需按"各稀有度还差几个"建立状态：
+        E(s) = (1 + Σ_r a_r·q_r·E(s - e_r)) / Σ_r a_r·q_r，其中 a_r 为该稀有度未收集数，q_r 为单个人格的出现概率。
+
+        Args:
+            pool: 卡池人格列表
+            rarity_probs: 每抽落在各稀有度的概率
+        """
+        by_rarity: dict[str, list[dict]] = {}
+        for identity in pool:
+            by_rarity.setdefault(identity["rarity"], []).append(identity)
+
+        self.rarities = list(by_rarity)
+        self.class_masks = [identities_mask(by_rarity[rarity]) for rarity in self.rarities]
+        self.pool_mask = identities_mask(pool)
+        sizes = [len(by_rarity[rarity]) for rarity in self.rarities]
+        item_probs = [rarity_probs.get(rarity, 0.0) / len(by_rarity[rarity]) for rarity in self.rarities]
+
+        # 行优先的扁平下标步长
+        self._strides = []
+        stride = 1
+        for size in reversed(sizes):
+            self._strides.insert(0, stride)
+            stride *= size + 1
+        self._table = array("d", bytes(8 * stride))
+
+        for state in product(*(range(size + 1) for size in sizes)):
+            index = sum(count * step for count, step in zip(state, self._strides))
+            if index == 0:
+                continue
+            weights = [count * prob for count, prob in zip(state, item_probs)]
+            total = sum(weights)
+            if total <= 0:
+                self._table[index] = float("inf")
+                continue
+            expected = 1.0
+            for weight, step in zip(weights, self._strides):
+                if weight:
+                    expected += weight * self._table[index - step]
+            self._table[index] = expected / total
+
+    def expected_remaining(self, owned: int) -> float:
+        """
+        按用户当前收集情况查询集齐卡池还需的期望抽数
+
+        Args:
+            owned: 用户的收集位图
+
+        Returns:
+            期望抽数，卡池中有无法抽到的人格时为 inf
+        """
+        index = sum(
+            popcount(mask & ~owned) * step
+            for mask, step in zip(self.class_masks, self._strides)
+        )
+        return self._table[index]
+
+    def progress(self, owned: int) -> tuple[int, int]:
+        """
+        用户在该卡池中的收集进度
+
+        Args:
+            owned: 用户的收集位图
+
+        Returns:
+            (已收集数, 卡池人格总数)
+        """
+        return popcount(owned & self.pool_mask), popcount(self.pool_mask)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+重复消息抑制模块
+
+部分适配器在重连或超时后会重复投递同一条消息。这里记录最近处理过的消息标识，
+重复投递的抽卡指令在抽取和渲染之前即被拦截，按配置用原回复的文字部分作答或直接忽略。
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from astrbot.api.event import AstrMessageEvent
+
+
+class EventDeduplicator:
+    """容量受限、带有效期的消息去重器"""
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 120):
+        """
+        初始化去重器
+
+        Args:
+            max_entries: 最多记录的消息数
+            ttl: 消息标识的有效期（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # 已处理的消息：{消息标识: (首次处理时间, 原回复文字)}
+        self._seen: OrderedDict[str, tuple[float, Optional[str]]] = OrderedDict()
+
+        # 指标
+        self.duplicate_count = 0
+        self.replayed_count = 0
+
+    @staticmethod
+    def event_key(event: AstrMessageEvent) -> Optional[str]:
+        """
+        计算消息标识：优先使用平台消息ID，没有时使用发送者、内容与时间戳的哈希
+
+        两者都没有时无法区分重复投递与用户在有效期内再次发送的相同指令，不做去重。
+
+        Args:
+            event: 消息事件
+
+        Returns:
+            消息标识，无法标识时返回 None
+        """
+        message_obj = getattr(event, "message_obj", None)
+        message_id = getattr(message_obj, "message_id", None)
+        platform = event.get_platform_name()
+        if message_id:
+            return f"{platform}:{message_id}"
+
+        timestamp = getattr(message_obj, "timestamp", None)
+        if not timestamp:
+            return None
+
+        raw = "\x1f".join([
+            platform,
+            str(event.get_sender_id()),
+            str(event.get_group_id() or ""),
+            event.message_str or "",
+            str(timestamp),
+        ])
+        return "h:" + hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+    def check(self, key: str) -> tuple[bool, Optional[str]]:
+        """
+        检查消息是否已处理过，首次出现时登记
+
+        Args:
+            key: 消息标识
+
+        Returns:
+            (是否为重复消息, 原回复文字)，原消息尚在处理或未缓存回复时文字为 None
+        """
+        now = time.monotonic()
+        self._expire(now)
+
+        entry = self._seen.get(key)
+        if entry is not None:
+            self.duplicate_count += 1
+            if entry[1] is not None:
+                self.replayed_count += 1
+            return True, entry[1]
+
+        self._seen[key] = (now, None)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return False, None
+
+    def remember_response(self, key: str, text: str) -> None:
+        """
+        缓存原消息回复的文字部分，供重复投递时直接作答
+
+        Args:
+            key: 消息标识
+            text: 回复文字
+        """
+        entry = self._seen.get(key)
+        if entry is not None:
+            self._seen[key] = (entry[0], text)
+
+    def _expire(self, now: float) -> None:
+        """移除过期的消息标识（按登记顺序，遇到未过期的即停止）"""
+        deadline = now - self.ttl
+        while self._seen:
+            key, (seen_at, _) = next(iter(self._seen.items()))
+            if seen_at > deadline:
+                break
+            del self._seen[key]
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取去重指标
+
+        Returns:
+            指标字典
+        """
+        return {
+            "记录消息数": len(self._seen),
+            "拦截重复": self.duplicate_count,
+            "缓存作答": self.replayed_count,
+        }
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+个人抽卡记录导出模块
+
+从全服抽卡日志中流式筛选某位用户的全部抽卡记录，边读边写入 gzip 压缩的 CSV 或 JSON Lines 文件：
+分段文件以只读 mmap 方式按块扫描，每块只把属于该用户的记录解码为行，写出后即丢弃，
+内存占用与历史长度无关。汇总统计在扫描过程中逐条累加，写在文件末尾。
+
+输出大小有上限：每批记录先在压缩流的副本上压缩，写出后会超过上限时回退到副本之前的状态、
+停止写记录（汇总仍覆盖全部历史），并在汇总中注明已截断，文件大小严格不超过上限。
+"""
+import csv
+import io
+import json
+import os
+import time
+import zlib
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖，缺失时退回逐条解析
+    np = None
+
+from .pull_log import PullLog, RECORD, RECORD_SIZE, FLAG_PITY, hash_id
+from .spill_store import CODE_RARITIES
+
+if np is not None:
+    from .pull_log import RECORD_DTYPE
+
+
+# 导出格式
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+FORMAT_SUFFIXES = {
+    FORMAT_CSV: ".csv.gz",
+    FORMAT_JSONL: ".jsonl.gz",
+}
+
+# 每次从映射内存中取出筛选的记录数
+CHUNK_RECORDS = 16384
+# 每批写出的行数
+BATCH_ROWS = 512
+# 为文件末尾的汇总预留的字节数
+SUMMARY_RESERVE = 4096
+
+# 导出的列
+COLUMNS = ("time", "pool", "rarity", "sinner", "identity", "pity")
+
+
+class ExportSummary:
+    """导出过程中逐条累加的汇总统计"""
+
+    def __init__(self):
+        self.total = 0
+        self.exported = 0
+        self.truncated = False
+        self.rarity: dict[str, int] = {}
+        self.pity = 0
+        # {卡池ID: [抽数, ★★★数]}
+        self.pools: dict[int, list[int]] = {}
+        self.first_ts = 0
+        self.last_ts = 0
+        # 最长的连续未出★★★抽数
+        self.longest_drought = 0
+        self._drought = 0
+
+    def add(self, ts: int, pool: int, rarity: str, is_pity: bool) -> None:
+        """
+        累加一条记录
+
+        Args:
+            ts: 时间戳
+            pool: 卡池ID
+            rarity: 稀有度
+            is_pity: 是否保底抽取
+        """
+        self.total += 1
+        self.rarity[rarity] = self.rarity.get(rarity, 0) + 1
+        self.pity += is_pity
+        entry = self.pools.setdefault(pool, [0, 0])
+        entry[0] += 1
+        if not self.first_ts:
+            self.first_ts = ts
+        self.last_ts = ts
+
+        if rarity == "SSS":
+            entry[1] += 1
+            self._drought = 0
+        else:
+            self._drought += 1
+            self.longest_drought = max(self.longest_drought, self._drought)
+
+    def to_dict(self, pool_names: dict[int, str]) -> dict:
+        """
+        转换为可序列化的字典
+
+        Args:
+            pool_names: 卡池ID到名称的映射
+
+        Returns:
+            汇总字典
+        """
+        sss = self.rarity.get("SSS", 0)
+        return {
+            "total": self.total,
+            "exported": self.exported,
+            "truncated": self.truncated,
+            "rarity": dict(self.rarity),
+            "sss_rate": round(sss / self.total, 6) if self.total else 0,
+            "pity": self.pity,
+            "pools": {
+                _pool_name(pid, pool_names): {"total": total, "sss": pool_sss}
+                for pid, (total, pool_sss) in self.pools.items()
+            },
+            "first_time": _format_time(self.first_ts) if self.first_ts else "",
+            "last_time": _format_time(self.last_ts) if self.last_ts else "",
+            "longest_drought": self.longest_drought,
+            "current_drought": self._drought,
+        }
+
+
+def _format_time(ts: int) -> str:
+    """本地时间字符串"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+
+def _pool_name(pid: int, pool_names: dict[int, str]) -> str:
+    """卡池ID对应的名称，已删除的卡池显示ID"""
+    return pool_names.get(pid, f"已删除卡池({pid:08x})")
+
+
+def _iter_user_records(view: memoryview, user_hash: int):
+    """
+    按块筛选映射内存中属于某位用户的记录
+
+    Args:
+        view: 分段文件的内存视图
+        user_hash: 用户哈希
+
+    Yields:
+        每块中该用户的记录列表 [(时间戳, 卡池ID, 人格编号, 标志位, 稀有度编码)]
+    """
+    count = len(view) // RECORD_SIZE
+    for start in range(0, count, CHUNK_RECORDS):
+        chunk = view[start * RECORD_SIZE:min(count, start + CHUNK_RECORDS) * RECORD_SIZE]
+        if np is not None:
+            matched = _select_numpy(chunk, user_hash)
+        else:
+            matched = [
+                (ts, pool, identity, flags, code)
+                for ts, user, _, pool, identity, flags, code in RECORD.iter_unpack(chunk)
+                if user == user_hash
+            ]
+        chunk.release()
+        if matched:
+            yield matched
+
+
+def _select_numpy(chunk: memoryview, user_hash: int) -> list[tuple]:
+    """向量化筛选，只有匹配的记录被转换为 Python 对象；返回前释放对映射内存的引用"""
+    records = np.frombuffer(chunk, dtype=RECORD_DTYPE)
+    selected = records[records["user"] == user_hash]
+    del records
+    return list(zip(
+        selected["ts"].tolist(), selected["pool"].tolist(), selected["identity"].tolist(),
+        selected["flags"].tolist(), selected["rarity"].tolist(),
+    ))
+
+
+class _RowWriter:
+    """按格式把行编码为文本"""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer, lineterminator="\n")
+
+    def header(self) -> str:
+        if self.fmt == FORMAT_CSV:
+            self._csv.writerow(COLUMNS)
+        return self._take()
+
+    def rows(self, rows: list[tuple]) -> str:
+        if self.fmt == FORMAT_CSV:
+            self._csv.writerows(rows)
+        else:
+            for row in rows:
+                self._buffer.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False))
+                self._buffer.write("\n")
+        return self._take()
+
+    def summary(self, summary: dict) -> str:
+        if self.fmt == FORMAT_CSV:
+            # CSV 的汇总以 # 开头，与记录行区分
+            self._buffer.write("\n")
+            for key, value in summary.items():
+                if isinstance(value, dict):
+                    value = json.dumps(value, ensure_ascii=False)
+                self._csv.writerow([f"# {key}", value])
+        else:
+            self._buffer.write(json.dumps({"summary": summary}, ensure_ascii=False))
+            self._buffer.write("\n")
+        return self._take()
+
+    def _take(self) -> str:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
+
+
+def export_user_pulls(
+    log: PullLog,
+    user_id: str,
+    output_path: str,
+    pool_names: dict[int, str],
+    identities: list[dict],
+    fmt: str = FORMAT_CSV,
+    max_bytes: int = 5 * 1024 * 1024
+) -> dict:
+    """
+    导出用户的全部抽卡记录与汇总（阻塞操作，应在线程池中执行）
+
+    Args:
+        log: 抽卡日志（调用前应先 flush）
+        user_id: 用户ID
+        output_path: 输出文件路径
+        pool_names: 卡池ID到名称的映射
+        identities: 人格列表，人格编号即列表下标
+        fmt: 导出格式（csv / jsonl），未知格式按 CSV 处理
+        max_bytes: 输出文件（压缩后）的大小上限
+
+    Returns:
+        汇总字典（ExportSummary.to_dict），另含 "bytes": 输出文件大小
+
+    Raises:
+        OSError: 写入失败
+    """
+    if fmt not in FORMAT_SUFFIXES:
+        fmt = FORMAT_CSV
+    user_hash = hash_id(user_id)
+    summary = ExportSummary()
+    writer = _RowWriter(fmt)
+    with open(output_path, "wb") as raw:
+        output = _CappedOutput(raw, max(0, max_bytes - SUMMARY_RESERVE))
+        output.write(writer.header())
+        batch = []
+        for view in log.iter_segments(None):
+            for matched in _iter_user_records(view, user_hash):
+                for ts, pool, identity_id, flags, code in matched:
+                    rarity = CODE_RARITIES.get(code, "unknown")
+                    is_pity = bool(flags & FLAG_PITY)
+                    summary.add(ts, pool, rarity, is_pity)
+                    if summary.truncated:
+                        continue
+
+                    identity = identities[identity_id] if identity_id < len(identities) else {}
+                    batch.append((
+                        _format_time(ts), _pool_name(pool, pool_names), rarity,
+                        identity.get("sinner", ""), identity.get("name", f"#{identity_id}"),
+                        int(is_pity),
+                    ))
+                    if len(batch) >= BATCH_ROWS:
+                        _flush_batch(output, writer, batch, summary)
+
+        if batch and not summary.truncated:
+            _flush_batch(output, writer, batch, summary)
+
+        result = summary.to_dict(pool_names)
+        output.finish(writer.summary(result))
+
+    result["bytes"] = os.path.getsize(output_path)
+    return result
+
+
+class _CappedOutput:
+    """带大小上限的 gzip 输出流"""
+
+    def __init__(self, raw, limit: int):
+        """
+        初始化输出流
+
+        Args:
+            raw: 以二进制写模式打开的文件
+            limit: 记录部分的大小上限（字节）
+        """
+        self._raw = raw
+        self._limit = limit
+        self._written = 0
+        # wbits=31 直接输出带 gzip 头尾（含 CRC）的流
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def write(self, text: str) -> bool:
+        """
+        压缩并写出文本，写出后会超过上限时不写入
+
+        Returns:
+            是否已写入
+        """
+        # 在压缩流的副本上压缩，超出上限时丢弃副本即可回退
+        compressor = self._compressor.copy()
+        data = compressor.compress(text.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self._written + len(data) > self._limit:
+            return False
+        self._raw.write(data)
+        self._written += len(data)
+        self._compressor = compressor
+        return True
+
+    def finish(self, text: str) -> None:
+        """写出最后的文本并结束压缩流"""
+        self._raw.write(self._compressor.compress(text.encode("utf-8")) + self._compressor.flush())
+
+
+def _flush_batch(output: _CappedOutput, writer: _RowWriter, batch: list[tuple], summary: ExportSummary) -> None:
+    """写出一批行，整批超出大小上限时逐行写出剩余空间能容纳的部分，并标记为已截断"""
+    if output.write(writer.rows(batch)):
+        summary.exported += len(batch)
+    else:
+        for row in batch:
+            if not output.write(writer.rows([row])):
+                break
+            summary.exported += 1
+        summary.truncated = True
+    batch.clear()
+
+
+def export_suffix(fmt: Optional[str]) -> str:
+    """
+    导出格式对应的文件后缀
+
+    Args:
+        fmt: 导出格式
+
+    Returns:
+        文件后缀，未知格式按 CSV 处理
+    """
+    return FORMAT_SUFFIXES.get(fmt, FORMAT_SUFFIXES[FORMAT_CSV])
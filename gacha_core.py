@@ -6,7 +6,99 @@
 可复用于其他抽卡类游戏插件。
 """
 import random
-from typing import Optional
+import secrets
+import time
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Union
+
+from .leaderboard import GroupLeaderboard, BOARD_SSS_RATE, BOARD_DROUGHT
+from .rank_index import BucketRankIndex
+from .counter_rng import uniform_pair
+from .spill_store import SpillStore, encode_user, decode_user, encode_counter_user, decode_counter_user
+from .collection import COLLECTION_BYTES, UserCollection
+from .activity import USER_RING_BYTES, CounterRing
+
+if TYPE_CHECKING:
+    from .activity import ActivityCounters
+    from .collection import CollectionBook
+
+
+# 单个常驻用户的固定内存开销估算（字典条目、历史列表、统计对象等）
+USER_BASE_BYTES = 400
+# 每条历史记录的内存开销估算（列表中的一个指针）
+HISTORY_ENTRY_BYTES = 8
+# 用户参与的每个群的内存开销估算（集合条目，随用户一起淘汰）
+GROUP_MEMBERSHIP_BYTES = 80
+# 用户昵称的内存开销估算：字符串对象约 60 字节，另按每字符 4 字节计
+USER_NAME_BASE_BYTES = 60
+# 排名索引中每个条目的内存开销估算：全服索引为字典条目，群排行为有序列表中的元组加字典条目。
+# 这两部分为全部用户（含已溢出用户）保留，不随淘汰释放，单独统计
+RANK_INDEX_ENTRY_BYTES = 100
+BOARD_ENTRY_BYTES = 170
+
+
+# 全服排名索引的分桶：出率精度 0.01%，未出SSS抽数超过上限的归入最后一桶
+RATE_BUCKET_WIDTH = 0.01
+RATE_BUCKETS = 10001
+DROUGHT_BUCKETS = 2048
+
+
+# 多抽结果的展示顺序
+ORDER_DRAW = "draw"            # 按抽取顺序
+ORDER_RARITY = "rarity"        # 按稀有度从高到低（同稀有度保持抽取顺序）
+ORDER_SSS_FIRST = "sss_first"  # 仅将最高稀有度提前，其余保持抽取顺序
+
+
+class OutcomeCounter:
+    """
+    抽取结果计数：按 (卡池, 是否保底) 分别累计结果的稀有度，另记录落入备用池的次数
+
+    每次抽取只做一两次字典计数，供出率漂移监控做拟合优度检验。
+    """
+    
+    def __init__(self):
+        # {(卡池名称, 是否保底): {稀有度: 次数}}
+        self.counts: dict[tuple[str, bool], dict[str, int]] = {}
+        # {卡池名称: 对应稀有度池为空、改从备用池抽取的次数}
+        self.fallbacks: dict[str, int] = {}
+    
+    def record(self, pool_name: str, is_pity: bool, rarity: str, fallback: bool) -> None:
+        """
+        记录一次抽取结果
+        
+        Args:
+            pool_name: 卡池名称
+            is_pity: 是否按保底概率抽取
+            rarity: 抽到的人格的稀有度
+            fallback: 是否从备用池抽取
+        """
+        bucket = self.counts.get((pool_name, is_pity))
+        if bucket is None:
+            bucket = self.counts[(pool_name, is_pity)] = {}
+        bucket[rarity] = bucket.get(rarity, 0) + 1
+        if fallback:
+            self.fallbacks[pool_name] = self.fallbacks.get(pool_name, 0) + 1
+    
+    def merge(self, other: "OutcomeCounter") -> None:
+        """
+        并入另一个计数器的结果（如被使用的预取结果）
+        
+        Args:
+            other: 另一个计数器
+        """
+        for key, counts in other.counts.items():
+            bucket = self.counts.get(key)
+            if bucket is None:
+                bucket = self.counts[key] = {}
+            for rarity, count in counts.items():
+                bucket[rarity] = bucket.get(rarity, 0) + count
+        for pool_name, count in other.fallbacks.items():
+            self.fallbacks[pool_name] = self.fallbacks.get(pool_name, 0) + count
+    
+    def total(self) -> int:
+        """累计抽取次数"""
+        return sum(sum(bucket.values()) for bucket in self.counts.values())
 
 
 class GachaCore:
@@ -17,7 +109,8 @@ class GachaCore:
         rarity_rates: dict[str, float],
         pity_rates: Optional[dict[str, float]] = None,
         pity_enabled: bool = True,
-        pity_guarantee_rarity: str = "SS"
+        pity_guarantee_rarity: str = "SS",
+        available_rarities: Optional[Iterable[str]] = None
     ):
         """
         初始化抽卡引擎
@@ -27,14 +120,23 @@ class GachaCore:
             pity_rates: 保底时的概率配置，如 {"SSS": 2.98, "SS": 97.02}
             pity_enabled: 是否开启保底机制
             pity_guarantee_rarity: 保底最低稀有度
+            available_rarities: 至少有一个人格的稀有度，None 表示不限制；
+                                其余稀有度不会被抽到，概率按比例分给这些稀有度
         """
         self.rarity_rates = rarity_rates
         self.pity_rates = pity_rates or {}
         self.pity_enabled = pity_enabled
         self.pity_guarantee_rarity = pity_guarantee_rarity
+        self.available_rarities = frozenset(available_rarities) if available_rarities is not None else None
         
         # 按概率从高到低排序稀有度
         self.rarity_order = sorted(rarity_rates.keys(), key=lambda x: rarity_rates[x])
+        
+        # 普通/保底抽取时各稀有度在 [0, 100) 区间上依次占据的份额
+        self._intervals = {use_pity: self._rate_intervals(use_pity) for use_pity in (False, True)}
+        
+        # 抽取结果计数（引擎重建时随之清零）
+        self.outcomes = OutcomeCounter()
     
     def determine_rarity(self, is_pity: bool = False) -> str:
         """
@@ -46,33 +148,174 @@ class GachaCore:
         Returns:
             抽取到的稀有度
         """
-        rand = random.uniform(0, 100)
-        
-        if is_pity and self.pity_enabled and self.pity_rates:
-            # 保底时使用保底概率
-            cumulative = 0
-            for rarity in self.rarity_order:
-                if rarity in self.pity_rates:
-                    cumulative += self.pity_rates[rarity]
-                    if rand < cumulative:
-                        return rarity
-            # 默认返回保底最低稀有度
-            return self.pity_guarantee_rarity
+        return self.rarity_from_uniform(random.uniform(0, 100), is_pity)
+    
+    def rarity_from_uniform(self, rand: float, is_pity: bool = False) -> str:
+        """
+        将 [0, 100) 区间的随机数映射为稀有度
+        
+        Args:
+            rand: 随机数
+            is_pity: 是否为保底抽取
+            
+        Returns:
+            对应的稀有度
+        """
+        intervals = self._intervals[self._is_pity_draw(is_pity)]
+        cumulative = 0.0
+        for rarity, share in intervals:
+            cumulative += share
+            if rand < cumulative:
+                return rarity
+        # 浮点误差落到末尾时返回最后一个区间的稀有度
+        return intervals[-1][0]
+    
+    def _rate_intervals(self, use_pity: bool, drop_unavailable: bool = True) -> list[tuple[str, float]]:
+        """
+        按配置顺序计算各稀有度在 [0, 100) 区间上的份额
+        
+        配置的概率之和不为100时，不足部分落到兜底稀有度（保底时为保底最低稀有度，否则为最常见的稀有度），
+        超出部分被截断。没有人格的稀有度被去掉，其余份额按比例放大到100。
+        
+        Args:
+            use_pity: 是否使用保底概率
+            drop_unavailable: 是否去掉没有人格的稀有度
+            
+        Returns:
+            [(稀有度, 份额)]，同一稀有度可能出现多次
+        """
+        if use_pity:
+            rates = {rarity: self.pity_rates[rarity] for rarity in self.rarity_order if rarity in self.pity_rates}
+            fallback = self.pity_guarantee_rarity
         else:
-            # 普通抽取
-            cumulative = 0
-            for rarity in self.rarity_order:
-                cumulative += self.rarity_rates[rarity]
-                if rand < cumulative:
-                    return rarity
-            # 默认返回最低稀有度
-            return self.rarity_order[-1]
+            rates = {rarity: self.rarity_rates[rarity] for rarity in self.rarity_order}
+            fallback = self.rarity_order[-1] if self.rarity_order else "unknown"
+        
+        intervals = []
+        cumulative = 0.0
+        for rarity, rate in rates.items():
+            share = max(0.0, min(rate, 100 - cumulative))
+            cumulative += share
+            intervals.append((rarity, share))
+        if cumulative < 100:
+            intervals.append((fallback, 100 - cumulative))
+        
+        if drop_unavailable and self.available_rarities is not None:
+            kept = [(rarity, share) for rarity, share in intervals if rarity in self.available_rarities]
+            total = sum(share for _, share in kept)
+            # 全部稀有度都没有人格时保持原样，由 validate_rates 报告
+            if total > 0 and len(kept) < len(intervals):
+                intervals = [(rarity, share * 100 / total) for rarity, share in kept]
+        return intervals
+    
+    def effective_rates(self, is_pity: bool = False) -> dict[str, float]:
+        """
+        计算 determine_rarity 实际产生各稀有度的概率
+        
+        配置的概率之和不为100时，不足部分落到兜底稀有度，超出部分被截断；没有人格的稀有度的概率
+        按比例分给其余稀有度，与抽取逻辑保持一致。
+        
+        Args:
+            is_pity: 是否为保底抽取
+            
+        Returns:
+            {稀有度: 概率}，概率之和为 1
+        """
+        result: dict[str, float] = {}
+        for rarity, share in self._intervals[self._is_pity_draw(is_pity)]:
+            result[rarity] = result.get(rarity, 0.0) + share / 100
+        return result
+    
+    def pool_rates(
+        self,
+        pool: list[dict],
+        is_pity: bool = False,
+        fallback_pool: Optional[list[dict]] = None,
+        counter_mode: bool = False
+    ) -> dict[str, float]:
+        """
+        计算在某个卡池中抽取时结果稀有度的实际概率
+        
+        卡池缺少某个稀有度时，该稀有度的概率按抽取逻辑转移：普通模式从备用池中随机抽取，
+        计数器模式从备用池中抽取同稀有度的人格，备用池也没有时从卡池中随机抽取。
+        
+        Args:
+            pool: 当前卡池
+            is_pity: 是否为保底抽取
+            fallback_pool: 备用池
+            counter_mode: 是否为计数器模式（draw_counter）
+            
+        Returns:
+            {稀有度: 概率}，概率之和为 1
+        """
+        def shares(candidates: list[dict]) -> dict[str, float]:
+            counts = self.count_by_rarity(candidates)
+            return {rarity: count / len(candidates) for rarity, count in counts.items()}
+        
+        pool_shares = shares(pool) if pool else {"unknown": 1.0}
+        fallback_shares = shares(fallback_pool) if fallback_pool else None
+        
+        result: dict[str, float] = {}
+        for rarity, rate in self.effective_rates(is_pity).items():
+            if rarity in pool_shares:
+                spread = {rarity: 1.0}
+            elif counter_mode:
+                spread = {rarity: 1.0} if fallback_shares and rarity in fallback_shares else pool_shares
+            else:
+                spread = fallback_shares or pool_shares
+            for target, share in spread.items():
+                result[target] = result.get(target, 0.0) + rate * share
+        return result
+    
+    def validate_rates(self) -> list[str]:
+        """
+        检查概率配置
+        
+        Returns:
+            问题描述列表，配置无误时为空
+        """
+        problems = []
+        tables = [("rarity_rates", self.rarity_rates)]
+        if self.pity_enabled and self.pity_rates:
+            tables.append(("pity_rates", self.pity_rates))
+        for name, rates in tables:
+            negative = [rarity for rarity, rate in rates.items() if rate < 0]
+            if negative:
+                problems.append(f"{name} 中 {', '.join(negative)} 的概率为负数")
+            total = sum(rates.values())
+            if abs(total - 100) > 1e-6:
+                problems.append(f"{name} 之和为 {total:g}，不等于 100，差额将落到兜底稀有度或被截断")
+        
+        if self.pity_enabled and self.pity_rates:
+            unknown = [rarity for rarity in self.pity_rates if rarity not in self.rarity_rates]
+            if unknown:
+                problems.append(f"pity_rates 中的 {', '.join(unknown)} 不在 rarity_rates 中，将被忽略")
+            if self.pity_guarantee_rarity not in self.rarity_rates:
+                problems.append(f"保底稀有度 {self.pity_guarantee_rarity} 不在 rarity_rates 中")
+        
+        if self.available_rarities is not None:
+            use_pity_options = (False, True) if self.pity_enabled and self.pity_rates else (False,)
+            drawable = {
+                rarity
+                for use_pity in use_pity_options
+                for rarity, share in self._rate_intervals(use_pity, drop_unavailable=False) if share > 0
+            }
+            missing = sorted(drawable - self.available_rarities)
+            if missing:
+                problems.append(f"稀有度 {', '.join(missing)} 没有任何人格，不会被抽到，其概率按比例分给其余稀有度")
+        return problems
+    
+    def _is_pity_draw(self, is_pity: bool) -> bool:
+        """本次抽取是否实际使用保底概率"""
+        return bool(is_pity and self.pity_enabled and self.pity_rates)
     
     def draw_single(
         self,
         pool: list[dict],
         is_pity: bool = False,
-        fallback_pool: Optional[list[dict]] = None
+        fallback_pool: Optional[list[dict]] = None,
+        pool_name: str = "",
+        outcomes: Optional[OutcomeCounter] = None
     ) -> dict:
         """
         执行单次抽取
@@ -81,6 +324,8 @@ class GachaCore:
             pool: 当前卡池（按稀有度分组的人格列表）
             is_pity: 是否为保底抽取
             fallback_pool: 当对应稀有度池为空时的备用池
+            pool_name: 卡池名称，用于结果计数
+            outcomes: 记录结果的计数器，None 表示引擎自身的计数器
             
         Returns:
             抽取到的人格信息字典
@@ -91,21 +336,27 @@ class GachaCore:
         rarity_pool = [item for item in pool if item.get("rarity") == selected_rarity]
         
         if rarity_pool:
-            return random.choice(rarity_pool)
-        
-        # 如果对应稀有度池为空，使用备用池
-        if fallback_pool:
-            return random.choice(fallback_pool)
+            result = random.choice(rarity_pool)
+        elif fallback_pool:
+            # 如果对应稀有度池为空，使用备用池
+            result = random.choice(fallback_pool)
+        else:
+            # 最后兜底，从整个池随机选
+            result = random.choice(pool) if pool else {}
         
-        # 最后兜底，从整个池随机选
-        return random.choice(pool) if pool else {}
+        (self.outcomes if outcomes is None else outcomes).record(
+            pool_name, self._is_pity_draw(is_pity), result.get("rarity", "unknown"), not rarity_pool
+        )
+        return result
     
     def draw_multiple(
         self,
         pool: list[dict],
         count: int = 10,
         pity_position: int = 10,
-        fallback_pool: Optional[list[dict]] = None
+        fallback_pool: Optional[list[dict]] = None,
+        pool_name: str = "",
+        outcomes: Optional[OutcomeCounter] = None
     ) -> list[dict]:
         """
         执行多次抽取（带保底机制）
@@ -115,6 +366,8 @@ class GachaCore:
             count: 抽取次数
             pity_position: 保底触发位置（第几抽触发保底）
             fallback_pool: 备用池
+            pool_name: 卡池名称，用于结果计数
+            outcomes: 记录结果的计数器，None 表示引擎自身的计数器
             
         Returns:
             抽取到的人格信息列表
@@ -123,9 +376,102 @@ class GachaCore:
         for i in range(count):
             # 在指定位置触发保底
             is_pity = self.pity_enabled and ((i + 1) == pity_position)
-            results.append(self.draw_single(pool, is_pity=is_pity, fallback_pool=fallback_pool))
+            results.append(self.draw_single(
+                pool, is_pity=is_pity, fallback_pool=fallback_pool, pool_name=pool_name, outcomes=outcomes
+            ))
         return results
     
+    def is_counter_pity(self, index: int, pity_position: int = 10) -> bool:
+        """
+        计数器模式下第 index 抽（从 0 开始）是否为保底抽取
+        
+        计数器模式按用户的全部抽卡序列计算保底：每连续 pity_position 抽中的最后一抽为保底，
+        单抽也计入序列，因此任意一次十连仍恰好包含一次保底抽取。
+        
+        Args:
+            index: 用户的抽卡序号
+            pity_position: 保底间隔
+            
+        Returns:
+            是否为保底抽取
+        """
+        return self.pity_enabled and index % pity_position == pity_position - 1
+    
+    def rate_signature(self) -> tuple:
+        """
+        决定 rarity_at 结果的全部概率配置，签名相同的两个引擎对任意 (种子, 序号) 给出相同的稀有度
+        
+        Returns:
+            可比较的签名
+        """
+        return (
+            tuple((rarity, self.rarity_rates[rarity]) for rarity in self.rarity_order),
+            tuple(sorted(self.pity_rates.items())),
+            self.pity_enabled,
+            self.pity_guarantee_rarity,
+            tuple(sorted(self.available_rarities)) if self.available_rarities is not None else None,
+        )
+    
+    def rarity_at(self, seed: int, index: int) -> str:
+        """
+        重新生成计数器模式下某次抽卡的稀有度
+        
+        Args:
+            seed: 用户种子
+            index: 抽卡序号
+            
+        Returns:
+            稀有度
+        """
+        rand, _ = uniform_pair(seed, index)
+        return self.rarity_from_uniform(rand * 100, self.is_counter_pity(index))
+    
+    def draw_counter(
+        self,
+        pool: list[dict],
+        seed: int,
+        index: int,
+        fallback_pool: Optional[list[dict]] = None,
+        pool_name: str = "",
+        outcomes: Optional[OutcomeCounter] = None
+    ) -> dict:
+        """
+        计数器模式下执行单次抽取，结果完全由 (种子, 序号) 决定
+        
+        引擎只会抽到 available_rarities 中的稀有度，备用池包含全部人格时结果稀有度总与 rarity_at 一致。
+        
+        Args:
+            pool: 当前卡池
+            seed: 用户种子
+            index: 抽卡序号
+            fallback_pool: 当对应稀有度池为空时的备用池
+            pool_name: 卡池名称，用于结果计数
+            outcomes: 记录结果的计数器，None 表示引擎自身的计数器
+            
+        Returns:
+            抽取到的人格信息字典
+        """
+        rarity_rand, identity_rand = uniform_pair(seed, index)
+        is_pity = self.is_counter_pity(index)
+        selected_rarity = self.rarity_from_uniform(rarity_rand * 100, is_pity)
+        
+        # 备用池同样按稀有度筛选，保证重新生成的稀有度与实际结果一致
+        result = None
+        fallback = False
+        for candidates in (pool, fallback_pool or []):
+            rarity_pool = [item for item in candidates if item.get("rarity") == selected_rarity]
+            if rarity_pool:
+                result = rarity_pool[int(identity_rand * len(rarity_pool))]
+                break
+            fallback = True
+        if result is None:
+            result = pool[int(identity_rand * len(pool))] if pool else {}
+        
+        (self.outcomes if outcomes is None else outcomes).record(
+            pool_name, self._is_pity_draw(is_pity), result.get("rarity", "unknown"), fallback
+        )
+        return result
+    
     @staticmethod
     def count_by_rarity(results: list[dict]) -> dict[str, int]:
         """
@@ -143,6 +489,29 @@ class GachaCore:
             count[rarity] = count.get(rarity, 0) + 1
         return count
     
+    def order_results(self, results: list[dict], order: str = ORDER_DRAW) -> list[dict]:
+        """
+        按指定方式排列抽取结果（用于图片展示）
+        
+        Args:
+            results: 抽取结果列表
+            order: 排列方式，ORDER_DRAW / ORDER_RARITY / ORDER_SSS_FIRST
+            
+        Returns:
+            排列后的结果列表
+        """
+        # rarity_order 按概率从低到高排列，即稀有度从高到低
+        rank = {rarity: idx for idx, rarity in enumerate(self.rarity_order)}
+        if order == ORDER_RARITY:
+            return sorted(results, key=lambda item: rank.get(item.get("rarity"), len(rank)))
+        if order == ORDER_SSS_FIRST and self.rarity_order:
+            top = self.rarity_order[0]
+            return (
+                [item for item in results if item.get("rarity") == top]
+                + [item for item in results if item.get("rarity") != top]
+            )
+        return list(results)
+    
     @staticmethod
     def filter_by_rarity(results: list[dict], rarity: str) -> list[dict]:
         """
@@ -158,47 +527,589 @@ class GachaCore:
         return [item for item in results if item.get("rarity") == rarity]
 
 
+class UserStats:
+    """用户累计抽卡统计"""
+    
+    __slots__ = ("total_pulls", "sss_count", "pulls_since_sss", "pity_since_sss", "recent_pity", "name")
+    
+    def __init__(self):
+        self.total_pulls = 0
+        self.sss_count = 0
+        self.pulls_since_sss = 0
+        # 距离上次SSS的抽数中保底抽取的次数
+        self.pity_since_sss = 0
+        # 最近各抽是否为保底抽取的位图，第0位为最近一抽（由 LuckTracker 截断到 max_history 位）
+        self.recent_pity = 0
+        # 用户昵称（用于排行榜展示）
+        self.name = ""
+    
+    def add(self, rarity: str, is_pity: bool = False) -> None:
+        """
+        累加一次抽卡结果
+        
+        Args:
+            rarity: 抽取到的稀有度
+            is_pity: 是否为保底抽取
+        """
+        self.total_pulls += 1
+        self.recent_pity = (self.recent_pity << 1) | is_pity
+        if rarity == "SSS":
+            self.sss_count += 1
+            self.pulls_since_sss = 0
+            self.pity_since_sss = 0
+        else:
+            self.pulls_since_sss += 1
+            self.pity_since_sss += is_pity
+    
+    def pity_pulls(self, pulls: int) -> int:
+        """
+        最近 pulls 抽中保底抽取的次数
+        
+        Args:
+            pulls: 抽数，超出位图长度的部分不计
+            
+        Returns:
+            保底抽取次数
+        """
+        if pulls <= 0:
+            return 0
+        if pulls == self.pulls_since_sss:
+            return self.pity_since_sss
+        return bin(self.recent_pity & ((1 << pulls) - 1)).count("1")
+
+
+class CounterHistory:
+    """
+    计数器模式下的用户历史：只保存种子与抽数，按需重新生成任意一段稀有度
+    
+    概率配置每变化一次为一个纪元，历史按抽卡时所处的纪元分段记录 (起始序号, 纪元)，
+    重新生成时每一抽都按当时的概率解释，重载配置不会改变已有的历史。
+    """
+    
+    __slots__ = ("seed", "count", "epochs", "_rarity_fns")
+    
+    def __init__(
+        self,
+        seed: int,
+        rarity_fns: list[Callable[[int, int], str]],
+        count: int = 0,
+        epochs: Optional[list[tuple[int, int]]] = None
+    ):
+        """
+        初始化计数器历史
+        
+        Args:
+            seed: 用户种子
+            rarity_fns: 各纪元由 (种子, 序号) 重新生成稀有度的函数（与 LuckTracker 共享，最后一个为当前纪元）
+            count: 已抽次数
+            epochs: 各段的 (起始序号, 纪元)，按起始序号升序
+        """
+        self.seed = seed
+        self.count = count
+        self.epochs = epochs if epochs is not None else []
+        self._rarity_fns = rarity_fns
+    
+    def _rarity(self, index: int) -> str:
+        """重新生成第 index 抽的稀有度"""
+        epochs = self.epochs
+        if len(epochs) == 1:
+            epoch = epochs[0][1]
+        else:
+            epoch = epochs[bisect_right(epochs, (index, len(self._rarity_fns))) - 1][1]
+        return self._rarity_fns[epoch](self.seed, index)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __getitem__(self, key: Union[int, slice]):
+        if isinstance(key, slice):
+            return [self._rarity(index) for index in range(self.count)[key]]
+        return self._rarity(range(self.count)[key])
+    
+    def __iter__(self):
+        for index in range(self.count):
+            yield self._rarity(index)
+    
+    def __reversed__(self):
+        for index in range(self.count - 1, -1, -1):
+            yield self._rarity(index)
+    
+    def append(self, rarity: str) -> None:
+        """
+        记录一次抽卡（稀有度可由序号与纪元重新生成，无需保存）
+        
+        Args:
+            rarity: 抽取到的稀有度
+        """
+        epoch = len(self._rarity_fns) - 1
+        if not self.epochs or self.epochs[-1][1] != epoch:
+            self.epochs.append((self.count, epoch))
+        self.count += 1
+
+
 class LuckTracker:
     """运气追踪器，用于计算非酋/欧皇指数"""
     
-    def __init__(self, max_history: int = 500):
+    def __init__(
+        self,
+        max_history: int = 500,
+        min_pulls_for_rate: int = 50,
+        memory_budget: int = 0,
+        idle_ttl: float = 0,
+        spill_store: Optional[SpillStore] = None,
+        rarity_at: Optional[Callable[[int, int], str]] = None,
+        collection_book: Optional["CollectionBook"] = None,
+        activity: Optional["ActivityCounters"] = None
+    ):
         """
         初始化运气追踪器
         
         Args:
             max_history: 保存的最大抽卡历史记录数
+            min_pulls_for_rate: 参与群出率排行所需的最低抽数
+            memory_budget: 常驻用户记录（历史、统计、昵称、所在群、图鉴、活跃度）的内存预算（字节），0 表示不限制
+            idle_ttl: 用户闲置多久（秒）后移出内存，0 表示不按闲置时间淘汰
+            spill_store: 冷用户溢出存储，None 时淘汰的用户记录直接丢弃
+            rarity_at: 计数器模式下由 (种子, 序号) 重新生成稀有度的函数，None 表示逐条保存历史
+            collection_book: 人格图鉴记录，None 表示不记录图鉴
+            activity: 按日/按小时的活跃度计数，None 表示不统计
         """
         self.max_history = max_history
-        # 用户抽卡历史：{user_id: [稀有度列表]}
-        self.user_history: dict[str, list[str]] = {}
+        # 保底位图与逐条历史一样最多保留 max_history 抽
+        self._pity_mask = (1 << max_history) - 1
+        self.min_pulls_for_rate = min_pulls_for_rate
+        self.memory_budget = memory_budget
+        self.idle_ttl = idle_ttl
+        self.spill_store = spill_store
+        self.rarity_at = rarity_at
+        # 计数器模式下各纪元的稀有度函数，重载后概率变化时追加新纪元
+        self._rarity_fns: list[Callable[[int, int], str]] = [rarity_at] if rarity_at is not None else []
+        self.collection_book = collection_book
+        self.activity = activity
+        # 用户抽卡历史（按最近访问排序，最久未访问的在前）：{user_id: 稀有度列表或 CounterHistory}
+        self.user_history: OrderedDict[str, Union[list[str], CounterHistory]] = OrderedDict()
+        # 用户累计统计（不受 max_history 截断影响）：{user_id: UserStats}
+        self.user_stats: dict[str, UserStats] = {}
+        # 用户最近访问时间：{user_id: timestamp}
+        self.last_access: dict[str, float] = {}
+        # 常驻用户记录（历史、统计、昵称、所在群、图鉴、活跃度）的估算内存（字节）
+        self.resident_bytes = 0
+        # 淘汰与重新载入计数
+        self.eviction_count = 0
+        self.reload_count = 0
+        # 最近的淘汰时间，用于计算淘汰速率
+        self._eviction_times: deque[float] = deque(maxlen=4096)
+        # 群排行榜：{group_id: GroupLeaderboard}
+        self.group_boards: dict[str, GroupLeaderboard] = {}
+        # 用户参与过的群：{user_id: {group_id}}
+        self.user_groups: dict[str, set[str]] = {}
+        # 全服排名索引（淘汰用户时保留，清除历史时移除）
+        self.server_rate_index = BucketRankIndex(RATE_BUCKETS, RATE_BUCKET_WIDTH)
+        self.server_drought_index = BucketRankIndex(DROUGHT_BUCKETS)
     
-    def record_pull(self, user_id: str, rarity: str) -> None:
+    def record_pull(
+        self,
+        user_id: str,
+        result: dict,
+        group_id: Optional[str] = None,
+        is_pity: bool = False,
+        user_name: Optional[str] = None
+    ) -> None:
         """
-        记录一次抽卡结果
+        记录一次抽卡结果（历史、图鉴、活跃度与排行与 record_pulls 一致）
         
         Args:
             user_id: 用户ID
-            rarity: 抽取到的稀有度
+            result: 抽取到的人格信息
+            group_id: 抽卡所在的群ID，私聊时为 None
+            is_pity: 是否为保底抽取
+            user_name: 用户昵称，None 表示不更新
+        """
+        self.record_pulls(user_id, [result], group_id, [is_pity], user_name)
+    
+    def record_pulls(
+        self,
+        user_id: str,
+        results: list[dict],
+        group_id: Optional[str] = None,
+        pity_flags: Optional[list[bool]] = None,
+        user_name: Optional[str] = None
+    ) -> None:
+        """
+        记录多次抽卡结果
+        
+        Args:
+            user_id: 用户ID
+            results: 抽取结果列表
+            group_id: 抽卡所在的群ID，私聊时为 None
+            pity_flags: 每次抽取是否为保底抽取，None 表示都不是
+            user_name: 用户昵称，None 表示不更新
         """
+        if pity_flags is None:
+            pity_flags = [False] * len(results)
+        for item, is_pity in zip(results, pity_flags):
+            self._append_pull(user_id, item.get("rarity", "unknown"), is_pity)
+        if user_name:
+            self._set_user_name(user_id, user_name)
+        if self.collection_book is not None:
+            if self.collection_book.get(user_id) is None:
+                self.resident_bytes += COLLECTION_BYTES
+            self.collection_book.record(user_id, results)
+        if self.activity is not None:
+            if user_id not in self.activity.users:
+                self.resident_bytes += USER_RING_BYTES
+            sss = sum(1 for item in results if item.get("rarity") == "SSS")
+            self.activity.record(user_id, group_id, len(results), sss)
+        # 多次抽卡只在最后统一刷新一次排行
+        self._update_rankings(user_id, group_id)
+        self._enforce_budget()
+    
+    @property
+    def counter_mode(self) -> bool:
+        """是否为计数器模式"""
+        return self.rarity_at is not None
+    
+    @staticmethod
+    def _resident_size(history: Union[list[str], CounterHistory]) -> int:
+        """估算单个常驻用户历史与统计的内存占用（字节）"""
+        if isinstance(history, CounterHistory):
+            return USER_BASE_BYTES
+        return USER_BASE_BYTES + len(history) * HISTORY_ENTRY_BYTES
+    
+    @staticmethod
+    def _name_size(name: str) -> int:
+        """估算用户昵称的内存占用（字节）"""
+        return USER_NAME_BASE_BYTES + 4 * len(name) if name else 0
+    
+    def _user_size(self, user_id: str, history: Union[list[str], CounterHistory]) -> int:
+        """估算单个常驻用户全部记录（含昵称、所在群、图鉴与活跃度）的内存占用（字节）"""
+        size = self._resident_size(history) + len(self.user_groups.get(user_id, ())) * GROUP_MEMBERSHIP_BYTES
+        stats = self.user_stats.get(user_id)
+        if stats is not None:
+            size += self._name_size(stats.name)
+        if self.collection_book is not None and self.collection_book.get(user_id) is not None:
+            size += COLLECTION_BYTES
+        if self.activity is not None and user_id in self.activity.users:
+            size += USER_RING_BYTES
+        return size
+    
+    def _set_user_name(self, user_id: str, name: str) -> None:
+        """
+        更新常驻用户的昵称
+        
+        Args:
+            user_id: 用户ID
+            name: 昵称
+        """
+        stats = self.user_stats[user_id]
+        if name != stats.name:
+            self.resident_bytes += self._name_size(name) - self._name_size(stats.name)
+            stats.name = name
+    
+    def get_user_names(self, user_ids: list[str]) -> dict[str, str]:
+        """
+        获取用户昵称（已溢出的用户直接从溢出存储查询，不重新载入）
+        
+        Args:
+            user_ids: 用户ID列表
+            
+        Returns:
+            {用户ID: 昵称}，没有记录昵称的用户不在结果中
+        """
+        names = self.spill_store.names(user_ids) if self.spill_store is not None else {}
+        for user_id in user_ids:
+            stats = self.user_stats.get(user_id)
+            if stats is not None and stats.name:
+                names[user_id] = stats.name
+        return names
+    
+    def _ensure_user(self, user_id: str) -> Union[list[str], CounterHistory]:
+        """
+        获取用户历史，用户不存在时创建空记录
+        
+        Args:
+            user_id: 用户ID
+            
+        Returns:
+            用户历史
+        """
+        history = self._get_history(user_id)
         if user_id not in self.user_history:
-            self.user_history[user_id] = []
+            if self.counter_mode:
+                history = CounterHistory(secrets.randbits(64), self._rarity_fns)
+            self.user_history[user_id] = history
+            self.user_stats[user_id] = UserStats()
+            self.last_access[user_id] = time.monotonic()
+            self.resident_bytes += USER_BASE_BYTES
+        return history
+    
+    def set_rarity_at(self, rarity_at: Callable[[int, int], str]) -> None:
+        """
+        开始新的概率纪元（重载后概率配置变化时调用）
+        
+        之后的抽卡按新函数重新生成，此前的抽卡仍按各自纪元的函数解释。
+        
+        Args:
+            rarity_at: 由 (种子, 序号) 重新生成稀有度的函数
+        """
+        self.rarity_at = rarity_at
+        self._rarity_fns.append(rarity_at)
+    
+    def get_counter_state(self, user_id: str) -> tuple[int, int]:
+        """
+        获取计数器模式下用户的种子与下一抽的序号
+        
+        Args:
+            user_id: 用户ID
+            
+        Returns:
+            (种子, 下一抽序号)
+        """
+        history = self._ensure_user(user_id)
+        return history.seed, len(history)
+    
+    def _append_pull(self, user_id: str, rarity: str, is_pity: bool = False) -> None:
+        """
+        追加一条抽卡记录并更新累计统计
+        
+        Args:
+            user_id: 用户ID
+            rarity: 抽取到的稀有度
+            is_pity: 是否为保底抽取
+        """
+        history = self._ensure_user(user_id)
+        history.append(rarity)
+        stats = self.user_stats[user_id]
+        stats.add(rarity, is_pity)
+        stats.recent_pity &= self._pity_mask
+        if isinstance(history, CounterHistory):
+            return
         
-        self.user_history[user_id].append(rarity)
+        self.resident_bytes += HISTORY_ENTRY_BYTES
         
         # 限制历史记录长度
-        if len(self.user_history[user_id]) > self.max_history:
-            self.user_history[user_id] = self.user_history[user_id][-self.max_history:]
+        if len(history) > self.max_history:
+            overflow = len(history) - self.max_history
+            del history[:overflow]
+            self.resident_bytes -= overflow * HISTORY_ENTRY_BYTES
     
-    def record_pulls(self, user_id: str, results: list[dict]) -> None:
+    def _get_history(self, user_id: str) -> Union[list[str], CounterHistory]:
         """
-        记录多次抽卡结果
+        获取用户历史并标记为最近访问，已溢出到磁盘的用户会被重新载入
         
         Args:
             user_id: 用户ID
-            results: 抽取结果列表
+            
+        Returns:
+            稀有度历史，用户不存在时返回空列表
         """
-        for item in results:
-            self.record_pull(user_id, item.get("rarity", "unknown"))
+        history = self.user_history.get(user_id)
+        if history is None:
+            history = self._reload_user(user_id)
+            if history is None:
+                return []
+        
+        self.user_history.move_to_end(user_id)
+        self.last_access[user_id] = time.monotonic()
+        return history
+    
+    def _reload_user(self, user_id: str) -> Optional[Union[list[str], CounterHistory]]:
+        """
+        从溢出存储中载入用户记录
+        
+        Args:
+            user_id: 用户ID
+            
+        Returns:
+            载入的历史列表，溢出存储中不存在时返回 None
+        """
+        if self.spill_store is None:
+            return None
+        row = self.spill_store.pop(user_id)
+        if row is None:
+            return None
+        data, groups, collection, name, activity = row
+        
+        if self.counter_mode:
+            seed, count, epochs, total_pulls, sss_count, pulls_since_sss, pity_since_sss, recent_pity = (
+                decode_counter_user(data)
+            )
+            history = CounterHistory(seed, self._rarity_fns, count, epochs)
+        else:
+            history, total_pulls, sss_count, pulls_since_sss, pity_since_sss, recent_pity = decode_user(data)
+        stats = UserStats()
+        stats.total_pulls = total_pulls
+        stats.sss_count = sss_count
+        stats.pulls_since_sss = pulls_since_sss
+        stats.pity_since_sss = pity_since_sss
+        stats.recent_pity = recent_pity
+        stats.name = name
+        
+        self.user_history[user_id] = history
+        self.user_stats[user_id] = stats
+        if groups:
+            self.user_groups[user_id] = set(groups)
+        if collection is not None and self.collection_book is not None:
+            self.collection_book.restore(user_id, UserCollection.from_bytes(collection))
+        if activity is not None and self.activity is not None:
+            self.activity.restore_user(user_id, CounterRing.from_bytes(activity))
+        self.resident_bytes += self._user_size(user_id, history)
+        self.reload_count += 1
+        return history
+    
+    def _evict_user(self, user_id: str) -> None:
+        """
+        将用户记录（历史、统计、昵称、所在群、图鉴、活跃度）移出内存，有溢出存储时写入磁盘
+        
+        用户在全服排名索引与群排行中的条目保留，排行仍包含已溢出的用户。
+        
+        Args:
+            user_id: 用户ID
+        """
+        history = self.user_history[user_id]
+        stats = self.user_stats[user_id]
+        if self.spill_store is not None:
+            # 先写入溢出存储，写入失败时用户记录仍留在内存中
+            if isinstance(history, CounterHistory):
+                data = encode_counter_user(
+                    history.seed, history.count, history.epochs, stats.total_pulls, stats.sss_count,
+                    stats.pulls_since_sss, stats.pity_since_sss, stats.recent_pity,
+                )
+            else:
+                data = encode_user(
+                    history, stats.total_pulls, stats.sss_count, stats.pulls_since_sss,
+                    stats.pity_since_sss, stats.recent_pity,
+                )
+            collection = self.collection_book.get(user_id) if self.collection_book is not None else None
+            ring = self.activity.users.get(user_id) if self.activity is not None else None
+            self.spill_store.put(
+                user_id, data, self.user_groups.get(user_id, ()),
+                collection.to_bytes() if collection is not None else None,
+                stats.name, ring.to_bytes() if ring is not None else None,
+            )
+        
+        self.resident_bytes -= self._user_size(user_id, history)
+        del self.user_history[user_id]
+        del self.user_stats[user_id]
+        self.last_access.pop(user_id, None)
+        self.user_groups.pop(user_id, None)
+        if self.collection_book is not None:
+            self.collection_book.pop(user_id)
+        if self.activity is not None:
+            self.activity.pop_user(user_id)
+        self.eviction_count += 1
+        self._eviction_times.append(time.monotonic())
+    
+    def _enforce_budget(self) -> None:
+        """超出内存预算时按 LRU 顺序淘汰用户，保留最近访问的一个用户"""
+        if self.memory_budget <= 0 or self.resident_bytes <= self.memory_budget:
+            return
+        while self.resident_bytes > self.memory_budget and len(self.user_history) > 1:
+            self._evict_user(next(iter(self.user_history)))
+        self._commit_spill()
+    
+    def _commit_spill(self) -> None:
+        """一轮淘汰结束后统一提交溢出存储的写操作"""
+        if self.spill_store is not None:
+            self.spill_store.commit()
+    
+    def evict_idle(self) -> int:
+        """
+        淘汰闲置超过 idle_ttl 的用户
+        
+        Returns:
+            本次淘汰的用户数
+        """
+        deadline = time.monotonic() - self.idle_ttl
+        evicted = 0
+        # user_history 按访问顺序排列，遇到未过期的用户即可停止
+        while self.idle_ttl > 0 and self.user_history:
+            user_id = next(iter(self.user_history))
+            if self.last_access.get(user_id, 0) > deadline:
+                break
+            self._evict_user(user_id)
+            evicted += 1
+        # 重新载入与清除记录产生的删除也在这里定期提交
+        self._commit_spill()
+        return evicted
+    
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取内存占用与淘汰指标
+        
+        Returns:
+            指标字典
+        """
+        now = time.monotonic()
+        recent_evictions = sum(1 for t in self._eviction_times if now - t <= 300)
+        index_entries = len(self.server_rate_index) + len(self.server_drought_index)
+        board_entries = sum(
+            len(ranked) for board in self.group_boards.values() for ranked in board.boards.values()
+        )
+        index_bytes = index_entries * RANK_INDEX_ENTRY_BYTES + board_entries * BOARD_ENTRY_BYTES
+        return {
+            "常驻用户": len(self.user_history),
+            "估算内存(KB)": round(self.resident_bytes / 1024, 1),
+            "排名索引(KB)": round(index_bytes / 1024, 1),
+            "已溢出用户": self.spill_store.count() if self.spill_store else 0,
+            "累计淘汰": self.eviction_count,
+            "淘汰速率(/分钟)": round(recent_evictions / 5, 2),
+            "重新载入": self.reload_count,
+            "历史模式": "计数器" if self.counter_mode else "逐条保存",
+        }
+    
+    def _update_rankings(self, user_id: str, group_id: Optional[str]) -> None:
+        """
+        刷新全服排名索引与用户所在各群的排行
+        
+        Args:
+            user_id: 用户ID
+            group_id: 本次抽卡所在的群ID
+        """
+        stats = self.user_stats[user_id]
+        self.server_drought_index.update(user_id, stats.pulls_since_sss)
+        if stats.total_pulls >= self.min_pulls_for_rate:
+            self.server_rate_index.update(user_id, stats.sss_count / stats.total_pulls * 100)
+        else:
+            self.server_rate_index.remove(user_id)
+        
+        groups = self.user_groups.get(user_id)
+        if group_id:
+            if groups is None:
+                groups = self.user_groups[user_id] = set()
+            if group_id not in groups:
+                groups.add(group_id)
+                self.resident_bytes += GROUP_MEMBERSHIP_BYTES
+                if group_id not in self.group_boards:
+                    self.group_boards[group_id] = GroupLeaderboard(self.min_pulls_for_rate)
+        
+        if not groups:
+            return
+        
+        for gid in groups:
+            self.group_boards[gid].update_member(
+                user_id, stats.total_pulls, stats.sss_count, stats.pulls_since_sss
+            )
+    
+    def get_group_leaderboard(
+        self,
+        group_id: str,
+        top_k: int = 10
+    ) -> Optional[dict[str, list[tuple[str, float]]]]:
+        """
+        获取群排行榜快照
+        
+        Args:
+            group_id: 群ID
+            top_k: 每项排行显示的名次数量
+            
+        Returns:
+            {排行类型: [(用户ID, 分数)]}，如果该群没有抽卡记录则返回 None
+        """
+        board = self.group_boards.get(group_id)
+        if board is None or len(board) == 0:
+            return None
+        return board.snapshot(top_k)
     
     def get_pulls_since_last_sss(self, user_id: str) -> int:
         """
@@ -210,9 +1121,12 @@ class LuckTracker:
         Returns:
             距离上次SSS的抽数，如果从未抽到则返回总抽数
         """
-        history = self.user_history.get(user_id, [])
+        history = self._get_history(user_id)
         if not history:
             return 0
+        if isinstance(history, CounterHistory):
+            # 计数器模式的历史不截断，累计统计即为精确值
+            return self.user_stats[user_id].pulls_since_sss
         
         # 从后往前查找最近的SSS
         for i, rarity in enumerate(reversed(history)):
@@ -222,6 +1136,21 @@ class LuckTracker:
         # 从未抽到SSS
         return len(history)
     
+    def get_pity_pulls(self, user_id: str, pulls: int) -> int:
+        """
+        获取用户最近 pulls 抽中保底抽取的次数（按实际抽卡记录，单抽与十连混合时同样准确）
+        
+        Args:
+            user_id: 用户ID
+            pulls: 抽数，距离上次SSS的抽数不受限制，其余最多追溯 max_history 抽
+            
+        Returns:
+            保底抽取次数
+        """
+        self._get_history(user_id)
+        stats = self.user_stats.get(user_id)
+        return stats.pity_pulls(pulls) if stats is not None else 0
+    
     def get_sss_count_in_window(self, user_id: str, window: int = 10) -> int:
         """
         获取用户最近N抽中SSS的数量
@@ -233,7 +1162,7 @@ class LuckTracker:
         Returns:
             窗口内SSS的数量
         """
-        history = self.user_history.get(user_id, [])
+        history = self._get_history(user_id)
         if not history:
             return 0
         
@@ -248,9 +1177,12 @@ class LuckTracker:
             user_id: 用户ID
             
         Returns:
-            总抽卡次数
+            总抽卡次数（累计值，不受 max_history 截断影响）
         """
-        return len(self.user_history.get(user_id, []))
+        # 先载入已溢出的用户
+        self._get_history(user_id)
+        stats = self.user_stats.get(user_id)
+        return stats.total_pulls if stats is not None else 0
     
     def get_sss_rate(self, user_id: str) -> float:
         """
@@ -260,14 +1192,13 @@ class LuckTracker:
             user_id: 用户ID
             
         Returns:
-            SSS出率百分比
+            SSS出率百分比（按累计统计计算，与总抽卡次数口径一致）
         """
-        history = self.user_history.get(user_id, [])
-        if not history:
+        self._get_history(user_id)
+        stats = self.user_stats.get(user_id)
+        if stats is None or not stats.total_pulls:
             return 0.0
-        
-        sss_count = sum(1 for r in history if r == "SSS")
-        return (sss_count / len(history)) * 100
+        return (stats.sss_count / stats.total_pulls) * 100
     
     def evaluate_unlucky(
         self,
@@ -333,5 +1264,76 @@ class LuckTracker:
         Args:
             user_id: 用户ID
         """
-        if user_id in self.user_history:
-            del self.user_history[user_id]
+        # 已溢出的用户先载入，以便按其所在群清除排行条目
+        self._get_history(user_id)
+        history = self.user_history.pop(user_id, None)
+        if history is not None:
+            self.resident_bytes -= self._user_size(user_id, history)
+        self.user_stats.pop(user_id, None)
+        self.last_access.pop(user_id, None)
+        if self.spill_store is not None:
+            self.spill_store.delete(user_id)
+        self.server_rate_index.remove(user_id)
+        self.server_drought_index.remove(user_id)
+        if self.collection_book is not None:
+            self.collection_book.clear(user_id)
+        if self.activity is not None:
+            self.activity.clear_user(user_id)
+        for group_id in self.user_groups.pop(user_id, ()):
+            self.group_boards[group_id].remove_member(user_id)
+    
+    def get_collection(self, user_id: str) -> Optional[UserCollection]:
+        """
+        获取用户的图鉴记录，已溢出的用户会被重新载入
+        
+        Args:
+            user_id: 用户ID
+            
+        Returns:
+            收集记录，没有抽过卡或未启用图鉴时返回 None
+        """
+        if self.collection_book is None:
+            return None
+        self._get_history(user_id)
+        return self.collection_book.get(user_id)
+    
+    def get_daily_activity(self, user_id: str, days: Iterable[int]) -> list[tuple[int, int]]:
+        """
+        获取用户若干天的抽数与★★★数，已溢出的用户会被重新载入
+        
+        Args:
+            user_id: 用户ID
+            days: 日序号
+            
+        Returns:
+            每天的 (抽数, ★★★数)，未启用活跃度统计时均为 (0, 0)
+        """
+        if self.activity is None:
+            return [(0, 0) for _ in days]
+        self._get_history(user_id)
+        return [self.activity.user_day(user_id, day) for day in days]
+    
+    def get_luck_percentiles(self, user_id: str, group_id: Optional[str] = None) -> dict[str, Optional[float]]:
+        """
+        获取用户运气在全服与本群中的百分位
+        
+        Args:
+            user_id: 用户ID
+            group_id: 当前群ID，私聊时为 None
+            
+        Returns:
+            {"server_rate", "group_rate", "server_drought", "group_drought"}：
+            出率高于/未出SSS抽数长于多少百分比的其他玩家，无可比较对象或未达出率排行门槛时为 None
+        """
+        def percent(rank: tuple[int, int]) -> Optional[float]:
+            below, others = rank
+            return below / others * 100 if others > 0 else None
+        
+        board = self.group_boards.get(group_id) if group_id else None
+        in_group = board is not None and group_id in self.user_groups.get(user_id, ())
+        return {
+            "server_rate": percent(self.server_rate_index.rank(user_id)),
+            "group_rate": percent(board.rank(BOARD_SSS_RATE, user_id)) if in_group else None,
+            "server_drought": percent(self.server_drought_index.rank(user_id)),
+            "group_drought": percent(board.rank(BOARD_DROUGHT, user_id)) if in_group else None,
+        }
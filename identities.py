@@ -242,6 +242,19 @@ def get_identities_by_rarity(rarity: str) -> list:
     return [i for i in IDENTITIES if i["rarity"] == rarity]
 
 
+# 人格编号：{图片文件名: IDENTITIES 中的下标}，用于紧凑存储
+# 新增人格请追加在列表末尾，以保持已有编号不变
+IDENTITY_INDEX = {identity["image"]: idx for idx, identity in enumerate(IDENTITIES)}
+
+# 未知人格的编号
+UNKNOWN_IDENTITY_ID = 0xFFFF
+
+
+def get_identity_id(identity: dict) -> int:
+    """获取人格编号，未知人格返回 UNKNOWN_IDENTITY_ID"""
+    return IDENTITY_INDEX.get(identity.get("image", ""), UNKNOWN_IDENTITY_ID)
+
+
 def get_identities_by_sinner(sinner: str) -> list:
     """根据罪人获取人格列表"""
     return [i for i in IDENTITIES if i["sinner"] == sinner]
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+群排行榜模块
+
+为每个群增量维护"最多000"、"000出率"、"当前最长未出000"三项排行。
+排行数据在记录抽卡时更新，查询时只需读取有序列表尾部，无需扫描全部用户历史。
+"""
+from bisect import bisect_left, insort
+
+
+# 排行榜类型
+BOARD_SSS_COUNT = "sss_count"   # 最多000
+BOARD_SSS_RATE = "sss_rate"     # 000出率最高
+BOARD_DROUGHT = "drought"       # 当前最长未出000
+
+
+class RankedBoard:
+    """有序排行榜，按分数升序保存 (分数, 成员) 并支持增量更新"""
+
+    def __init__(self):
+        # 升序排列的 (分数, 成员ID) 列表
+        self._entries: list[tuple] = []
+        # 成员当前分数：{member_id: score}
+        self._scores: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, member_id: str, score: float) -> None:
+        """
+        更新成员分数
+
+        Args:
+            member_id: 成员ID
+            score: 新分数
+        """
+        old_score = self._scores.get(member_id)
+        if old_score == score:
+            return
+        if old_score is not None:
+            self._discard(old_score, member_id)
+        self._scores[member_id] = score
+        insort(self._entries, (score, member_id))
+
+    def remove(self, member_id: str) -> None:
+        """
+        移除成员
+
+        Args:
+            member_id: 成员ID
+        """
+        old_score = self._scores.pop(member_id, None)
+        if old_score is not None:
+            self._discard(old_score, member_id)
+
+    def top(self, k: int) -> list[tuple[str, float]]:
+        """
+        获取分数最高的前 k 名
+
+        Args:
+            k: 名次数量
+
+        Returns:
+            [(成员ID, 分数)] 列表，按分数从高到低排序
+        """
+        if k <= 0:
+            return []
+        return [(member_id, score) for score, member_id in reversed(self._entries[-k:])]
+
+    def rank(self, member_id: str) -> tuple[int, int]:
+        """
+        查询成员的排名
+
+        Args:
+            member_id: 成员ID
+
+        Returns:
+            (分数低于该成员的其他成员数, 其他成员总数)，成员不在榜上时返回 (0, 0)
+        """
+        score = self._scores.get(member_id)
+        if score is None:
+            return 0, 0
+        return bisect_left(self._entries, (score,)), len(self._entries) - 1
+
+    def _discard(self, score: float, member_id: str) -> None:
+        """从有序列表中删除指定条目"""
+        idx = bisect_left(self._entries, (score, member_id))
+        if idx < len(self._entries) and self._entries[idx] == (score, member_id):
+            del self._entries[idx]
+
+
+class GroupLeaderboard:
+    """单个群的排行榜集合"""
+
+    def __init__(self, min_pulls_for_rate: int = 50):
+        """
+        初始化群排行榜
+
+        Args:
+            min_pulls_for_rate: 参与出率排行所需的最低抽数
+        """
+        self.min_pulls_for_rate = min_pulls_for_rate
+        self.boards: dict[str, RankedBoard] = {
+            BOARD_SSS_COUNT: RankedBoard(),
+            BOARD_SSS_RATE: RankedBoard(),
+            BOARD_DROUGHT: RankedBoard(),
+        }
+
+    def __len__(self) -> int:
+        return len(self.boards[BOARD_DROUGHT])
+
+    def update_member(self, member_id: str, total_pulls: int, sss_count: int, pulls_since_sss: int) -> None:
+        """
+        根据成员最新统计更新各项排行
+
+        Args:
+            member_id: 成员ID
+            total_pulls: 总抽数
+            sss_count: 000总数
+            pulls_since_sss: 距离上次000的抽数
+        """
+        self.boards[BOARD_SSS_COUNT].update(member_id, sss_count)
+        self.boards[BOARD_DROUGHT].update(member_id, pulls_since_sss)
+
+        if total_pulls >= self.min_pulls_for_rate:
+            self.boards[BOARD_SSS_RATE].update(member_id, sss_count / total_pulls * 100)
+        else:
+            self.boards[BOARD_SSS_RATE].remove(member_id)
+
+    def remove_member(self, member_id: str) -> None:
+        """
+        从所有排行中移除成员
+
+        Args:
+            member_id: 成员ID
+        """
+        for board in self.boards.values():
+            board.remove(member_id)
+
+    def rank(self, board_type: str, member_id: str) -> tuple[int, int]:
+        """
+        查询成员在某项排行中的位置
+
+        Args:
+            board_type: 排行类型
+            member_id: 成员ID
+
+        Returns:
+            (分数低于该成员的其他成员数, 其他成员总数)
+        """
+        return self.boards[board_type].rank(member_id)
+
+    def snapshot(self, top_k: int = 10) -> dict[str, list[tuple[str, float]]]:
+        """
+        获取各项排行的前 top_k 名
+
+        Args:
+            top_k: 每项排行显示的名次数量
+
+        Returns:
+            {排行类型: [(成员ID, 分数)]}
+        """
+        return {name: board.top(top_k) for name, board in self.boards.items()}
+
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+负载保护模块
+
+周期性测量事件循环延迟与渲染队列深度，在过载时逐级降低十连/百连合成图的开销：
+缩小合成图 → 只使用已缓存的图块 → 只发送文字。负载回落后自动逐级恢复。
+"""
+import asyncio
+import time
+from typing import Optional
+
+from astrbot.api import logger
+
+from .render_dispatcher import RenderDispatcher
+
+
+# 降级等级
+LEVEL_NORMAL = 0        # 正常合成
+LEVEL_REDUCED = 1       # 缩小合成图（图块仍命中缓存）
+LEVEL_CACHED_ONLY = 2   # 只使用已缓存的图块，不再解码新图片（同样缩小）
+LEVEL_TEXT_ONLY = 3     # 只发送文字结果
+
+LEVEL_NAMES = {
+    LEVEL_NORMAL: "正常",
+    LEVEL_REDUCED: "缩小图片",
+    LEVEL_CACHED_ONLY: "仅缓存图块",
+    LEVEL_TEXT_ONLY: "仅文字",
+}
+
+
+class LoadShedder:
+    """基于事件循环延迟与渲染队列深度的自适应降级器"""
+
+    def __init__(
+        self,
+        dispatcher: RenderDispatcher,
+        sample_interval: float = 0.5,
+        lag_thresholds_ms: tuple[float, float, float] = (100, 250, 500),
+        queue_thresholds: tuple[int, int, int] = (8, 16, 32),
+        recover_samples: int = 10,
+        smoothing: float = 0.3
+    ):
+        """
+        初始化降级器
+
+        Args:
+            dispatcher: 渲染调度器，用于读取排队中的合成请求数
+            sample_interval: 采样间隔（秒）
+            lag_thresholds_ms: 进入第 1/2/3 级降级的事件循环延迟阈值（毫秒）
+            queue_thresholds: 进入第 1/2/3 级降级的渲染队列深度阈值
+            recover_samples: 连续多少次采样低于当前等级阈值后降低一级
+            smoothing: 延迟指数平滑系数，越大越灵敏
+        """
+        self.dispatcher = dispatcher
+        self.sample_interval = sample_interval
+        self.lag_thresholds = [threshold / 1000 for threshold in lag_thresholds_ms]
+        self.queue_thresholds = list(queue_thresholds)
+        self.recover_samples = max(1, recover_samples)
+        self.smoothing = smoothing
+
+        self.level = LEVEL_NORMAL
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._calm_samples = 0
+        self._level_since = time.monotonic()
+
+        # 指标
+        self.escalations = 0
+        self.recoveries = 0
+        self.level_entries = {level: 0 for level in LEVEL_NAMES}
+        self.level_seconds = {level: 0.0 for level in LEVEL_NAMES}
+        self.shed_requests = {level: 0 for level in LEVEL_NAMES}
+
+    async def run(self) -> None:
+        """采样循环，应作为后台任务运行"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started_at = loop.time()
+            await asyncio.sleep(self.sample_interval)
+            lag = max(0.0, loop.time() - started_at - self.sample_interval)
+            self.sample(lag, self.dispatcher.queue_depth)
+
+    def sample(self, lag: float, queue_depth: int) -> None:
+        """
+        根据一次采样更新降级等级
+
+        Args:
+            lag: 本次测得的事件循环延迟（秒）
+            queue_depth: 当前渲染队列深度
+        """
+        self.lag = self.smoothing * lag + (1 - self.smoothing) * self.lag
+        self.max_lag = max(self.max_lag, lag)
+        target = max(
+            self._pressure_level(self.lag, self.lag_thresholds),
+            self._pressure_level(queue_depth, self.queue_thresholds),
+        )
+
+        if target > self.level:
+            # 过载时直接升到对应等级
+            self._calm_samples = 0
+            self._set_level(target)
+            self.escalations += 1
+        elif target < self.level:
+            # 负载回落时需连续若干次采样达标才降低一级，避免来回抖动
+            self._calm_samples += 1
+            if self._calm_samples >= self.recover_samples:
+                self._calm_samples = 0
+                self._set_level(self.level - 1)
+                self.recoveries += 1
+        else:
+            self._calm_samples = 0
+
+    @staticmethod
+    def _pressure_level(value: float, thresholds: list[float]) -> int:
+        """数值超过的阈值个数即为对应的降级等级"""
+        return sum(1 for threshold in thresholds if value >= threshold)
+
+    def _set_level(self, level: int) -> None:
+        """切换降级等级并记录日志与耗时"""
+        now = time.monotonic()
+        self.level_seconds[self.level] += now - self._level_since
+        self._level_since = now
+        logger.info(
+            f"负载保护等级变更：{LEVEL_NAMES[self.level]} → {LEVEL_NAMES[level]}"
+            f"（事件循环延迟 {self.lag * 1000:.0f}ms，渲染队列 {self.dispatcher.queue_depth}）"
+        )
+        self.level = level
+        self.level_entries[level] += 1
+
+    def record_shed(self, level: Optional[int] = None) -> None:
+        """
+        记录一次按降级等级处理的请求
+
+        Args:
+            level: 处理时的降级等级，None 表示当前等级
+        """
+        self.shed_requests[self.level if level is None else level] += 1
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取降级指标
+
+        Returns:
+            指标字典
+        """
+        level_seconds = dict(self.level_seconds)
+        level_seconds[self.level] += time.monotonic() - self._level_since
+        metrics = {
+            "当前等级": LEVEL_NAMES[self.level],
+            "平滑延迟(ms)": round(self.lag * 1000, 1),
+            "最大延迟(ms)": round(self.max_lag * 1000, 1),
+            "升级次数": self.escalations,
+            "恢复次数": self.recoveries,
+        }
+        for level, name in LEVEL_NAMES.items():
+            if level == LEVEL_NORMAL:
+                continue
+            metrics[f"{name}(次/请求/秒)"] = (
+                f"{self.level_entries[level]}/{self.shed_requests[level]}/{level_seconds[level]:.0f}"
+            )
+        return metrics
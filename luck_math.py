@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+运气概率计算模块
+
+根据配置的出率，计算"连续若干抽未出SSS"与"最近N抽出至少k个SSS"的概率，
+用于给出"比 X% 的玩家更非/更欧"的百分位评价。
+
+每抽独立，概率只取决于这些抽中普通抽取与保底抽取各有多少次，与先后顺序无关；
+保底抽取的次数由运气追踪器按用户实际的抽卡记录提供（单抽与十连混合时同样准确）。
+窗口分布在加载配置时按常见的保底次数预先构建，其余组合首次查询时构建并缓存。
+"""
+from functools import lru_cache
+from typing import Optional
+
+
+class LuckOdds:
+    """SSS 出现概率表"""
+
+    def __init__(
+        self,
+        sss_rate: float,
+        pity_sss_rate: float,
+        pity_interval: int = 10,
+        windows: tuple[int, ...] = ()
+    ):
+        """
+        初始化并预先构建窗口分布
+
+        Args:
+            sss_rate: 普通抽取的SSS概率（0~1）
+            pity_sss_rate: 保底抽取的SSS概率（0~1）
+            pity_interval: 保底间隔，0 表示没有保底
+            windows: 需要预先构建分布的统计窗口大小
+        """
+        self.sss_rate = sss_rate
+        self.pity_sss_rate = pity_sss_rate
+        self.pity_interval = pity_interval
+        # 只做十连时窗口内最多有 ceil(window / pity_interval) 次保底抽取，预先构建这些组合
+        for window in windows:
+            for pity_pulls in range(_max_pity_pulls(pity_interval, window) + 1):
+                _build_window_tail(sss_rate, pity_sss_rate, window, pity_pulls)
+
+    @classmethod
+    def from_core(cls, core, windows: tuple[int, ...] = ()) -> "LuckOdds":
+        """
+        按抽卡引擎的实际出率构建概率表
+
+        Args:
+            core: GachaCore 实例
+            windows: 需要预先构建分布的统计窗口大小
+
+        Returns:
+            LuckOdds 实例
+        """
+        sss_rate = core.effective_rates().get("SSS", 0.0)
+        if core.pity_enabled:
+            return cls(sss_rate, core.effective_rates(True).get("SSS", 0.0), 10, windows)
+        return cls(sss_rate, sss_rate, 0, windows)
+
+    def drought_probability(self, pulls: int, pity_pulls: int) -> float:
+        """
+        连续 pulls 抽（截至最近一抽）都未出SSS的概率
+
+        Args:
+            pulls: 未出SSS的抽数
+            pity_pulls: 其中保底抽取的次数
+
+        Returns:
+            概率（0~1）
+        """
+        pity_pulls = min(max(0, pity_pulls), pulls)
+        return (1 - self.sss_rate) ** (pulls - pity_pulls) * (1 - self.pity_sss_rate) ** pity_pulls
+
+    def window_probability(self, sss_count: int, window: int, pity_pulls: int) -> float:
+        """
+        最近 window 抽中至少出 sss_count 个SSS的概率
+
+        Args:
+            sss_count: SSS数量
+            window: 统计窗口大小
+            pity_pulls: 窗口内保底抽取的次数
+
+        Returns:
+            概率（0~1）
+        """
+        if sss_count <= 0:
+            return 1.0
+        if sss_count > window:
+            return 0.0
+        pity_pulls = min(max(0, pity_pulls), window)
+        if self.pity_sss_rate == self.sss_rate:
+            # 没有保底或保底概率相同时，分布与保底次数无关
+            pity_pulls = 0
+        return _build_window_tail(self.sss_rate, self.pity_sss_rate, window, pity_pulls)[sss_count]
+
+
+def _max_pity_pulls(pity_interval: int, pulls: int) -> int:
+    """只做十连时 pulls 抽中最多的保底抽取次数"""
+    if pity_interval <= 0:
+        return 0
+    return (pulls + pity_interval - 1) // pity_interval
+
+
+@lru_cache(maxsize=256)
+def _build_window_tail(
+    sss_rate: float,
+    pity_sss_rate: float,
+    window: int,
+    pity_pulls: int
+) -> tuple[float, ...]:
+    """动态规划构建窗口分布：第 k 项为 window 抽（其中 pity_pulls 次保底）中至少出 k 个SSS的概率"""
+    dist = [1.0] + [0.0] * window
+    for offset in range(window):
+        p = pity_sss_rate if offset < pity_pulls else sss_rate
+        for k in range(offset + 1, 0, -1):
+            dist[k] = dist[k] * (1 - p) + dist[k - 1] * p
+        dist[0] *= 1 - p
+
+    tail = [0.0] * (window + 2)
+    for k in range(window, -1, -1):
+        tail[k] = tail[k + 1] + dist[k]
+    return tuple(min(1.0, value) for value in tail[:window + 1])
+
+
+def rarer_than(probability: Optional[float]) -> Optional[float]:
+    """
+    将事件概率换算为"比多少玩家更极端"的百分比
+
+    Args:
+        probability: 达到当前结果或更极端结果的概率
+
+    Returns:
+        百分比（0~100），概率为 None 或 1 时返回 None
+    """
+    if probability is None or probability >= 1.0:
+        return None
+    return (1 - probability) * 100
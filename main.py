@@ -5,26 +5,40 @@
 功能：
 - 单抽：模拟单次人格抽取
 - 十连：模拟十连抽取（2行5列网格布局）
+- 百连：连续十次十连，按稀有度排序汇总为一张大图
 - 非酋/欧皇指数：根据抽卡记录评估运气
 - 多卡池支持：支持切换不同卡池
 
 使用指令：
 - /tq单抽 或 /tq抽卡 - 进行单次抽取
 - /tq十连 - 进行十连抽取
+- /tq百连 - 连续十次十连，结果汇总为一张图
 - /tq非酋指数 - 查看非酋评级
 - /tq欧皇指数 - 查看欧皇评级
 - /tq池列表 - 查看可用卡池
 - /tq切池 池名 - 切换卡池
+- /tq排行 - 查看本群抽卡排行
+- /tq图鉴 [罪人] - 查看人格收集进度
+- /tq今日 - 查看今天的抽卡统计
+- /tq本周 - 查看本周每天的抽卡统计
+- /tq全服统计 - 查看全服抽卡统计
+- /tq概率校验 - 校验实际出率与配置概率是否一致（管理员）
+- /tq重载配置 - 重新读取配置文件（管理员）
+- /tq状态 - 查看插件运行状态（管理员）
 """
+import asyncio
 import os
+import sqlite3
+import tempfile
+import time
 from pathlib import Path
 from typing import Optional
 
 import yaml
 
-from astrbot.api.event import filter, AstrMessageEvent
+from astrbot.api.event import filter, AstrMessageEvent, MessageChain
 from astrbot.api.star import Context, Star, register
-from astrbot.api.message_components import Image, Plain
+from astrbot.api.message_components import File, Image, Plain
 from astrbot.api import logger
 
 from .identities import (
@@ -35,8 +49,10 @@ from .identities import (
     IMAGES_DIR,
     DEFAULT_IMAGE,
     get_identities_by_sinner,
+    get_identity_id,
+    SINNERS,
 )
-from .gacha_core import GachaCore, LuckTracker
+from .gacha_core import GachaCore, LuckTracker, OutcomeCounter, ORDER_DRAW
 from .render_text import (
     format_single_pull_result,
     format_ten_pull_result,
@@ -44,8 +60,34 @@ from .render_text import (
     format_lucky_index,
     format_pool_list,
     format_pool_switch_result,
+    format_leaderboard,
+    format_status,
+    format_server_stats,
+    format_rate_check,
+    format_collection,
+    format_daily_activity,
+    format_weekly_activity,
+    format_export_summary,
 )
-from .render_image import create_grid_composite, cleanup_temp_file
+from .spill_store import SpillStore
+from .asset_cache import SingleImageCache
+from .warmup import AssetWarmup
+from .pull_log import PullLog, compute_stats, pool_id
+from .rate_check import chi_square_test, RateDriftMonitor
+from .luck_math import LuckOdds, rarer_than
+from .dedup import EventDeduplicator
+from .throttle import Throttler, SCOPE_USER
+from .prefetch import PrefetchCache
+from .collection import CollectionBook, CollectorEstimate
+from .activity import ActivityCounters, weekday
+from .scheduler import LaneScheduler, LANE_FAST, LANE_RENDER
+from .export import export_user_pulls, export_suffix, FORMAT_SUFFIXES
+from .load_shed import LoadShedder, LEVEL_NORMAL, LEVEL_REDUCED, LEVEL_CACHED_ONLY, LEVEL_TEXT_ONLY
+from .render_image import TileCache, RESAMPLE_QUALITY, cleanup_temp_file
+from .asset_pack import AssetPack, DEFAULT_PACK_NAME
+from .tile_share import SharedTileSet, tiles_fingerprint, publish_tiles
+from .media_cache import MediaHandleCache, static_url
+from .render_dispatcher import RenderDispatcher
 
 
 # 默认配置
@@ -88,12 +130,106 @@ DEFAULT_CONFIG = {
             {"threshold": 0, "window": 10, "rating": "普通", "message": "运气普通，继续抽吧"},
         ],
     },
+    "luck_tracker": {
+        "max_history": 500,
+        "memory_budget_mb": 64,
+        "idle_ttl": 86400,
+        "spill_enabled": True,
+        "evict_interval": 300,
+        "counter_rng": False,
+    },
+    "pull_log": {
+        "enabled": True,
+        "flush_interval": 5,
+        "flush_bytes": 65536,
+        "stats_days": 7,
+    },
+    "rate_monitor": {
+        "enabled": True,
+        "interval": 600,
+        "min_samples": 2000,
+        "alpha": 0.0001,
+    },
+    "export": {
+        "enabled": True,
+        "format": "csv",
+        "max_bytes": 5242880,
+        "cooldown": 300,
+    },
+    "leaderboard": {
+        "top_k": 10,
+        "min_pulls_for_rate": 50,
+    },
+    "dedup": {
+        "enabled": True,
+        "ttl": 120,
+        "max_entries": 4096,
+        "reply_cached": True,
+    },
+    "throttle": {
+        "enabled": True,
+        "user_rate": 0.5,
+        "user_burst": 5,
+        "group_rate": 3,
+        "group_burst": 20,
+        "max_keys": 10000,
+        "costs": {"single": 1, "ten": 1, "hundred": 5},
+    },
+    "prefetch": {
+        "enabled": True,
+        "max_entries": 256,
+        "max_pending": 64,
+        "ttl": 600,
+    },
+    "lanes": {
+        "fast_concurrency": 32,
+        "render_concurrency": 3,
+    },
+    "media_cache": {
+        "enabled": False,
+        "url_base": "",
+        "ttl": 86400,
+        "max_entries": 1024,
+    },
+    "load_shed": {
+        "enabled": True,
+        "sample_interval": 0.5,
+        "lag_thresholds_ms": [100, 250, 500],
+        "queue_thresholds": [8, 16, 32],
+        "recover_samples": 10,
+        "reduced_height_scale": 0.6,
+    },
     "image": {
         "ten_pull_layout": {
             "rows": 2,
             "cols": 5,
             "spacing": 5,
             "target_height": 120,
+            "order": "draw",
+        },
+        "hundred_pull_layout": {
+            "rows": None,
+            "cols": 10,
+            "spacing": 4,
+            "target_height": 80,
+            "order": "rarity",
+        },
+        "batch_window_ms": 5,
+        "max_batch_size": 32,
+        "asset_pack": DEFAULT_PACK_NAME,
+        "tile_cache_size": 512,
+        "decode_workers": 4,
+        "resample_quality": "quality",
+        "two_phase_response": False,
+        "followup_deadline": 10,
+        "single_pull": {
+            "transcode": True,
+            "max_size": 256,
+            "quality": 85,
+        },
+        "shared_tiles": {
+            "enabled": True,
+            "path": "",
         },
     },
 }
@@ -115,13 +251,130 @@ class LimbusGachaPlugin(Star):
         
         # 初始化抽卡引擎
         self.gacha_core = self._create_gacha_core()
+        self._validate_gacha_config()
+        
+        # 抽卡结果的出率漂移监控
+        monitor_config = self.config.get("rate_monitor", DEFAULT_CONFIG["rate_monitor"])
+        self.rate_monitor = RateDriftMonitor(
+            alpha=monitor_config.get("alpha", 0.0001),
+            min_samples=monitor_config.get("min_samples", 2000),
+        )
+        
+        # 人格图鉴与各卡池的集齐期望抽数表（首次查询时计算）
+        self.collection_book = CollectionBook()
+        self.collector_estimates: dict[str, CollectorEstimate] = {}
+        
+        # 各用户上次导出的时间（单调时钟），用于导出冷却
+        self._export_times: dict[str, float] = {}
+        
+        # 按日/按小时的抽卡活跃度计数
+        self.activity = ActivityCounters()
         
         # 初始化运气追踪器
-        self.luck_tracker = LuckTracker()
+        self.luck_tracker = self._create_luck_tracker()
+        
+        # 运气百分位概率表（按配置一次性构建）
+        self.luck_odds = self._create_luck_odds()
         
         # 用户当前卡池：{user_id: pool_name}
         self.user_pools: dict[str, str] = {}
         
+        # 文字指令与重型工作分通道调度
+        lanes_config = self.config.get("lanes", DEFAULT_CONFIG["lanes"])
+        self.scheduler = LaneScheduler(
+            fast_concurrency=lanes_config.get("fast_concurrency", 32),
+            render_concurrency=lanes_config.get("render_concurrency", 3),
+        )
+        
+        # 十连图块缓存与合成图的批次调度器
+        image_config = self.config.get("image", DEFAULT_CONFIG["image"])
+        self.asset_pack = self._open_asset_pack(image_config.get("asset_pack", DEFAULT_PACK_NAME))
+        self.tile_cache = TileCache(
+            max_entries=image_config.get("tile_cache_size", 512),
+            resample_tier=image_config.get("resample_quality", RESAMPLE_QUALITY),
+            asset_pack=self.asset_pack,
+        )
+        self.render_dispatcher = RenderDispatcher(
+            window_ms=image_config.get("batch_window_ms", 5),
+            max_batch_size=image_config.get("max_batch_size", 32),
+            tile_cache=self.tile_cache,
+            decode_workers=image_config.get("decode_workers", 4),
+            scheduler=self.scheduler,
+        )
+        
+        # 重复投递的消息去重
+        dedup_config = self.config.get("dedup", DEFAULT_CONFIG["dedup"])
+        self.deduplicator = EventDeduplicator(
+            max_entries=dedup_config.get("max_entries", 4096),
+            ttl=dedup_config.get("ttl", 120),
+        )
+        
+        # 按用户与按群的抽卡限流
+        throttle_config = self.config.get("throttle", DEFAULT_CONFIG["throttle"])
+        self.throttler = Throttler(
+            user_rate=throttle_config.get("user_rate", 0.5),
+            user_burst=throttle_config.get("user_burst", 5),
+            group_rate=throttle_config.get("group_rate", 3),
+            group_burst=throttle_config.get("group_burst", 20),
+            max_keys=throttle_config.get("max_keys", 10000),
+        )
+        
+        # 过载时的合成图降级
+        shed_config = self.config.get("load_shed", DEFAULT_CONFIG["load_shed"])
+        self.load_shedder = LoadShedder(
+            self.render_dispatcher,
+            sample_interval=shed_config.get("sample_interval", 0.5),
+            lag_thresholds_ms=tuple(shed_config.get("lag_thresholds_ms", [100, 250, 500])),
+            queue_thresholds=tuple(shed_config.get("queue_thresholds", [8, 16, 32])),
+            recover_samples=shed_config.get("recover_samples", 10),
+        )
+        
+        # 空闲时为活跃用户预取下一次十连
+        prefetch_config = self.config.get("prefetch", DEFAULT_CONFIG["prefetch"])
+        self.prefetcher = PrefetchCache(
+            self._prefetch_ten_pull,
+            lambda: self.load_shedder.level == LEVEL_NORMAL and self.render_dispatcher.queue_depth == 0,
+            max_entries=prefetch_config.get("max_entries", 256),
+            max_pending=prefetch_config.get("max_pending", 64),
+            ttl=prefetch_config.get("ttl", 600),
+        )
+        
+        # 启动后的资源预热
+        self.warmup = AssetWarmup(
+            self.images_dir,
+            self.tile_cache,
+            image_config.get("ten_pull_layout", {}).get("target_height", 120),
+            scheduler=self.scheduler,
+        )
+        
+        # 单抽图片转码缓存
+        single_config = image_config.get("single_pull", DEFAULT_CONFIG["image"]["single_pull"])
+        self.single_image_cache = SingleImageCache(
+            self.images_dir,
+            self.plugin_dir / "data" / "single_cache",
+            max_size=single_config.get("max_size", 256),
+            quality=single_config.get("quality", 85),
+            transcode=single_config.get("transcode", True),
+            asset_pack=self.asset_pack,
+        )
+        
+        # 单抽图片的平台媒体引用缓存
+        media_config = self.config.get("media_cache", DEFAULT_CONFIG["media_cache"])
+        self.media_cache = MediaHandleCache(
+            max_entries=media_config.get("max_entries", 1024),
+            ttl=media_config.get("ttl", 86400),
+        )
+        # 插件目录的公开URL前缀，配置后未注册上传实现的适配器直接按URL发送
+        self.media_url_base = (
+            media_config.get("url_base", "") if media_config.get("enabled", False) else ""
+        )
+        
+        # 全服抽卡事件日志
+        self.pull_log = self._create_pull_log()
+        
+        # 后台任务
+        self._background_tasks: list[asyncio.Task] = []
+        
     def _load_config(self) -> dict:
         """
         加载配置文件
@@ -175,8 +428,90 @@ class LimbusGachaPlugin(Star):
             pity_rates=pity_config.get("pity_rates"),
             pity_enabled=pity_config.get("enabled", True),
             pity_guarantee_rarity=pity_config.get("guarantee_rarity", "SS"),
+            available_rarities={identity.get("rarity") for identity in IDENTITIES},
         )
+    
+    def _validate_gacha_config(self) -> list[str]:
+        """
+        检查概率与卡池配置，发现的问题写入日志
+        
+        Returns:
+            问题描述列表
+        """
+        problems = self.gacha_core.validate_rates()
+        
+        # 卡池缺少某个稀有度时，抽到该稀有度会改从全部人格中抽取，实际出率随之偏离
+        rarities = set(self.gacha_core.effective_rates(False))
+        if self.gacha_core.pity_enabled:
+            rarities |= set(self.gacha_core.effective_rates(True))
+        for pool_name in self.config.get("pools", {}):
+            available = {identity.get("rarity") for identity in self._resolve_pool(pool_name)}
+            missing = sorted(rarity for rarity in rarities if rarity not in available)
+            if missing:
+                problems.append(f"卡池 {pool_name} 没有 {', '.join(missing)} 人格，抽到时将改从全部人格中抽取")
+        
+        for problem in problems:
+            logger.warning(f"概率配置问题：{problem}")
+        return problems
+    
+    def _create_luck_tracker(self) -> LuckTracker:
+        """
+        创建运气追踪器实例
+        
+        Returns:
+            LuckTracker 实例
+        """
+        tracker_config = self.config.get("luck_tracker", DEFAULT_CONFIG["luck_tracker"])
+        leaderboard_config = self.config.get("leaderboard", DEFAULT_CONFIG["leaderboard"])
+        
+        spill_store = None
+        if tracker_config.get("spill_enabled", True):
+            try:
+                spill_store = SpillStore(self.plugin_dir / "data" / "luck_spill.db")
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"创建溢出存储失败: {e}，淘汰的用户记录将被丢弃")
+        
+        return LuckTracker(
+            max_history=tracker_config.get("max_history", 500),
+            min_pulls_for_rate=leaderboard_config.get("min_pulls_for_rate", 50),
+            memory_budget=int(tracker_config.get("memory_budget_mb", 0) * 1024 * 1024),
+            idle_ttl=tracker_config.get("idle_ttl", 0),
+            spill_store=spill_store,
+            rarity_at=self.gacha_core.rarity_at if tracker_config.get("counter_rng", False) else None,
+            collection_book=self.collection_book,
+            activity=self.activity,
+        )
+    
+    def _create_luck_odds(self) -> LuckOdds:
+        """
+        按当前出率与欧皇评价窗口构建运气概率表
+        
+        Returns:
+            LuckOdds 实例
+        """
+        lucky_thresholds = self.config.get("luck_index", {}).get("lucky_thresholds", [])
+        windows = tuple(sorted({config.get("window", 10) for config in lucky_thresholds}))
+        return LuckOdds.from_core(self.gacha_core, windows=windows)
+    
+    def _create_pull_log(self) -> Optional[PullLog]:
+        """
+        创建全服抽卡事件日志
         
+        Returns:
+            PullLog 实例，未启用或创建失败时返回 None
+        """
+        log_config = self.config.get("pull_log", DEFAULT_CONFIG["pull_log"])
+        if not log_config.get("enabled", True):
+            return None
+        try:
+            return PullLog(
+                self.plugin_dir / "data" / "pull_log",
+                flush_bytes=log_config.get("flush_bytes", 65536),
+            )
+        except OSError as e:
+            logger.warning(f"创建抽卡日志失败: {e}，全服统计不可用")
+            return None
+    
     async def initialize(self):
         """插件初始化"""
         logger.info("边狱巴士人格抽取插件初始化完成")
@@ -184,28 +519,246 @@ class LimbusGachaPlugin(Star):
         if not self.images_dir.exists():
             logger.warning(f"图片目录不存在: {self.images_dir}，请创建并添加图片资源")
             self.images_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._start_background_task(self._evict_idle_users_loop())
+        self._start_background_task(self._run_warmup())
+        if self.config.get("load_shed", {}).get("enabled", True):
+            self._start_background_task(self.load_shedder.run())
+        if self.config.get("prefetch", {}).get("enabled", True):
+            self._start_background_task(self.prefetcher.run())
+        if self.pull_log is not None:
+            self._start_background_task(self._flush_pull_log_loop())
+        if self.config.get("rate_monitor", {}).get("enabled", True):
+            self._start_background_task(self._rate_monitor_loop())
+        
+        single_config = self.config.get("image", {}).get("single_pull", {})
+        if single_config.get("transcode", True) or self.asset_pack is not None:
+            self._start_background_task(self._build_single_image_cache())
     
-    def _get_image_path(self, image_name: str) -> Optional[str]:
+    def _start_background_task(self, coro) -> None:
+        """
+        启动后台任务，插件卸载时统一取消
+        
+        Args:
+            coro: 后台任务协程
+        """
+        self._background_tasks.append(asyncio.create_task(coro))
+    
+    async def _run_warmup(self):
+        """后台预热十连图块缓存，期间的指令照常处理"""
+        image_names = [identity["image"] for identity in IDENTITIES]
+        share_config = self.config.get("image", {}).get("shared_tiles", {})
+        shared_path = None
+        if share_config.get("enabled", True):
+            shared_path = Path(share_config.get("path") or self.plugin_dir / "data" / "shared_tiles.bin")
+            fingerprint = await self.scheduler.run(
+                LANE_RENDER, tiles_fingerprint, self.images_dir, image_names,
+                self.warmup.target_height, self.tile_cache.resample_tier, self.asset_pack,
+            )
+            # 其他进程已发布且未过期时直接映射，预热只需校验图片
+            await self._attach_shared_tiles(shared_path, fingerprint)
+        
+        await self.warmup.run(image_names)
+        report = self.warmup.format_report()
+        if self.warmup.missing or self.warmup.corrupt:
+            logger.warning(report)
+        else:
+            logger.info(report)
+        
+        if shared_path is not None and self.tile_cache.shared is None:
+            await self._publish_shared_tiles(shared_path, fingerprint, image_names)
+    
+    async def _attach_shared_tiles(self, path: Path, fingerprint: bytes) -> bool:
+        """
+        映射共享图块文件并接入图块缓存
+        
+        Args:
+            path: 共享文件路径
+            fingerprint: 期望的指纹
+            
+        Returns:
+            是否映射成功
+        """
+        shared = await self.scheduler.run(
+            LANE_RENDER, SharedTileSet.attach, path, self.images_dir, fingerprint
+        )
+        if shared is None:
+            return False
+        self.tile_cache.attach_shared(shared)
+        logger.info(f"已映射共享图块：{len(shared)}张，{shared.size_bytes / 1024 / 1024:.1f}MB")
+        return True
+    
+    async def _publish_shared_tiles(self, path: Path, fingerprint: bytes, image_names: list[str]):
+        """
+        将预热好的图块发布为共享文件，再改为映射共享文件并释放本地副本
+        
+        Args:
+            path: 共享文件路径
+            fingerprint: 图块集合的指纹
+            image_names: 图片文件名列表
+        """
+        try:
+            count = await self.scheduler.run(
+                LANE_RENDER, publish_tiles, path, self.images_dir, image_names,
+                self.warmup.target_height, fingerprint, self.tile_cache.get_or_load,
+            )
+        except OSError as e:
+            logger.warning(f"共享图块发布失败: {e}，继续使用本进程的图块缓存")
+            return
+        if not await self._attach_shared_tiles(path, fingerprint):
+            logger.warning(f"共享图块已发布（{count}张）但无法映射，继续使用本进程的图块缓存")
+    
+    async def _build_single_image_cache(self):
+        """在后台转码单抽图片，未完成前单抽直接使用原图"""
+        image_names = [identity["image"] for identity in IDENTITIES]
+        try:
+            stats = await self.scheduler.run(LANE_RENDER, self.single_image_cache.build, image_names)
+        except OSError as e:
+            logger.warning(f"单抽图片转码失败: {e}，将直接发送原图")
+            return
+        logger.info(
+            f"单抽图片缓存就绪：复用{stats['reused']}张，转码{stats['transcoded']}张，"
+            f"保留原图{stats['skipped']}张，缺失{stats['missing']}张"
+        )
+    
+    async def _flush_pull_log_loop(self):
+        """定期将攒批的抽卡日志写盘"""
+        interval = self.config.get("pull_log", {}).get("flush_interval", 5)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.pull_log.flush()
+            except OSError as e:
+                logger.warning(f"写入抽卡日志失败: {e}")
+    
+    async def _evict_idle_users_loop(self):
+        """定期将闲置用户移出内存"""
+        interval = self.config.get("luck_tracker", {}).get("evict_interval", 300)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = self.luck_tracker.evict_idle()
+            except sqlite3.Error as e:
+                logger.warning(f"淘汰闲置用户失败: {e}")
+            else:
+                if evicted:
+                    logger.info(f"已将 {evicted} 名闲置用户的抽卡记录移出内存")
+            # 顺带清理一周内没有抽卡的群活跃度计数
+            self.activity.prune()
+    
+    async def _rate_monitor_loop(self):
+        """定期检验抽卡引擎的实际出率，偏离配置概率时告警"""
+        interval = self.config.get("rate_monitor", {}).get("interval", 600)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self._check_rate_drift()
+            except Exception as e:
+                logger.warning(f"出率漂移检验失败: {e}")
+    
+    def _expected_pool_rates(self, pool_name: str, is_pity: bool) -> dict[str, float]:
+        """
+        卡池在当前配置与抽取模式下的实际概率（含缺少稀有度时落入备用池的部分）
+        
+        Args:
+            pool_name: 卡池名称
+            is_pity: 是否为保底抽取
+            
+        Returns:
+            {稀有度: 概率}
+        """
+        return self.gacha_core.pool_rates(
+            self._resolve_pool(pool_name), is_pity, IDENTITIES, self.luck_tracker.counter_mode
+        )
+    
+    def _check_rate_drift(self) -> None:
+        """对抽卡引擎的结果计数做一轮漂移检验并记录告警"""
+        # 重载配置会重建引擎，每轮重新取当前引擎的计数与期望概率
+        core = self.gacha_core
+        pools = self.config.get("pools", {})
+        expected = {
+            key: self._expected_pool_rates(*key)
+            for key in list(core.outcomes.counts) if key[0] in pools
+        }
+        alerts, recovered = self.rate_monitor.check(core.outcomes.counts, expected)
+        for alert in alerts:
+            label = "保底抽取" if alert["is_pity"] else "普通抽取"
+            observed = ", ".join(
+                f"{rarity} {count / alert['total'] * 100:.2f}%/{alert['expected'].get(rarity, 0) * 100:.2f}%"
+                for rarity, count in sorted(alert["observed"].items())
+            )
+            logger.warning(
+                f"出率漂移告警：卡池 {alert['pool']} 的{label}（最近{alert['total']}抽）偏离配置概率，"
+                f"χ²={alert['statistic']:.2f} 自由度={alert['dof']} p={alert['p_value']:.3g}；"
+                f"实际/期望：{observed}；累计备用池抽取 {core.outcomes.fallbacks.get(alert['pool'], 0)} 次"
+            )
+        for pool_name, is_pity in recovered:
+            logger.info(f"出率漂移解除：卡池 {pool_name} 的{'保底' if is_pity else '普通'}抽取已回到置信界内")
+    
+    def _open_asset_pack(self, pack_name: str) -> Optional[AssetPack]:
+        """
+        映射图片资源包，不存在或损坏时回退到 images/ 下的散装文件
+        
+        Args:
+            pack_name: 资源包路径（相对插件目录），留空表示不使用资源包
+            
+        Returns:
+            AssetPack 实例或 None
+        """
+        if not pack_name:
+            return None
+        pack_path = self.plugin_dir / pack_name
+        if not pack_path.exists():
+            return None
+        asset_pack = AssetPack.open(pack_path, self.images_dir)
+        if asset_pack is None:
+            logger.warning(f"图片资源包无法读取: {pack_path}，将使用 {IMAGES_DIR}/ 下的散装文件")
+        else:
+            logger.info(f"已映射图片资源包：{len(asset_pack)}张图片")
+        return asset_pack
+    
+    def _has_image(self, image_path: Path, on_disk: bool) -> bool:
+        """图片是否存在于散装文件或资源包中"""
+        if image_path.exists():
+            return True
+        return not on_disk and self.asset_pack is not None and str(image_path) in self.asset_pack
+    
+    def _get_image_path(self, image_name: str, on_disk: bool = False) -> Optional[str]:
         """
         获取人格头像图片的完整路径
         
+        资源包中的图片同样以 images/ 下的路径标识，渲染时从资源包解码。
+        
         Args:
             image_name: 图片文件名
+            on_disk: 只接受磁盘上实际存在的文件（用于直接发送文件）
             
         Returns:
             图片完整路径，如果图片不存在则返回默认图片路径或 None
         """
         image_path = self.images_dir / image_name
-        if image_path.exists():
+        if self._has_image(image_path, on_disk):
             return str(image_path)
         
         # 尝试使用默认图片
         default_path = self.images_dir / DEFAULT_IMAGE
-        if default_path.exists():
+        if self._has_image(default_path, on_disk):
             return str(default_path)
         
         return None
     
+    def _get_single_image_path(self, image_name: str) -> Optional[str]:
+        """
+        获取单抽发送用的图片路径，优先使用转码后的缓存版本
+        
+        Args:
+            image_name: 图片文件名
+            
+        Returns:
+            图片路径，如果图片不存在则返回 None
+        """
+        return self.single_image_cache.get(image_name) or self._get_image_path(image_name, on_disk=True)
+    
     def _get_user_pool(self, user_id: str) -> tuple[str, list[dict]]:
         """
         获取用户当前的卡池
@@ -217,27 +770,38 @@ class LimbusGachaPlugin(Star):
             (卡池名称, 卡池人格列表)
         """
         pool_name = self.user_pools.get(user_id, self.config.get("default_pool", "常驻池"))
-        pools_config = self.config.get("pools", {})
         
-        if pool_name not in pools_config:
+        if pool_name not in self.config.get("pools", {}):
             pool_name = self.config.get("default_pool", "常驻池")
         
-        pool_config = pools_config.get(pool_name, {})
+        return pool_name, self._resolve_pool(pool_name)
+    
+    def _resolve_pool(self, pool_name: str) -> list[dict]:
+        """
+        获取卡池包含的人格列表
+        
+        Args:
+            pool_name: 卡池名称
+            
+        Returns:
+            卡池人格列表
+        """
+        pool_config = self.config.get("pools", {}).get(pool_name, {})
         pool_filter = pool_config.get("filter")
         
         if pool_filter is None:
             # 常驻池，包含所有人格
-            return pool_name, IDENTITIES
+            return IDENTITIES
         
         filter_type = pool_filter.get("type")
         filter_value = pool_filter.get("value")
         
         if filter_type == "sinner":
             # 罪人专属池
-            return pool_name, get_identities_by_sinner(filter_value)
+            return get_identities_by_sinner(filter_value)
         
         # 默认返回所有人格
-        return pool_name, IDENTITIES
+        return IDENTITIES
     
     def _get_user_id(self, event: AstrMessageEvent) -> str:
         """
@@ -251,22 +815,178 @@ class LimbusGachaPlugin(Star):
         """
         return str(event.get_sender_id())
     
+    def _get_group_id(self, event: AstrMessageEvent) -> Optional[str]:
+        """
+        获取群ID
+        
+        Args:
+            event: 消息事件
+            
+        Returns:
+            群ID字符串，私聊时返回 None
+        """
+        group_id = event.get_group_id()
+        if not group_id:
+            return None
+        return str(group_id)
+    
+    def _check_duplicate(self, event: AstrMessageEvent) -> tuple[Optional[str], bool, Optional[str]]:
+        """
+        检查消息是否为重复投递
+        
+        Args:
+            event: 消息事件
+            
+        Returns:
+            (消息标识, 是否重复, 可用于作答的原回复文字)，未启用去重或消息无法标识时标识为 None
+        """
+        dedup_config = self.config.get("dedup", {})
+        if not dedup_config.get("enabled", True):
+            return None, False, None
+        
+        key = self.deduplicator.event_key(event)
+        if key is None:
+            return None, False, None
+        duplicate, cached_text = self.deduplicator.check(key)
+        if duplicate:
+            logger.info(f"拦截重复投递的消息: {key}")
+            if not dedup_config.get("reply_cached", True):
+                cached_text = None
+        return key, duplicate, cached_text
+    
+    def _check_throttle(self, event: AstrMessageEvent, command: str) -> tuple[bool, Optional[str]]:
+        """
+        检查抽卡请求是否超出频率限制
+        
+        Args:
+            event: 消息事件
+            command: 指令类型（single / ten / hundred），用于查找令牌消耗
+            
+        Returns:
+            (是否放行, 被拒绝时的提示文字)，连续被拒时只有第一次附带提示
+        """
+        throttle_config = self.config.get("throttle", {})
+        if not throttle_config.get("enabled", True):
+            return True, None
+        
+        cost = throttle_config.get("costs", DEFAULT_CONFIG["throttle"]["costs"]).get(command, 1)
+        allowed, notice_scope, wait = self.throttler.acquire(
+            self._get_user_id(event), event.get_group_id() or None, cost
+        )
+        if allowed or notice_scope is None:
+            return allowed, None
+        wait_seconds = max(1, round(wait))
+        if notice_scope == SCOPE_USER:
+            return False, f"⏳ 抽得太快啦，请 {wait_seconds} 秒后再试"
+        return False, f"⏳ 本群抽卡过于频繁，请 {wait_seconds} 秒后再试"
+    
+    def _draw_pulls(
+        self,
+        user_id: str,
+        pool_name: str,
+        pool: list[dict],
+        count: int,
+        outcomes: Optional[OutcomeCounter] = None
+    ) -> tuple[list[dict], list[bool]]:
+        """
+        为用户执行抽取
+        
+        Args:
+            user_id: 用户ID
+            pool_name: 卡池名称
+            pool: 当前卡池
+            count: 抽取次数，1 为单抽，其余按每10抽一次十连计算保底
+            outcomes: 记录结果的计数器，None 表示抽卡引擎自身的计数器
+            
+        Returns:
+            (抽取结果列表, 每次抽取是否为保底抽取)
+        """
+        if self.luck_tracker.counter_mode:
+            # 计数器模式：结果由用户种子与抽卡序号决定，可随时重新生成核对
+            seed, start = self.luck_tracker.get_counter_state(user_id)
+            indices = range(start, start + count)
+            results = [
+                self.gacha_core.draw_counter(pool, seed, index, IDENTITIES, pool_name, outcomes)
+                for index in indices
+            ]
+            return results, [self.gacha_core.is_counter_pity(index) for index in indices]
+        
+        if count == 1:
+            return [self.gacha_core.draw_single(
+                pool, fallback_pool=IDENTITIES, pool_name=pool_name, outcomes=outcomes
+            )], [False]
+        
+        results = []
+        for _ in range(count // 10):
+            results.extend(self.gacha_core.draw_multiple(
+                pool, count=10, fallback_pool=IDENTITIES, pool_name=pool_name, outcomes=outcomes
+            ))
+        # 每次十连的第10抽为保底抽取
+        pity_flags = [self.gacha_core.pity_enabled and i % 10 == 9 for i in range(len(results))]
+        return results, pity_flags
+    
+    def _record_results(
+        self,
+        event: AstrMessageEvent,
+        user_id: str,
+        pool_name: str,
+        results: list[dict],
+        pity_flags: list[bool]
+    ) -> None:
+        """
+        记录抽卡结果到运气追踪器与全服日志
+        
+        Args:
+            event: 消息事件
+            user_id: 用户ID
+            pool_name: 卡池名称
+            results: 抽取结果列表
+            pity_flags: 每次抽取是否为保底抽取
+        """
+        group_id = self._get_group_id(event)
+        self.luck_tracker.record_pulls(user_id, results, group_id, pity_flags, event.get_sender_name())
+        
+        if self.pull_log is not None:
+            self.pull_log.append(user_id, group_id, pool_name, [
+                (get_identity_id(result), result.get("rarity", ""), is_pity)
+                for result, is_pity in zip(results, pity_flags)
+            ])
+    
     @filter.command("tq单抽")
     async def gacha_single(self, event: AstrMessageEvent):
         """边狱巴士单抽 - 模拟单次人格抽取"""
+        dedup_key, duplicate, cached_text = self._check_duplicate(event)
+        if duplicate:
+            if cached_text is not None:
+                yield event.plain_result(cached_text)
+            return
+        
+        allowed, notice = self._check_throttle(event, "single")
+        if not allowed:
+            if notice is not None:
+                yield event.plain_result(notice)
+            return
+        
         user_id = self._get_user_id(event)
         pool_name, pool = self._get_user_pool(user_id)
         
-        result = self.gacha_core.draw_single(pool, fallback_pool=IDENTITIES)
+        results, pity_flags = self._draw_pulls(user_id, pool_name, pool, 1)
+        result = results[0]
         
         # 记录抽卡结果
-        self.luck_tracker.record_pull(user_id, result.get("rarity", ""))
+        self._record_results(event, user_id, pool_name, results, pity_flags)
         
         # 构建结果消息
         result_text = format_single_pull_result(result)
+        if dedup_key is not None:
+            self.deduplicator.remember_response(dedup_key, result_text)
         
-        # 尝试获取图片
-        image_path = self._get_image_path(result.get("image", ""))
+        # 尝试获取图片（优先使用尺寸压缩后的缓存版本）
+        image_name = result.get("image", "")
+        image_path = self._get_single_image_path(image_name)
+        
+        if image_path and await self._send_with_media_handle(event, result_text, image_name, image_path):
+            return
         
         if image_path:
             # 如果图片存在，发送图片和文字
@@ -278,6 +998,52 @@ class LimbusGachaPlugin(Star):
             # 如果图片不存在，只发送文字
             yield event.plain_result(result_text + "\n\n(图片资源未配置)")
     
+    async def _send_with_media_handle(
+        self,
+        event: AstrMessageEvent,
+        text: str,
+        image_name: str,
+        image_path: str
+    ) -> bool:
+        """
+        使用平台媒体引用或公开URL发送单抽结果，发送失败时作废该引用
+        
+        Args:
+            event: 消息事件
+            text: 结果文字
+            image_name: 图片文件名
+            image_path: 单抽发送用的图片路径
+            
+        Returns:
+            是否已发送；返回 False 时调用方应按普通文件发送
+        """
+        platform = event.get_platform_name()
+        if not self.media_cache.supports(platform):
+            if not self.media_url_base:
+                return False
+            url = static_url(self.media_url_base, self.plugin_dir, image_path)
+            if url is None:
+                return False
+            try:
+                await event.send(MessageChain([Plain(text), Image.fromURL(url)]))
+            except Exception as e:
+                logger.warning(f"按URL发送单抽图片失败: {e}，改为上传原文件")
+                return False
+            return True
+        
+        content_key = self.single_image_cache.get_content_key(image_name) or image_path
+        handle = await self.media_cache.resolve(platform, content_key, image_path)
+        if handle is None:
+            return False
+        
+        try:
+            await event.send(MessageChain([Plain(text), Image(file=handle)]))
+        except Exception as e:
+            logger.warning(f"使用媒体引用发送单抽图片失败: {e}，改为上传原文件")
+            self.media_cache.invalidate(platform, content_key)
+            return False
+        return True
+    
     @filter.command("tq抽卡")
     async def gacha_single_alias(self, event: AstrMessageEvent):
         """边狱巴士抽卡 - 单抽的别名指令"""
@@ -287,38 +1053,198 @@ class LimbusGachaPlugin(Star):
     @filter.command("tq十连")
     async def gacha_ten(self, event: AstrMessageEvent):
         """边狱巴士十连 - 模拟十连抽取"""
+        async for result in self._multi_pull(event, 1, "ten_pull_layout", "边狱巴士十连抽取"):
+            yield result
+    
+    @filter.command("tq百连")
+    async def gacha_hundred(self, event: AstrMessageEvent):
+        """边狱巴士百连 - 连续进行十次十连，结果汇总为一张图"""
+        async for result in self._multi_pull(event, 10, "hundred_pull_layout", "边狱巴士百连抽取"):
+            yield result
+    
+    async def _render_results(
+        self,
+        results: list[dict],
+        layout: dict,
+        target_height: Optional[int],
+        cached_only: bool = False,
+        scale: float = 1.0
+    ) -> Optional[str]:
+        """
+        按布局配置的顺序将抽取结果合成为网格图片
+        
+        Args:
+            results: 抽取结果列表
+            layout: 布局配置
+            target_height: 目标图片高度
+            cached_only: 只使用已缓存的图块
+            scale: 合成前对图块的缩放比例
+            
+        Returns:
+            合成图片的临时文件路径，如果失败则返回 None
+        """
+        # 按配置的顺序收集存在的图片路径
+        image_paths = []
+        for result in self.gacha_core.order_results(results, layout.get("order", ORDER_DRAW)):
+            image_path = self._get_image_path(result.get("image", ""))
+            if image_path:
+                image_paths.append(image_path)
+        
+        return await self.render_dispatcher.submit(
+            image_paths,
+            rows=layout.get("rows"),
+            cols=layout.get("cols", 5),
+            spacing=layout.get("spacing", 5),
+            target_height=target_height,
+            cached_only=cached_only,
+            scale=scale,
+        )
+    
+    async def _prefetch_ten_pull(self, user_id: str, pool_name: str) -> Optional[dict]:
+        """
+        预先抽取并渲染用户的下一次十连（由预取缓存在空闲时调用）
+        
+        Args:
+            user_id: 用户ID
+            pool_name: 卡池名称
+            
+        Returns:
+            预取结果，用户已切换卡池时返回 None
+        """
+        current_pool, pool = self._get_user_pool(user_id)
+        if current_pool != pool_name:
+            return None
+        
+        counter_start = self.luck_tracker.get_counter_state(user_id)[1] if self.luck_tracker.counter_mode else None
+        # 结果先计入单独的计数器，被使用时才并入出率监控的计数
+        outcomes = OutcomeCounter()
+        results, pity_flags = self._draw_pulls(user_id, pool_name, pool, 10, outcomes)
+        layout = self.config.get("image", {}).get("ten_pull_layout", DEFAULT_CONFIG["image"]["ten_pull_layout"])
+        composite_path = await self._render_results(results, layout, layout.get("target_height", 120))
+        return {
+            "results": results,
+            "pity_flags": pity_flags,
+            "composite_path": composite_path,
+            "counter_start": counter_start,
+            "outcomes": outcomes,
+        }
+    
+    def _take_prefetched(self, user_id: str, pool_name: str) -> Optional[dict]:
+        """
+        取出可用的十连预取结果
+        
+        Args:
+            user_id: 用户ID
+            pool_name: 卡池名称
+            
+        Returns:
+            预取结果，没有可用结果时返回 None
+        """
+        if not self.config.get("prefetch", {}).get("enabled", True):
+            return None
+        entry = self.prefetcher.take(user_id, pool_name)
+        if entry is None:
+            return None
+        # 计数器模式下结果由抽卡序号决定，期间有其他抽卡时预取结果失效
+        if entry["counter_start"] is not None and entry["counter_start"] != self.luck_tracker.get_counter_state(user_id)[1]:
+            self.prefetcher.discard(entry)
+            return None
+        return entry
+    
+    async def _multi_pull(self, event: AstrMessageEvent, ten_pulls: int, layout_key: str, title: str):
+        """
+        执行若干次十连并发送文字结果与网格合成图
+        
+        Args:
+            event: 消息事件
+            ten_pulls: 十连次数（每次十连独立计算保底）
+            layout_key: image 配置中的布局配置名
+            title: 结果标题
+        """
+        dedup_key, duplicate, cached_text = self._check_duplicate(event)
+        if duplicate:
+            if cached_text is not None:
+                yield event.plain_result(cached_text)
+            return
+        
+        allowed, notice = self._check_throttle(event, "ten" if ten_pulls == 1 else "hundred")
+        if not allowed:
+            if notice is not None:
+                yield event.plain_result(notice)
+            return
+        
         user_id = self._get_user_id(event)
         pool_name, pool = self._get_user_pool(user_id)
         
-        results = self.gacha_core.draw_multiple(pool, count=10, fallback_pool=IDENTITIES)
+        # 十连优先使用空闲时预取的结果
+        prefetched = self._take_prefetched(user_id, pool_name) if ten_pulls == 1 else None
+        if prefetched is not None:
+            results, pity_flags = prefetched["results"], prefetched["pity_flags"]
+            self.gacha_core.outcomes.merge(prefetched["outcomes"])
+        else:
+            results, pity_flags = self._draw_pulls(user_id, pool_name, pool, ten_pulls * 10)
         
         # 记录抽卡结果
-        self.luck_tracker.record_pulls(user_id, results)
+        self._record_results(event, user_id, pool_name, results, pity_flags)
+        if ten_pulls == 1 and self.config.get("prefetch", {}).get("enabled", True):
+            self.prefetcher.schedule(user_id, pool_name)
         
         # 统计稀有度
         rarity_count = self.gacha_core.count_by_rarity(results)
         
         # 构建精简版结果消息
-        result_text = format_ten_pull_result(results, rarity_count, RARITY_SSS, pool_name)
+        result_text = format_ten_pull_result(results, rarity_count, RARITY_SSS, pool_name, title)
+        if dedup_key is not None:
+            self.deduplicator.remember_response(dedup_key, result_text)
         
-        # 收集存在的图片路径
-        image_paths = []
-        for result in results:
-            image_path = self._get_image_path(result.get("image", ""))
-            if image_path:
-                image_paths.append(image_path)
+        if prefetched is not None and prefetched["composite_path"]:
+            yield event.chain_result([
+                Plain(result_text),
+                Image.fromFileSystem(prefetched["composite_path"])
+            ])
+            cleanup_temp_file(prefetched["composite_path"])
+            return
+        
+        # 过载时只发送文字
+        shed_level = self.load_shedder.level
+        if shed_level != LEVEL_NORMAL:
+            self.load_shedder.record_shed(shed_level)
+        if shed_level >= LEVEL_TEXT_ONLY:
+            yield event.plain_result(result_text)
+            return
         
         # 获取图片布局配置
-        image_config = self.config.get("image", {}).get("ten_pull_layout", {})
+        image_config = self.config.get("image", {})
+        layout = image_config.get(layout_key, DEFAULT_CONFIG["image"][layout_key])
+        # 降级时图块仍按原高度加载（命中图块缓存），合成前再缩小；仅缓存图块等级同样缩小
+        scale = 1.0
+        if shed_level >= LEVEL_REDUCED:
+            scale = min(1.0, self.config.get("load_shed", {}).get("reduced_height_scale", 0.6))
         
-        # 创建网格布局的合成图片（2行5列）
-        composite_path = create_grid_composite(
-            image_paths,
-            rows=image_config.get("rows", 2),
-            cols=image_config.get("cols", 5),
-            spacing=image_config.get("spacing", 5),
-            target_height=image_config.get("target_height", 120),
-        )
+        # 创建网格布局的合成图片，由调度器合并同一时间窗口内的请求
+        render_task = asyncio.create_task(self._render_results(
+            results, layout, layout.get("target_height", 120),
+            cached_only=shed_level == LEVEL_CACHED_ONLY, scale=scale,
+        ))
+        
+        if image_config.get("two_phase_response", False):
+            # 两段式回复：先发文字，合成图在后台完成后追加发送
+            deadline = asyncio.get_running_loop().time() + image_config.get("followup_deadline", 10)
+            yield event.plain_result(result_text)
+            
+            try:
+                timeout = max(0, deadline - asyncio.get_running_loop().time())
+                composite_path = await asyncio.wait_for(render_task, timeout)
+            except asyncio.TimeoutError:
+                logger.info("合成图未能在截止时间内完成，已放弃发送")
+                return
+            
+            if composite_path:
+                yield event.chain_result([Image.fromFileSystem(composite_path)])
+                cleanup_temp_file(composite_path)
+            return
+        
+        composite_path = await render_task
         
         if composite_path:
             # 发送文字 + 网格布局的合成图片
@@ -328,6 +1254,9 @@ class LimbusGachaPlugin(Star):
             ])
             # 清理临时文件
             cleanup_temp_file(composite_path)
+        elif shed_level == LEVEL_CACHED_ONLY:
+            # 降级期间缺少已缓存的图块，只发送文字
+            yield event.plain_result(result_text)
         else:
             # 如果没有图片或合成失败，只发送文字
             yield event.plain_result(result_text + "\n(图片资源未配置)")
@@ -335,50 +1264,109 @@ class LimbusGachaPlugin(Star):
     @filter.command("tq非酋指数")
     async def unlucky_index(self, event: AstrMessageEvent):
         """非酋指数 - 查看非酋评级"""
+        async with self.scheduler.lane(LANE_FAST):
+            result_text = self._unlucky_index_text(event)
+        yield event.plain_result(result_text)
+    
+    def _unlucky_index_text(self, event: AstrMessageEvent) -> str:
+        """生成非酋指数评测文字"""
         user_id = self._get_user_id(event)
         
         total_pulls = self.luck_tracker.get_total_pulls(user_id)
         if total_pulls == 0:
-            yield event.plain_result("📊 非酋指数评测 📊\n\n你还没有抽过卡，快去抽几发吧！")
-            return
+            return "📊 非酋指数评测 📊\n\n你还没有抽过卡，快去抽几发吧！"
         
         thresholds = self.config.get("luck_index", {}).get("unlucky_thresholds", [])
         rating, message, pulls_since_sss = self.luck_tracker.evaluate_unlucky(user_id, thresholds)
         sss_rate = self.luck_tracker.get_sss_rate(user_id)
+        pity_pulls = self.luck_tracker.get_pity_pulls(user_id, pulls_since_sss)
+        rarer = rarer_than(self.luck_odds.drought_probability(pulls_since_sss, pity_pulls))
         
-        result_text = format_unlucky_index(rating, message, pulls_since_sss, total_pulls, sss_rate)
-        yield event.plain_result(result_text)
+        percentiles = self.luck_tracker.get_luck_percentiles(user_id, event.get_group_id())
+        
+        return format_unlucky_index(
+            rating, message, pulls_since_sss, total_pulls, sss_rate, rarer,
+            percentiles["group_drought"], percentiles["server_drought"]
+        )
     
     @filter.command("tq欧皇指数")
     async def lucky_index(self, event: AstrMessageEvent):
         """欧皇指数 - 查看欧皇评级"""
+        async with self.scheduler.lane(LANE_FAST):
+            result_text = self._lucky_index_text(event)
+        yield event.plain_result(result_text)
+    
+    def _lucky_index_text(self, event: AstrMessageEvent) -> str:
+        """生成欧皇指数评测文字"""
         user_id = self._get_user_id(event)
         
         total_pulls = self.luck_tracker.get_total_pulls(user_id)
         if total_pulls == 0:
-            yield event.plain_result("📊 欧皇指数评测 📊\n\n你还没有抽过卡，快去抽几发吧！")
-            return
+            return "📊 欧皇指数评测 📊\n\n你还没有抽过卡，快去抽几发吧！"
         
         thresholds = self.config.get("luck_index", {}).get("lucky_thresholds", [])
         rating, message, sss_count, window = self.luck_tracker.evaluate_lucky(user_id, thresholds)
         sss_rate = self.luck_tracker.get_sss_rate(user_id)
+        # 抽数不足窗口大小时按实际抽数计算概率
+        pulls = min(window, total_pulls)
+        pity_pulls = self.luck_tracker.get_pity_pulls(user_id, pulls)
+        rarer = rarer_than(self.luck_odds.window_probability(sss_count, pulls, pity_pulls))
+        
+        percentiles = self.luck_tracker.get_luck_percentiles(user_id, event.get_group_id())
         
-        result_text = format_lucky_index(rating, message, sss_count, window, total_pulls, sss_rate)
+        return format_lucky_index(
+            rating, message, sss_count, window, total_pulls, sss_rate, rarer,
+            percentiles["group_rate"], percentiles["server_rate"]
+        )
+    
+    @filter.command("tq今日")
+    async def daily_activity(self, event: AstrMessageEvent):
+        """今日统计 - 查看今天的抽数与★★★数"""
+        async with self.scheduler.lane(LANE_FAST):
+            user_id = self._get_user_id(event)
+            group_id = event.get_group_id()
+            today = self.activity.today()
+            
+            group_today = self.activity.group_day(str(group_id), today) if group_id else None
+            user_today = self.luck_tracker.get_daily_activity(user_id, [today])[0]
+            result_text = format_daily_activity(user_today, group_today)
+        yield event.plain_result(result_text)
+    
+    @filter.command("tq本周")
+    async def weekly_activity(self, event: AstrMessageEvent):
+        """本周统计 - 查看本周每天的抽数与★★★数"""
+        async with self.scheduler.lane(LANE_FAST):
+            user_id = self._get_user_id(event)
+            group_id = event.get_group_id()
+            today = self.activity.today()
+            
+            # 本周一至今天
+            days = range(today - weekday(today), today + 1)
+            user_days = self.luck_tracker.get_daily_activity(user_id, days)
+            group_days = [self.activity.group_day(str(group_id), day) for day in days] if group_id else None
+            result_text = format_weekly_activity(user_days, group_days)
         yield event.plain_result(result_text)
     
     @filter.command("tq池列表")
     async def pool_list(self, event: AstrMessageEvent):
         """卡池列表 - 查看可用卡池"""
-        user_id = self._get_user_id(event)
-        current_pool = self.user_pools.get(user_id, self.config.get("default_pool", "常驻池"))
-        pools = self.config.get("pools", {})
-        
-        result_text = format_pool_list(pools, current_pool)
+        async with self.scheduler.lane(LANE_FAST):
+            user_id = self._get_user_id(event)
+            current_pool = self.user_pools.get(user_id, self.config.get("default_pool", "常驻池"))
+            pools = self.config.get("pools", {})
+            
+            result_text = format_pool_list(pools, current_pool)
         yield event.plain_result(result_text)
     
     @filter.command("tq切池")
     async def switch_pool(self, event: AstrMessageEvent):
         """切换卡池 - 切换当前使用的卡池"""
+        async with self.scheduler.lane(LANE_FAST):
+            result_text = self._switch_pool_text(event)
+        yield event.plain_result(result_text)
+    
+    def _switch_pool_text(self, event: AstrMessageEvent) -> str:
+        """切换卡池并生成结果文字"""
         user_id = self._get_user_id(event)
         
         # 获取目标卡池名称
@@ -386,24 +1374,285 @@ class LimbusGachaPlugin(Star):
         # 移除指令前缀，获取卡池名称
         parts = message_text.split(maxsplit=1)
         if len(parts) < 2:
-            yield event.plain_result("❌ 请指定要切换的卡池名称\n用法：/tq切池 池名\n使用 /tq池列表 查看可用卡池")
-            return
+            return "❌ 请指定要切换的卡池名称\n用法：/tq切池 池名\n使用 /tq池列表 查看可用卡池"
         
         target_pool = parts[1].strip()
         pools = self.config.get("pools", {})
         
         if target_pool not in pools:
-            yield event.plain_result(format_pool_switch_result(target_pool, False, f"卡池 {target_pool} 不存在"))
-            return
+            return format_pool_switch_result(target_pool, False, f"卡池 {target_pool} 不存在")
         
         if not pools[target_pool].get("enabled", True):
-            yield event.plain_result(format_pool_switch_result(target_pool, False, f"卡池 {target_pool} 已禁用"))
-            return
+            return format_pool_switch_result(target_pool, False, f"卡池 {target_pool} 已禁用")
         
         self.user_pools[user_id] = target_pool
+        self.prefetcher.invalidate_user(user_id)
         pool_desc = pools[target_pool].get("description", "")
-        yield event.plain_result(format_pool_switch_result(target_pool, True, pool_desc))
+        return format_pool_switch_result(target_pool, True, pool_desc)
+    
+    @filter.command("tq排行")
+    async def group_leaderboard(self, event: AstrMessageEvent):
+        """群排行 - 查看本群抽卡排行"""
+        group_id = event.get_group_id()
+        if not group_id:
+            yield event.plain_result("❌ 排行榜仅在群聊中可用")
+            return
+        
+        leaderboard_config = self.config.get("leaderboard", {})
+        boards = self.luck_tracker.get_group_leaderboard(
+            str(group_id), leaderboard_config.get("top_k", 10)
+        )
+        if boards is None:
+            yield event.plain_result("🏆 本群抽卡排行 🏆\n\n本群还没有人抽过卡，快来抢占榜首吧！")
+            return
+        
+        user_ids = list({user_id for entries in boards.values() for user_id, _ in entries})
+        result_text = format_leaderboard(
+            boards, self.luck_tracker.get_user_names(user_ids), self.luck_tracker.min_pulls_for_rate
+        )
+        yield event.plain_result(result_text)
+    
+    def _pull_rarity_probs(self) -> dict[str, float]:
+        """
+        每抽落在各稀有度的平均概率（十连中9次普通抽取与1次保底抽取的平均）
+        
+        Returns:
+            {稀有度: 概率}
+        """
+        normal = self.gacha_core.effective_rates()
+        if not self.gacha_core.pity_enabled:
+            return normal
+        pity = self.gacha_core.effective_rates(True)
+        return {
+            rarity: (normal.get(rarity, 0.0) * 9 + pity.get(rarity, 0.0)) / 10
+            for rarity in set(normal) | set(pity)
+        }
+    
+    async def _get_collector_estimate(self, pool_name: str) -> CollectorEstimate:
+        """
+        获取卡池的集齐期望抽数表，首次查询时在线程池中计算
+        
+        Args:
+            pool_name: 卡池名称
+            
+        Returns:
+            CollectorEstimate 实例
+        """
+        estimate = self.collector_estimates.get(pool_name)
+        if estimate is None:
+            estimate = await self.scheduler.run(
+                LANE_RENDER, CollectorEstimate, self._resolve_pool(pool_name), self._pull_rarity_probs()
+            )
+            self.collector_estimates[pool_name] = estimate
+        return estimate
+    
+    @filter.command("tq图鉴")
+    async def collection(self, event: AstrMessageEvent):
+        """人格图鉴 - 查看已收集的人格与集齐进度"""
+        user_id = self._get_user_id(event)
+        user_collection = self.luck_tracker.get_collection(user_id)
+        if user_collection is None:
+            yield event.plain_result("📖 人格图鉴 📖\n\n你还没有抽过卡，快去抽几发吧！")
+            return
+        
+        parts = event.message_str.strip().split(maxsplit=1)
+        sinner = parts[1].strip() if len(parts) > 1 else None
+        if sinner is not None and sinner not in SINNERS:
+            yield event.plain_result(f"❌ 罪人 {sinner} 不存在\n用法：/tq图鉴 或 /tq图鉴 罪人名")
+            return
+        
+        pool_name, _ = self._get_user_pool(user_id)
+        estimate = await self._get_collector_estimate(pool_name)
+        yield event.plain_result(format_collection(
+            user_collection, IDENTITIES, pool_name,
+            estimate.progress(user_collection.owned),
+            estimate.expected_remaining(user_collection.owned),
+            sinner,
+        ))
+    
+    def _check_export_cooldown(self, user_id: str) -> Optional[int]:
+        """
+        检查导出冷却，未在冷却中时记录本次导出时间
+        
+        Args:
+            user_id: 用户ID
+            
+        Returns:
+            仍需等待的秒数，可以导出时返回 None
+        """
+        cooldown = self.config.get("export", {}).get("cooldown", 300)
+        now = time.monotonic()
+        last = self._export_times.get(user_id)
+        if last is not None and now - last < cooldown:
+            return max(1, round(cooldown - (now - last)))
+        
+        # 顺带移除已过冷却期的记录
+        for key in [key for key, value in self._export_times.items() if now - value >= cooldown]:
+            del self._export_times[key]
+        self._export_times[user_id] = now
+        return None
+    
+    @filter.command("tq导出")
+    async def export_pulls(self, event: AstrMessageEvent):
+        """导出记录 - 导出自己的全部抽卡记录与汇总统计"""
+        export_config = self.config.get("export", DEFAULT_CONFIG["export"])
+        if self.pull_log is None or not export_config.get("enabled", True):
+            yield event.plain_result("❌ 抽卡记录导出未启用")
+            return
+        
+        parts = event.message_str.strip().split(maxsplit=1)
+        fmt = parts[1].strip().lower() if len(parts) > 1 else export_config.get("format", "csv")
+        if fmt not in FORMAT_SUFFIXES:
+            yield event.plain_result(f"❌ 不支持的导出格式 {fmt}\n用法：/tq导出 或 /tq导出 csv/jsonl")
+            return
+        
+        user_id = self._get_user_id(event)
+        wait = self._check_export_cooldown(user_id)
+        if wait is not None:
+            yield event.plain_result(f"⏳ 导出过于频繁，请 {wait} 秒后再试")
+            return
+        
+        self.pull_log.flush()
+        suffix = export_suffix(fmt)
+        fd, export_path = tempfile.mkstemp(prefix="limbus_export_", suffix=suffix)
+        os.close(fd)
+        try:
+            pool_names = {pool_id(name): name for name in self.config.get("pools", {})}
+            summary = await self.scheduler.run(
+                LANE_RENDER, export_user_pulls, self.pull_log, user_id, export_path,
+                pool_names, IDENTITIES, fmt, export_config.get("max_bytes", 5242880),
+            )
+        except OSError as e:
+            logger.warning(f"导出抽卡记录失败: {e}")
+            cleanup_temp_file(export_path)
+            yield event.plain_result("❌ 导出失败，请稍后再试")
+            return
+        
+        if summary["total"] == 0:
+            cleanup_temp_file(export_path)
+            yield event.plain_result("📤 抽卡记录导出 📤\n\n你还没有抽卡记录，快去抽几发吧！")
+            return
+        
+        file_name = f"limbus_pulls_{time.strftime('%Y%m%d')}{suffix}"
+        yield event.chain_result([
+            Plain(format_export_summary(summary)),
+            File(name=file_name, file=export_path),
+        ])
+        cleanup_temp_file(export_path)
+    
+    async def _compute_pull_stats(self) -> Optional[dict]:
+        """
+        在线程池中统计全服抽卡日志
+        
+        Returns:
+            统计结果，日志未启用时返回 None
+        """
+        if self.pull_log is None:
+            return None
+        self.pull_log.flush()
+        days = self.config.get("pull_log", {}).get("stats_days", 7)
+        return await self.scheduler.run(LANE_RENDER, compute_stats, self.pull_log, days)
+    
+    @filter.command("tq全服统计")
+    async def server_stats(self, event: AstrMessageEvent):
+        """全服统计 - 查看全服抽卡数据"""
+        stats = await self._compute_pull_stats()
+        if stats is None:
+            yield event.plain_result("❌ 全服抽卡日志未启用")
+            return
+        
+        pool_names = {pool_id(name): name for name in self.config.get("pools", {})}
+        days = self.config.get("pull_log", {}).get("stats_days", 7)
+        yield event.plain_result(format_server_stats(stats, pool_names, IDENTITIES, days))
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("tq概率校验")
+    async def rate_check(self, event: AstrMessageEvent):
+        """概率校验 - 检验全服实际出率与配置概率是否一致（管理员）"""
+        stats = await self._compute_pull_stats()
+        if stats is None:
+            yield event.plain_result("❌ 全服抽卡日志未启用")
+            return
+        
+        # 各卡池缺少的稀有度会落入备用池，分别按卡池自身的实际概率检验
+        checks = []
+        for pool_name in self.config.get("pools", {}):
+            pool_stats = stats["pool_rarity"].get(pool_id(pool_name), {})
+            for label, key, is_pity in (("普通抽取", "normal", False), ("保底抽取", "pity", True)):
+                observed = pool_stats.get(key, {})
+                if not observed:
+                    continue
+                expected = self._expected_pool_rates(pool_name, is_pity)
+                statistic, dof, p_value = chi_square_test(observed, expected)
+                checks.append({
+                    "label": f"{pool_name} · {label}",
+                    "observed": observed,
+                    "expected": expected,
+                    "statistic": statistic,
+                    "dof": dof,
+                    "p_value": p_value,
+                })
+        yield event.plain_result(format_rate_check(checks))
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("tq重载配置")
+    async def reload_config(self, event: AstrMessageEvent):
+        """重载配置 - 重新读取概率、卡池、评价与布局配置（管理员）"""
+        self.config = self._load_config()
+        old_signature = self.gacha_core.rate_signature()
+        self.gacha_core = self._create_gacha_core()
+        problems = self._validate_gacha_config()
+        self.rate_monitor.reset()
+        self.luck_odds = self._create_luck_odds()
+        if self.luck_tracker.counter_mode and self.gacha_core.rate_signature() != old_signature:
+            # 概率变化时开始新纪元，已有的抽卡仍按当时的概率重新生成
+            self.luck_tracker.set_rarity_at(self.gacha_core.rarity_at)
+        self.prefetcher.invalidate_all()
+        self.collector_estimates.clear()
+        logger.info("配置已重载")
+        result_text = (
+            "✅ 配置已重载：概率、卡池、运气评价与图片布局即时生效；\n"
+            "缓存容量、限流、负载保护等运行参数需重启插件后生效"
+        )
+        if problems:
+            result_text += f"\n⚠️ 发现 {len(problems)} 处概率配置问题，详见日志"
+        yield event.plain_result(result_text)
+    
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("tq状态")
+    async def plugin_status(self, event: AstrMessageEvent):
+        """插件状态 - 查看运行指标（管理员）"""
+        sections = {
+            "运气追踪器": self.luck_tracker.get_metrics(),
+            "渲染调度": self.render_dispatcher.get_metrics(),
+            "图块缓存": self.tile_cache.get_metrics(),
+            "资源预热": self.warmup.get_metrics(),
+            "负载保护": self.load_shedder.get_metrics(),
+            "重复消息": self.deduplicator.get_metrics(),
+            "抽卡限流": self.throttler.get_metrics(),
+            "十连预取": self.prefetcher.get_metrics(),
+            "媒体引用": self.media_cache.get_metrics(),
+            "人格图鉴": self.collection_book.get_metrics(),
+            "抽卡负载": self.activity.get_metrics(),
+            "出率监控": {
+                **self.rate_monitor.get_metrics(),
+                "累计抽取": self.gacha_core.outcomes.total(),
+                "备用池抽取": sum(self.gacha_core.outcomes.fallbacks.values()),
+            },
+            **self.scheduler.get_metrics(),
+        }
+        yield event.plain_result(format_status(sections))
     
     async def terminate(self):
         """插件销毁"""
+        for task in self._background_tasks:
+            task.cancel()
+        self.render_dispatcher.stop()
+        self.scheduler.shutdown()
+        self.prefetcher.clear()
+        self.tile_cache.attach_shared(None)
+        if self.pull_log is not None:
+            self.pull_log.flush()
+        if self.luck_tracker.spill_store is not None:
+            self.luck_tracker.spill_store.close()
         logger.info("边狱巴士人格抽取插件已卸载")
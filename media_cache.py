@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+单抽图片媒体引用缓存模块
+
+单抽每次都以本地文件发送人格图片，平台会重复接收同一份字节。这里按 (适配器, 图片内容标识)
+缓存平台侧的媒体引用（文件ID或URL），命中时直接引用，未命中时才上传一次。
+引用带有效期并按最近使用淘汰；使用引用发送失败时由调用方作废，下一次重新上传。
+
+上传方式与平台相关，通过 MediaUploader 接口接入：每个适配器注册各自的实现，
+返回平台侧的文件ID；未注册的适配器不经过缓存。插件目录已通过 HTTP 对外提供时，
+可直接用 static_url 得到的公开URL发送，由平台自行拉取，这种固定URL无需缓存。
+"""
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+
+def static_url(url_base: str, root: Path, path: str) -> Optional[str]:
+    """
+    获取本地文件对应的公开URL
+
+    Args:
+        url_base: 对外提供 root 目录的URL前缀
+        root: URL前缀对应的本地目录
+        path: 本地文件路径
+
+    Returns:
+        公开URL，文件不在 root 目录下时返回 None
+    """
+    relative = os.path.relpath(path, root)
+    if relative.startswith(os.pardir):
+        return None
+    return f"{url_base.rstrip('/')}/{quote(relative.replace(os.sep, '/'))}"
+
+
+class MediaUploader(ABC):
+    """平台媒体上传接口"""
+
+    @abstractmethod
+    async def upload(self, path: str) -> Optional[str]:
+        """
+        将本地文件上传到平台
+
+        Args:
+            path: 本地文件路径
+
+        Returns:
+            平台分配的、可重复使用的媒体引用（文件ID），不支持该文件时返回 None
+
+        Raises:
+            Exception: 上传失败
+        """
+
+
+class MediaHandleCache:
+    """按适配器区分、带有效期的媒体引用缓存"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400):
+        """
+        初始化媒体引用缓存
+
+        Args:
+            max_entries: 最多缓存的引用数量
+            ttl: 引用的有效期（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._uploaders: dict[str, MediaUploader] = {}
+        # 已缓存的引用：{(适配器, 内容标识): (引用, 过期时间)}
+        self._handles: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+        # 正在上传的引用，同一文件的并发请求共用一次上传
+        self._uploading: dict[tuple[str, str], asyncio.Future] = {}
+
+        # 指标
+        self.hits = 0
+        self.misses = 0
+        self.upload_failures = 0
+        self.invalidated = 0
+
+    def register(self, platform: str, uploader: MediaUploader) -> None:
+        """
+        为适配器注册上传实现
+
+        Args:
+            platform: 适配器名称（event.get_platform_name()）
+            uploader: 上传实现
+        """
+        self._uploaders[platform] = uploader
+
+    def supports(self, platform: str) -> bool:
+        """
+        适配器是否有可用的上传实现
+
+        Args:
+            platform: 适配器名称
+
+        Returns:
+            是否支持
+        """
+        return platform in self._uploaders
+
+    async def resolve(self, platform: str, content_key: str, path: str) -> Optional[str]:
+        """
+        获取文件的媒体引用，未命中时上传一次
+
+        Args:
+            platform: 适配器名称
+            content_key: 文件内容标识（内容变化时应随之变化）
+            path: 本地文件路径
+
+        Returns:
+            媒体引用；适配器不支持或上传失败时返回 None，调用方应按普通文件发送
+        """
+        uploader = self._uploaders.get(platform)
+        if uploader is None:
+            return None
+
+        key = (platform, content_key)
+        entry = self._handles.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self._handles.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            del self._handles[key]
+        self.misses += 1
+
+        pending = self._uploading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = self._uploading[key] = asyncio.get_running_loop().create_future()
+        handle = None
+        try:
+            handle = await uploader.upload(path)
+        except Exception:
+            self.upload_failures += 1
+        finally:
+            del self._uploading[key]
+            pending.set_result(handle)
+
+        if handle is not None:
+            self._handles[key] = (handle, time.monotonic() + self.ttl)
+            while len(self._handles) > self.max_entries:
+                self._handles.popitem(last=False)
+        return handle
+
+    def invalidate(self, platform: str, content_key: str) -> None:
+        """
+        作废一个引用（使用该引用发送失败时调用）
+
+        Args:
+            platform: 适配器名称
+            content_key: 文件内容标识
+        """
+        if self._handles.pop((platform, content_key), None) is not None:
+            self.invalidated += 1
+
+    def clear(self) -> None:
+        """清空全部引用"""
+        self._handles.clear()
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取缓存指标
+
+        Returns:
+            指标字典
+        """
+        total = self.hits + self.misses
+        return {
+            "缓存引用": len(self._handles),
+            "命中率": f"{self.hits / total * 100:.1f}%" if total else "-",
+            "上传失败": self.upload_failures,
+            "发送失败作废": self.invalidated,
+        }
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+十连预抽取模块
+
+抽卡结果与抽取时间无关，因此可以在空闲时为最近活跃的用户提前抽好下一次十连并渲染合成图。
+用户下一次 /tq十连 时只需记录结果并发送。预取结果按 (用户, 卡池) 保存，
+切换卡池或重载配置时作废；只在负载空闲时生产，不与实时请求争抢渲染资源。
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from .render_image import cleanup_temp_file
+
+
+class PrefetchCache:
+    """按 (用户, 卡池) 保存的十连预取结果"""
+
+    def __init__(
+        self,
+        producer: Callable[[str, str], Awaitable[Optional[dict]]],
+        is_idle: Callable[[], bool],
+        max_entries: int = 256,
+        max_pending: int = 64,
+        ttl: float = 600,
+        idle_poll: float = 0.2
+    ):
+        """
+        初始化预取缓存
+
+        Args:
+            producer: 生成预取结果的协程函数，参数为 (用户ID, 卡池名称)，
+                      返回包含 results、pity_flags、composite_path 等字段的字典
+            is_idle: 判断当前是否空闲、可以进行预取的函数
+            max_entries: 最多保存的预取结果数量
+            max_pending: 最多排队等待生产的预取请求数
+            ttl: 预取结果的有效期（秒）
+            idle_poll: 等待空闲时的轮询间隔（秒）
+        """
+        self.producer = producer
+        self.is_idle = is_idle
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.idle_poll = idle_poll
+        # 配置版本，重载配置后递增，旧版本的预取结果一律作废
+        self.version = 0
+        self._entries: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._pending: OrderedDict[tuple[str, str], None] = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        # 正在生产的键，以及生产期间它是否已被作废
+        self._producing: Optional[tuple[str, str]] = None
+        self._producing_stale = False
+
+        # 指标
+        self.hits = 0
+        self.misses = 0
+        self.produced = 0
+        self.failed = 0
+        self.discarded = 0
+        self.dropped_requests = 0
+
+    def schedule(self, user_id: str, pool_name: str) -> None:
+        """
+        请求为用户预取下一次十连
+
+        Args:
+            user_id: 用户ID
+            pool_name: 卡池名称
+        """
+        key = (user_id, pool_name)
+        if key in self._entries or key in self._pending:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped_requests += 1
+            return
+        self._pending[key] = None
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def take(self, user_id: str, pool_name: str) -> Optional[dict]:
+        """
+        取出用户的预取结果
+
+        Args:
+            user_id: 用户ID
+            pool_name: 卡池名称
+
+        Returns:
+            预取结果，不存在或已过期时返回 None
+        """
+        entry = self._entries.pop((user_id, pool_name), None)
+        if entry is None or not self._is_fresh(entry, time.monotonic()):
+            if entry is not None:
+                self._discard(entry)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def discard(self, entry: dict) -> None:
+        """
+        丢弃一个已取出但无法使用的预取结果
+
+        Args:
+            entry: take 返回的预取结果
+        """
+        self.hits -= 1
+        self.misses += 1
+        self._discard(entry)
+
+    def invalidate_user(self, user_id: str) -> None:
+        """
+        作废某个用户的全部预取结果（如切换卡池后），正在生产的结果完成后同样丢弃
+
+        Args:
+            user_id: 用户ID
+        """
+        for key in [key for key in self._entries if key[0] == user_id]:
+            self._discard(self._entries.pop(key))
+        for key in [key for key in self._pending if key[0] == user_id]:
+            del self._pending[key]
+        if self._producing is not None and self._producing[0] == user_id:
+            self._producing_stale = True
+
+    def invalidate_all(self) -> None:
+        """作废全部预取结果（如重载配置后）"""
+        self.version += 1
+        for entry in self._entries.values():
+            self._discard(entry)
+        self._entries.clear()
+        self._pending.clear()
+
+    def _is_fresh(self, entry: dict, now: float) -> bool:
+        """预取结果是否仍然有效"""
+        return entry["version"] == self.version and now - entry["created_at"] <= self.ttl
+
+    def _discard(self, entry: dict) -> None:
+        """丢弃预取结果并清理其合成图临时文件"""
+        cleanup_temp_file(entry.get("composite_path"))
+        self.discarded += 1
+
+    async def run(self) -> None:
+        """生产循环，应作为后台任务运行"""
+        self._wakeup = asyncio.Event()
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # 只在空闲时生产，实时请求优先
+            if not self.is_idle():
+                await asyncio.sleep(self.idle_poll)
+                continue
+
+            key, _ = self._pending.popitem(last=False)
+            version = self.version
+            self._producing = key
+            self._producing_stale = False
+            try:
+                entry = await self.producer(*key)
+            except Exception:
+                # 预取失败不影响实时请求，下次十连时正常抽取即可
+                self.failed += 1
+                continue
+            finally:
+                self._producing = None
+            if entry is None:
+                continue
+            if version != self.version or self._producing_stale or key in self._entries:
+                # 生产期间配置已重载、该用户的预取已作废或已有结果
+                self._discard(entry)
+                continue
+
+            entry["version"] = version
+            entry["created_at"] = time.monotonic()
+            self._entries[key] = entry
+            self.produced += 1
+            self._evict(entry["created_at"])
+
+    def _evict(self, now: float) -> None:
+        """清理过期结果，并在超出容量时淘汰最早生产的结果"""
+        for key in [key for key, entry in self._entries.items() if not self._is_fresh(entry, now)]:
+            self._discard(self._entries.pop(key))
+        while len(self._entries) > self.max_entries:
+            _, entry = self._entries.popitem(last=False)
+            self._discard(entry)
+
+    def clear(self) -> None:
+        """清理全部预取结果（插件卸载时调用）"""
+        for entry in self._entries.values():
+            cleanup_temp_file(entry.get("composite_path"))
+        self._entries.clear()
+        self._pending.clear()
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取预取指标
+
+        Returns:
+            指标字典
+        """
+        total = self.hits + self.misses
+        return {
+            "已缓存": len(self._entries),
+            "排队中": len(self._pending),
+            "命中率": f"{self.hits / total * 100:.1f}%" if total else "-",
+            "已生产": self.produced,
+            "失败": self.failed,
+            "已作废": self.discarded,
+            "丢弃请求": self.dropped_requests,
+        }
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+全服抽卡事件日志模块
+
+每次抽卡以定长二进制记录追加写入按天分段的日志文件，写入先在内存中攒批。
+统计时通过 mmap 读取日志，安装了 NumPy 时直接在映射内存上做向量化聚合。
+"""
+import hashlib
+import mmap
+import struct
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖，缺失时退回逐条解析
+    np = None
+
+from .spill_store import RARITY_CODES, CODE_RARITIES
+
+
+# 记录格式：时间戳、用户哈希、群哈希、卡池ID、人格编号、标志位、稀有度编码（共28字节）
+RECORD = struct.Struct("<IQQIHBB")
+RECORD_SIZE = RECORD.size
+
+# 标志位
+FLAG_PITY = 0x01
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([
+        ("ts", "<u4"),
+        ("user", "<u8"),
+        ("group", "<u8"),
+        ("pool", "<u4"),
+        ("identity", "<u2"),
+        ("flags", "u1"),
+        ("rarity", "u1"),
+    ])
+
+SEGMENT_PREFIX = "pulls-"
+SEGMENT_SUFFIX = ".bin"
+
+
+def hash_id(value: Optional[str]) -> int:
+    """
+    将用户ID/群ID映射为64位哈希，空值映射为 0
+
+    Args:
+        value: 原始ID
+
+    Returns:
+        64位无符号整数
+    """
+    if not value:
+        return 0
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def pool_id(pool_name: str) -> int:
+    """
+    卡池名称对应的32位ID
+
+    Args:
+        pool_name: 卡池名称
+
+    Returns:
+        32位无符号整数
+    """
+    return zlib.crc32(pool_name.encode("utf-8")) & 0xFFFFFFFF
+
+
+class PullLog:
+    """按天分段的追加式抽卡日志"""
+
+    def __init__(self, log_dir: Path, flush_bytes: int = 65536):
+        """
+        初始化日志
+
+        Args:
+            log_dir: 日志目录
+            flush_bytes: 内存缓冲达到该大小时立即写盘
+        """
+        log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_dir = log_dir
+        self.flush_bytes = flush_bytes
+        # 待写入的记录：{日期字符串: 缓冲区}
+        self._buffers: dict[str, bytearray] = {}
+        self._buffered = 0
+        self.total_records = 0
+
+    def append(
+        self,
+        user_id: str,
+        group_id: Optional[str],
+        pool_name: str,
+        records: list[tuple[int, str, bool]],
+        timestamp: Optional[float] = None
+    ) -> None:
+        """
+        追加一次指令产生的全部抽卡记录
+
+        Args:
+            user_id: 用户ID
+            group_id: 群ID，私聊时为 None
+            pool_name: 卡池名称
+            records: [(人格编号, 稀有度, 是否保底)]
+            timestamp: 时间戳，None 表示当前时间
+        """
+        ts = int(timestamp if timestamp is not None else time.time())
+        day = time.strftime("%Y%m%d", time.localtime(ts))
+        user_hash = hash_id(user_id)
+        group_hash = hash_id(group_id)
+        pool = pool_id(pool_name)
+
+        buffer = self._buffers.setdefault(day, bytearray())
+        for identity_id, rarity, is_pity in records:
+            buffer += RECORD.pack(
+                ts, user_hash, group_hash, pool, identity_id,
+                FLAG_PITY if is_pity else 0, RARITY_CODES.get(rarity, 0),
+            )
+        self._buffered += len(records) * RECORD_SIZE
+        self.total_records += len(records)
+
+        if self._buffered >= self.flush_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        """将缓冲区写入对应日期的分段文件"""
+        for day, buffer in self._buffers.items():
+            if buffer:
+                with open(self._segment_path(day), "ab") as f:
+                    f.write(buffer)
+        self._buffers.clear()
+        self._buffered = 0
+
+    def _segment_path(self, day: str) -> Path:
+        """某一天的分段文件路径"""
+        return self.log_dir / f"{SEGMENT_PREFIX}{day}{SEGMENT_SUFFIX}"
+
+    def segment_paths(self, days: Optional[int]) -> list[Path]:
+        """
+        获取最近若干天的分段文件
+
+        Args:
+            days: 天数（含今天），None 表示全部分段
+
+        Returns:
+            存在的分段文件路径列表（按日期从早到晚）
+        """
+        if days is None:
+            return sorted(self.log_dir.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+        today = datetime.now()
+        paths = []
+        for offset in range(days):
+            path = self._segment_path((today - timedelta(days=offset)).strftime("%Y%m%d"))
+            if path.exists():
+                paths.append(path)
+        return paths[::-1]
+
+    def iter_segments(self, days: Optional[int]) -> Iterator[memoryview]:
+        """
+        逐个以只读 mmap 方式打开分段文件
+
+        Args:
+            days: 天数（含今天），None 表示全部分段
+
+        Yields:
+            截断到整条记录边界的内存视图
+        """
+        for path in self.segment_paths(days):
+            with open(path, "rb") as f:
+                size = (path.stat().st_size // RECORD_SIZE) * RECORD_SIZE
+                if size == 0:
+                    continue
+                with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                    view = memoryview(mm)
+                    try:
+                        yield view
+                    finally:
+                        view.release()
+
+
+def compute_stats(log: PullLog, days: int = 7, top_n: int = 5) -> dict:
+    """
+    统计最近若干天的全服抽卡数据（阻塞操作，应在线程池中执行）
+
+    Args:
+        log: 抽卡日志
+        days: 统计天数（含今天）
+        top_n: 最常抽到人格的显示数量
+
+    Returns:
+        {
+            "total": 总抽数,
+            "users": 参与用户数,
+            "pools": {卡池ID: {"total": 抽数, "sss": 000数}},
+            "rarity": {"normal": {稀有度: 次数}, "pity": {稀有度: 次数}},
+            "pool_rarity": {卡池ID: {"normal": {稀有度: 次数}, "pity": {稀有度: 次数}}},
+            "top_identities": [(人格编号, 次数)],
+            "hourly": [24个小时各自的抽数],
+        }
+    """
+    if np is not None:
+        return _compute_stats_numpy(log, days, top_n)
+    return _compute_stats_python(log, days, top_n)
+
+
+def _compute_stats_numpy(log: PullLog, days: int, top_n: int) -> dict:
+    """基于 NumPy 的向量化统计，直接在 mmap 内存上运算"""
+    total = 0
+    users = set()
+    pools: dict[int, dict[str, int]] = {}
+    rarity = {"normal": Counter(), "pity": Counter()}
+    pool_rarity: dict[int, dict[str, Counter]] = {}
+    identity_counts = np.zeros(0x10000, dtype=np.int64)
+    hourly = np.zeros(24, dtype=np.int64)
+    sss_code = RARITY_CODES["SSS"]
+    utc_offset = int(datetime.now().astimezone().utcoffset().total_seconds())
+
+    for view in log.iter_segments(days):
+        records = np.frombuffer(view, dtype=RECORD_DTYPE)
+        total += len(records)
+        users.update(np.unique(records["user"]).tolist())
+
+        pool_ids, inverse = np.unique(records["pool"], return_inverse=True)
+        pool_totals = np.bincount(inverse, minlength=len(pool_ids))
+        pool_sss = np.bincount(inverse, weights=records["rarity"] == sss_code, minlength=len(pool_ids))
+        for pid, count, sss in zip(pool_ids.tolist(), pool_totals.tolist(), pool_sss.tolist()):
+            entry = pools.setdefault(pid, {"total": 0, "sss": 0})
+            entry["total"] += count
+            entry["sss"] += int(sss)
+
+        # 按 (卡池, 是否保底, 稀有度编码) 一次计数，稀有度编码为单字节
+        is_pity = (records["flags"] & FLAG_PITY) != 0
+        num_codes = 256
+        groups = np.bincount(
+            (inverse.astype(np.int64) * 2 + is_pity) * num_codes + records["rarity"],
+            minlength=len(pool_ids) * 2 * num_codes,
+        ).reshape(len(pool_ids), 2, num_codes)
+        for pid, pool_groups in zip(pool_ids.tolist(), groups.tolist()):
+            entry = pool_rarity.setdefault(pid, {"normal": Counter(), "pity": Counter()})
+            for key, codes in zip(("normal", "pity"), pool_groups):
+                for code, count in enumerate(codes):
+                    if count:
+                        name = CODE_RARITIES.get(code, "unknown")
+                        entry[key][name] += count
+                        rarity[key][name] += count
+
+        identity_counts += np.bincount(records["identity"], minlength=0x10000)
+        hours = ((records["ts"].astype(np.int64) + utc_offset) // 3600) % 24
+        hourly += np.bincount(hours, minlength=24)
+        del records
+
+    top = np.argsort(identity_counts)[::-1][:top_n]
+    return {
+        "total": total,
+        "users": len(users),
+        "pools": pools,
+        "rarity": {key: dict(counter) for key, counter in rarity.items()},
+        "pool_rarity": _plain_pool_rarity(pool_rarity),
+        "top_identities": [(int(i), int(identity_counts[i])) for i in top if identity_counts[i] > 0],
+        "hourly": hourly.tolist(),
+    }
+
+
+def _compute_stats_python(log: PullLog, days: int, top_n: int) -> dict:
+    """未安装 NumPy 时的逐条统计"""
+    total = 0
+    users = set()
+    pools: dict[int, dict[str, int]] = {}
+    rarity = {"normal": Counter(), "pity": Counter()}
+    pool_rarity: dict[int, dict[str, Counter]] = {}
+    identity_counts = Counter()
+    hourly = [0] * 24
+    sss_code = RARITY_CODES["SSS"]
+
+    for view in log.iter_segments(days):
+        for ts, user, _, pid, identity, flags, code in RECORD.iter_unpack(view):
+            total += 1
+            users.add(user)
+            entry = pools.setdefault(pid, {"total": 0, "sss": 0})
+            entry["total"] += 1
+            entry["sss"] += code == sss_code
+            key = "pity" if flags & FLAG_PITY else "normal"
+            name = CODE_RARITIES.get(code, "unknown")
+            rarity[key][name] += 1
+            pool_entry = pool_rarity.get(pid)
+            if pool_entry is None:
+                pool_entry = pool_rarity[pid] = {"normal": Counter(), "pity": Counter()}
+            pool_entry[key][name] += 1
+            identity_counts[identity] += 1
+            hourly[time.localtime(ts).tm_hour] += 1
+
+    return {
+        "total": total,
+        "users": len(users),
+        "pools": pools,
+        "rarity": {key: dict(counter) for key, counter in rarity.items()},
+        "pool_rarity": _plain_pool_rarity(pool_rarity),
+        "top_identities": identity_counts.most_common(top_n),
+        "hourly": hourly,
+    }
+
+
+def _plain_pool_rarity(pool_rarity: dict[int, dict[str, Counter]]) -> dict[int, dict[str, dict[str, int]]]:
+    """将按卡池的稀有度计数转换为普通字典"""
+    return {
+        pid: {key: dict(counter) for key, counter in entry.items()}
+        for pid, entry in pool_rarity.items()
+    }
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+全服运气排名索引模块
+
+用树状数组（Fenwick tree）按分桶后的分数统计成员数量，
+记录抽卡时 O(log n) 更新，查询"比多少玩家更欧/更非"时 O(log n) 求前缀和，无需排序全部用户。
+"""
+
+
+class FenwickTree:
+    """树状数组，支持单点增减与前缀求和"""
+
+    def __init__(self, size: int):
+        """
+        初始化树状数组
+
+        Args:
+            size: 下标范围 [0, size)
+        """
+        self.size = size
+        self._tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int) -> None:
+        """
+        单点增减
+
+        Args:
+            index: 下标
+            delta: 增量
+        """
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index: int) -> int:
+        """
+        求 [0, index) 的和
+
+        Args:
+            index: 右边界（不含）
+
+        Returns:
+            前缀和
+        """
+        total = 0
+        i = min(index, self.size)
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+
+class BucketRankIndex:
+    """按分桶分数统计成员分布的排名索引"""
+
+    def __init__(self, bucket_count: int, bucket_width: float = 1.0):
+        """
+        初始化排名索引
+
+        Args:
+            bucket_count: 分桶数量，超出范围的分数归入最后一个桶
+            bucket_width: 每个桶覆盖的分数宽度
+        """
+        self.bucket_count = bucket_count
+        self.bucket_width = bucket_width
+        self._tree = FenwickTree(bucket_count)
+        # 成员所在的桶：{member_id: bucket}
+        self._buckets: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _bucket(self, score: float) -> int:
+        """分数对应的桶下标"""
+        return max(0, min(self.bucket_count - 1, int(score / self.bucket_width)))
+
+    def update(self, member_id: str, score: float) -> None:
+        """
+        更新成员分数
+
+        Args:
+            member_id: 成员ID
+            score: 新分数
+        """
+        bucket = self._bucket(score)
+        old_bucket = self._buckets.get(member_id)
+        if old_bucket == bucket:
+            return
+        if old_bucket is not None:
+            self._tree.add(old_bucket, -1)
+        self._tree.add(bucket, 1)
+        self._buckets[member_id] = bucket
+
+    def remove(self, member_id: str) -> None:
+        """
+        移除成员
+
+        Args:
+            member_id: 成员ID
+        """
+        old_bucket = self._buckets.pop(member_id, None)
+        if old_bucket is not None:
+            self._tree.add(old_bucket, -1)
+
+    def rank(self, member_id: str) -> tuple[int, int]:
+        """
+        查询成员的排名
+
+        Args:
+            member_id: 成员ID
+
+        Returns:
+            (分数低于该成员的其他成员数, 其他成员总数)，成员不在索引中时返回 (0, 0)
+        """
+        bucket = self._buckets.get(member_id)
+        if bucket is None:
+            return 0, 0
+        return self._tree.prefix_sum(bucket), len(self._buckets) - 1
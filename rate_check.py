@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+概率校验模块
+
+对观测到的稀有度分布与配置概率做卡方拟合优度检验，
+用于发现配置错误或抽卡逻辑回归导致的概率偏移。
+
+RateDriftMonitor 对抽卡引擎的实时结果计数做周期性检验，出率偏离超出置信界时告警。
+每个分组只检验上次检验以来新增的抽取，早期的大量正常结果不会冲淡后来出现的偏移。
+"""
+import math
+from typing import Optional
+
+
+def _gamma_series(a: float, x: float) -> float:
+    """正则化下不完全伽马函数 P(a, x) 的级数展开（x < a + 1 时收敛快）"""
+    term = total = 1.0 / a
+    n = a
+    for _ in range(1000):
+        n += 1
+        term *= x / n
+        total += term
+        if abs(term) < abs(total) * 1e-15:
+            break
+    return total * math.exp(-x + a * math.log(x) - math.lgamma(a))
+
+
+def _gamma_continued_fraction(a: float, x: float) -> float:
+    """正则化上不完全伽马函数 Q(a, x) 的连分式展开（x >= a + 1 时收敛快）"""
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(-x + a * math.log(x) - math.lgamma(a)) * h
+
+
+def chi_square_sf(statistic: float, dof: int) -> float:
+    """
+    卡方分布的生存函数，即 P(X >= statistic)
+
+    Args:
+        statistic: 卡方统计量
+        dof: 自由度
+
+    Returns:
+        p 值
+    """
+    if dof <= 0:
+        return 1.0
+    if statistic <= 0:
+        return 1.0
+    a = dof / 2
+    x = statistic / 2
+    if x < a + 1:
+        return max(0.0, 1 - _gamma_series(a, x))
+    return min(1.0, _gamma_continued_fraction(a, x))
+
+
+def chi_square_test(observed: dict[str, int], expected_rates: dict[str, float]) -> tuple[float, int, float]:
+    """
+    卡方拟合优度检验
+
+    期望概率为 0 却出现了观测值的类别会使 p 值直接为 0。
+
+    Args:
+        observed: 各类别观测次数 {类别: 次数}
+        expected_rates: 各类别期望概率 {类别: 概率}，之和应为 1
+
+    Returns:
+        (卡方统计量, 自由度, p 值)
+    """
+    total = sum(observed.values())
+    if total == 0:
+        return 0.0, 0, 1.0
+
+    statistic = 0.0
+    categories = 0
+    for category in set(observed) | set(expected_rates):
+        count = observed.get(category, 0)
+        expected = expected_rates.get(category, 0.0) * total
+        if expected <= 0:
+            if count > 0:
+                return math.inf, max(1, len(expected_rates) - 1), 0.0
+            continue
+        statistic += (count - expected) ** 2 / expected
+        categories += 1
+
+    dof = categories - 1
+    return statistic, dof, chi_square_sf(statistic, dof)
+
+
+class RateDriftMonitor:
+    """抽卡结果的出率漂移监控"""
+
+    def __init__(self, alpha: float = 0.0001, min_samples: int = 2000):
+        """
+        初始化监控
+
+        Args:
+            alpha: 显著性水平，同一轮检验的多个分组按 Bonferroni 方法分摊
+            min_samples: 分组在当前窗口内的抽数达到该值后才参与检验
+        """
+        self.alpha = alpha
+        self.min_samples = min_samples
+        # 当前处于漂移状态的分组
+        self.drifting: set[tuple[str, bool]] = set()
+        # 上一轮看到的累计计数，与本轮之差即为新增的抽取
+        self._baseline: dict[tuple[str, bool], dict[str, int]] = {}
+        # 各分组尚未检验的新增抽取，抽数达到 min_samples 后检验并清空
+        self._window: dict[tuple[str, bool], dict[str, int]] = {}
+
+        # 指标
+        self.checks = 0
+        self.alerts = 0
+        self.tested = 0
+        self.min_p_value: Optional[float] = None
+
+    def check(
+        self,
+        counts: dict[tuple[str, bool], dict[str, int]],
+        expected: dict[tuple[str, bool], dict[str, float]]
+    ) -> tuple[list[dict], list[tuple[str, bool]]]:
+        """
+        对各分组做一轮拟合优度检验，每个分组按其卡池自身的实际概率检验
+
+        只检验上一轮以来新增的抽取：新增抽数不足 min_samples 的分组继续累积到下一轮，
+        检验过的抽取随即清空，因此每次检验的都是最近的一段结果。
+
+        Args:
+            counts: 累计计数 {(卡池名称, 是否保底): {稀有度: 次数}}
+            expected: {(卡池名称, 是否保底): {稀有度: 期望概率}}，没有期望概率的分组不参与检验
+
+        Returns:
+            (新出现漂移的分组检验结果列表, 恢复正常的分组列表)；
+            检验结果为 {"pool", "is_pity", "total", "observed", "expected", "statistic", "dof", "p_value"}
+        """
+        for key, observed in list(counts.items()):
+            observed = dict(observed)
+            baseline = self._baseline.get(key, {})
+            window = self._window.setdefault(key, {})
+            for rarity, count in observed.items():
+                added = count - baseline.get(rarity, 0)
+                if added > 0:
+                    window[rarity] = window.get(rarity, 0) + added
+            self._baseline[key] = observed
+
+        eligible = {
+            key: self._window.pop(key) for key in list(self._window)
+            if key in expected and sum(self._window[key].values()) >= self.min_samples
+        }
+        self.checks += 1
+        self.tested = len(eligible)
+        if not eligible:
+            return [], []
+
+        threshold = self.alpha / len(eligible)
+        new_alerts = []
+        recovered = []
+        min_p_value = 1.0
+        for key, observed in eligible.items():
+            statistic, dof, p_value = chi_square_test(observed, expected[key])
+            min_p_value = min(min_p_value, p_value)
+            if p_value < threshold:
+                if key not in self.drifting:
+                    self.drifting.add(key)
+                    self.alerts += 1
+                    new_alerts.append({
+                        "pool": key[0],
+                        "is_pity": key[1],
+                        "total": sum(observed.values()),
+                        "observed": observed,
+                        "expected": expected[key],
+                        "statistic": statistic,
+                        "dof": dof,
+                        "p_value": p_value,
+                    })
+            elif key in self.drifting:
+                self.drifting.discard(key)
+                recovered.append(key)
+        self.min_p_value = min_p_value
+        return new_alerts, recovered
+
+    def reset(self) -> None:
+        """清除漂移状态与检验窗口（抽卡引擎重建、计数清零时调用）"""
+        self.drifting.clear()
+        self._baseline.clear()
+        self._window.clear()
+        self.min_p_value = None
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取监控指标
+
+        Returns:
+            指标字典
+        """
+        return {
+            "检验轮数": self.checks,
+            "参与检验分组": self.tested,
+            "漂移中分组": len(self.drifting),
+            "累计告警": self.alerts,
+            "最小p值": f"{self.min_p_value:.4g}" if self.min_p_value is not None else "-",
+        }
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+渲染调度模块
+
+将短时间内到达的多个十连/百连合成请求收集为一个批次，
+在线程池中一次性完成图块加载与合成，再把结果分发回各个等待的指令。
+配有通道调度器时批次在渲染通道中执行，不占用文字指令的资源。
+"""
+import asyncio
+import time
+from typing import Optional
+
+from .render_image import TileCache, create_grid_composites, cleanup_temp_file
+from .scheduler import LaneScheduler, LANE_RENDER
+
+
+class RenderDispatcher:
+    """十连合成图的微批次调度器"""
+
+    def __init__(
+        self,
+        window_ms: float = 5,
+        max_batch_size: int = 32,
+        tile_cache: Optional[TileCache] = None,
+        decode_workers: int = 0,
+        scheduler: Optional[LaneScheduler] = None
+    ):
+        """
+        初始化调度器
+
+        Args:
+            window_ms: 收集批次的时间窗口（毫秒），即调度带来的最大额外等待
+            max_batch_size: 单个批次的最大请求数
+            tile_cache: 跨批次共享的图块缓存
+            decode_workers: 并行解码线程数，0 或 1 表示串行
+            scheduler: 通道调度器，None 表示在默认线程池中渲染
+        """
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.tile_cache = tile_cache
+        self.decode_workers = decode_workers
+        self.scheduler = scheduler
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # 指标
+        self.peak_queue_depth = 0
+        self.batch_count = 0
+        self.request_count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队中的请求数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(
+        self,
+        image_paths: list[str],
+        rows: Optional[int] = 2,
+        cols: int = 5,
+        spacing: int = 5,
+        target_height: Optional[int] = None,
+        cached_only: bool = False,
+        scale: float = 1.0
+    ) -> Optional[str]:
+        """
+        提交一个网格合成请求并等待结果
+
+        Args:
+            image_paths: 图片路径列表
+            rows: 行数，None 表示按图片数量自动计算
+            cols: 每行列数
+            spacing: 图片之间的间距（像素）
+            target_height: 目标图片高度
+            cached_only: 只使用已缓存的图块，缺少图块时返回 None
+            scale: 合成前对图块的缩放比例，图块仍按 target_height 加载以命中缓存
+
+        Returns:
+            合成图片的临时文件路径，如果失败则返回 None
+        """
+        if self._worker is None or self._worker.done():
+            self.start()
+
+        request = {
+            "image_paths": image_paths,
+            "rows": rows,
+            "cols": cols,
+            "spacing": spacing,
+            "target_height": target_height,
+            "cached_only": cached_only,
+            "scale": scale,
+        }
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future, time.monotonic()))
+        self.peak_queue_depth = max(self.peak_queue_depth, self._queue.qsize())
+        return await future
+
+    def start(self) -> None:
+        """启动后台批处理任务"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        """停止后台批处理任务，并取消所有尚未完成的请求"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                future.cancel()
+
+    async def _render(self, requests: list[dict]) -> list[Optional[str]]:
+        """在渲染通道（未配置时为默认线程池）中合成一个批次"""
+        if self.scheduler is not None:
+            return await self.scheduler.run(
+                LANE_RENDER, create_grid_composites, requests, self.tile_cache, self.decode_workers
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            None, create_grid_composites, requests, self.tile_cache, self.decode_workers
+        )
+
+    @staticmethod
+    def _discard_outputs(render: asyncio.Future) -> None:
+        """清理被中途停止的批次在后台写出的临时文件"""
+        if not render.cancelled() and render.exception() is None:
+            for output in render.result():
+                cleanup_temp_file(output)
+
+    async def _run(self) -> None:
+        """批处理循环：收集一个时间窗口内的请求后统一渲染"""
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                outputs = await self._collect_and_render(batch)
+            except asyncio.CancelledError:
+                # 停止时取消已取出队列但尚未完成的请求
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), output in zip(batch, outputs):
+                if future.done():
+                    # 等待方已取消，清理无人接收的临时文件
+                    cleanup_temp_file(output)
+                else:
+                    future.set_result(output)
+
+    async def _collect_and_render(self, batch: list[tuple]) -> list[Optional[str]]:
+        """
+        在时间窗口内把后续请求收集进批次，然后统一渲染
+
+        Args:
+            batch: 已取出的请求 [(请求, future, 入队时间)]，收集到的请求直接追加到其中
+
+        Returns:
+            与批次中请求一一对应的临时文件路径列表
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        now = time.monotonic()
+        for _, _, enqueued_at in batch:
+            wait = now - enqueued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        self.batch_count += 1
+        self.request_count += len(batch)
+
+        # 线程中的合成无法中断：停止时批次仍在后台完成，写出的临时文件随后清理
+        render = asyncio.ensure_future(self._render([request for request, _, _ in batch]))
+        try:
+            return await asyncio.shield(render)
+        except asyncio.CancelledError:
+            render.add_done_callback(self._discard_outputs)
+            raise
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取调度指标
+
+        Returns:
+            指标字典
+        """
+        avg_batch = self.request_count / self.batch_count if self.batch_count else 0
+        avg_wait = self.total_wait / self.request_count * 1000 if self.request_count else 0
+        return {
+            "当前队列深度": self.queue_depth,
+            "峰值队列深度": self.peak_queue_depth,
+            "批次数": self.batch_count,
+            "平均批大小": round(avg_batch, 2),
+            "平均排队(ms)": round(avg_wait, 1),
+            "最大排队(ms)": round(self.max_wait * 1000, 1),
+        }
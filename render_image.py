@@ -3,12 +3,487 @@
 图片渲染模块
 
 负责抽卡结果的图片合成和布局。
+网格图按行合成并流式编码为 PNG，支持十连到百连等任意规模的布局。
 """
+import math
 import os
+import struct
 import tempfile
-from typing import Optional
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
 
-from PIL import Image as PILImage
+from PIL import Image as PILImage, ImageChops
+
+
+# 缩放质量档位
+RESAMPLE_QUALITY = "quality"  # 全分辨率解码 + LANCZOS
+RESAMPLE_FAST = "fast"        # JPEG draft 解码 + 整数倍 reduce + BILINEAR
+
+
+def resize_to_height(
+    img: PILImage.Image,
+    target_height: int,
+    resample_tier: str = RESAMPLE_QUALITY
+) -> PILImage.Image:
+    """
+    按目标高度等比缩放图片
+    
+    快速档会先用 Image.reduce() 按整数倍缩小到不低于目标尺寸，再用 BILINEAR 完成最后一步。
+    
+    Args:
+        img: 原始图片
+        target_height: 目标图片高度
+        resample_tier: 缩放质量档位
+        
+    Returns:
+        缩放后的图片
+    """
+    if resample_tier == RESAMPLE_FAST:
+        factor = img.height // target_height
+        if factor >= 2:
+            img = img.reduce(factor)
+        resample = PILImage.Resampling.BILINEAR
+    else:
+        resample = PILImage.Resampling.LANCZOS
+    
+    if img.height == target_height:
+        return img
+    ratio = target_height / img.height
+    new_width = int(img.width * ratio)
+    return img.resize((new_width, target_height), resample)
+
+
+def load_tile(
+    path: str,
+    target_height: Optional[int] = None,
+    background_color: tuple[int, int, int] = (255, 255, 255),
+    resample_tier: str = RESAMPLE_QUALITY,
+    asset_pack=None
+) -> Optional[PILImage.Image]:
+    """
+    加载单张图片并处理为可直接粘贴的网格图块
+    
+    图片会按目标高度缩放，透明部分以背景色填充后转换为RGB模式。
+    
+    Args:
+        path: 图片路径
+        target_height: 目标图片高度，None表示使用原始高度
+        background_color: 背景颜色 (R, G, B)
+        resample_tier: 缩放质量档位
+        asset_pack: 图片资源包（AssetPack），包含该图片时直接从资源包解码
+        
+    Returns:
+        处理后的RGB图片，如果加载失败则返回 None
+    """
+    packed = asset_pack is not None and path in asset_pack
+    if not packed and (not path or not os.path.exists(path)):
+        return None
+    
+    try:
+        img = asset_pack.open_image(path) if packed else PILImage.open(path)
+        if target_height and resample_tier == RESAMPLE_FAST and img.format == 'JPEG':
+            # 让 JPEG 解码器直接按 1/2、1/4、1/8 缩小解码
+            ratio = target_height / img.height
+            img.draft('RGB', (int(img.width * ratio), target_height))
+        
+        # 转换为RGBA模式以支持透明背景
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        
+        # 按目标高度缩放
+        if target_height:
+            img = resize_to_height(img, target_height, resample_tier)
+    except (IOError, OSError):
+        return None
+    
+    # 将RGBA图片合成到RGB背景上
+    tile = PILImage.new('RGB', img.size, background_color)
+    tile.paste(img, mask=img.split()[3])  # 使用alpha通道作为mask
+    return tile
+
+
+class TileCache:
+    """已缩放图块的 LRU 缓存，可在线程池中并发访问"""
+    
+    def __init__(self, max_entries: int = 512, resample_tier: str = RESAMPLE_QUALITY, asset_pack=None):
+        """
+        初始化图块缓存
+        
+        Args:
+            max_entries: 最多缓存的图块数量
+            resample_tier: 加载图块时使用的缩放质量档位
+            asset_pack: 图片资源包（AssetPack），None 表示只读取散装文件
+        """
+        self.max_entries = max_entries
+        self.resample_tier = resample_tier
+        self.asset_pack = asset_pack
+        self._tiles: OrderedDict[tuple[str, Optional[int]], PILImage.Image] = OrderedDict()
+        self._lock = threading.Lock()
+        # 跨进程共享的图块集合（SharedTileSet），目标高度一致时优先使用
+        self.shared = None
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._tiles)
+    
+    def attach_shared(self, shared) -> None:
+        """
+        接入共享图块集合，并释放本地缓存中同一目标高度的图块
+        
+        Args:
+            shared: 共享图块集合，None 表示改回只使用本地缓存
+        """
+        with self._lock:
+            self.shared = shared
+            if shared is not None:
+                for key in [key for key in self._tiles if key[1] == shared.target_height]:
+                    del self._tiles[key]
+    
+    def get(self, path: str, target_height: Optional[int] = None) -> Optional[PILImage.Image]:
+        """
+        只读取缓存，不触发加载
+        
+        Args:
+            path: 图片路径
+            target_height: 目标图片高度
+            
+        Returns:
+            缓存的图块，未缓存时返回 None
+        """
+        shared = self.shared
+        if shared is not None and target_height == shared.target_height:
+            tile = shared.get(path)
+            if tile is not None:
+                with self._lock:
+                    self.hits += 1
+                return tile
+        
+        key = (path, target_height)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+            return tile
+    
+    def get_or_load(self, path: str, target_height: Optional[int] = None) -> Optional[PILImage.Image]:
+        """
+        读取缓存，未命中时加载并写入缓存
+        
+        Args:
+            path: 图片路径
+            target_height: 目标图片高度
+            
+        Returns:
+            图块，如果加载失败则返回 None
+        """
+        tile = self.get(path, target_height)
+        if tile is not None:
+            return tile
+        
+        tile = load_tile(path, target_height, resample_tier=self.resample_tier, asset_pack=self.asset_pack)
+        with self._lock:
+            self.misses += 1
+            if tile is not None:
+                self._tiles[(path, target_height)] = tile
+                while len(self._tiles) > self.max_entries:
+                    self._tiles.popitem(last=False)
+        return tile
+    
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取缓存指标
+        
+        Returns:
+            指标字典
+        """
+        total = self.hits + self.misses
+        metrics = {
+            "缓存图块": len(self._tiles),
+            "命中率": f"{self.hits / total * 100:.1f}%" if total else "-",
+        }
+        if self.shared is not None:
+            metrics["共享图块"] = f"{len(self.shared)}张 ({self.shared.size_bytes / 1024 / 1024:.1f}MB)"
+        return metrics
+
+
+# 图块解码共享线程池（PIL 在解码和缩放时会释放 GIL）
+_decode_pool: Optional[ThreadPoolExecutor] = None
+_decode_pool_workers = 0
+_decode_pool_lock = threading.Lock()
+
+
+def _get_decode_pool(workers: int) -> ThreadPoolExecutor:
+    """
+    获取共享的图块解码线程池，线程数变化时重建
+    
+    Args:
+        workers: 线程数
+        
+    Returns:
+        线程池
+    """
+    global _decode_pool, _decode_pool_workers
+    with _decode_pool_lock:
+        if _decode_pool is None or _decode_pool_workers != workers:
+            if _decode_pool is not None:
+                _decode_pool.shutdown(wait=False)
+            _decode_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="limbus-decode")
+            _decode_pool_workers = workers
+        return _decode_pool
+
+
+def load_tiles(
+    image_paths: list[str],
+    target_height: Optional[int] = None,
+    tile_cache: Optional[TileCache] = None,
+    decode_workers: int = 0,
+    background_color: tuple[int, int, int] = (255, 255, 255),
+    resample_tier: str = RESAMPLE_QUALITY,
+    cached_only: bool = False
+) -> list[PILImage.Image]:
+    """
+    加载一组图块，保持原有顺序，加载失败的图片会被跳过
+    
+    重复的路径只加载一次；decode_workers 大于 1 时未命中缓存的图片在共享线程池中并行解码。
+    
+    Args:
+        image_paths: 图片路径列表
+        target_height: 目标图片高度，None表示使用原始高度
+        tile_cache: 图块缓存，None 表示不使用缓存
+        decode_workers: 并行解码线程数，0 或 1 表示串行
+        background_color: 背景颜色 (R, G, B)，仅在不使用缓存时生效
+        resample_tier: 缩放质量档位，仅在不使用缓存时生效
+        cached_only: 只使用缓存中已有的图块，未命中的图片直接跳过
+        
+    Returns:
+        图块列表
+    """
+    loaded = _load_tile_map(
+        dict.fromkeys(image_paths), target_height, tile_cache, decode_workers,
+        background_color, resample_tier, cached_only,
+    )
+    return [loaded[path] for path in image_paths if loaded.get(path) is not None]
+
+
+def _load_tile_map(
+    paths: Iterable[str],
+    target_height: Optional[int],
+    tile_cache: Optional[TileCache],
+    decode_workers: int = 0,
+    background_color: tuple[int, int, int] = (255, 255, 255),
+    resample_tier: str = RESAMPLE_QUALITY,
+    cached_only: bool = False
+) -> dict[str, Optional[PILImage.Image]]:
+    """
+    加载一组不重复的图块（参数同 load_tiles）
+    
+    Returns:
+        {图片路径: 图块}，加载失败的为 None，cached_only 时未命中的路径不在结果中
+    """
+    loaded: dict[str, Optional[PILImage.Image]] = {}
+    pending = []
+    for path in paths:
+        tile = tile_cache.get(path, target_height) if tile_cache is not None else None
+        if tile is not None:
+            loaded[path] = tile
+        else:
+            pending.append(path)
+    
+    if cached_only:
+        return loaded
+    
+    if tile_cache is not None:
+        def loader(path: str) -> Optional[PILImage.Image]:
+            return tile_cache.get_or_load(path, target_height)
+    else:
+        def loader(path: str) -> Optional[PILImage.Image]:
+            return load_tile(path, target_height, background_color, resample_tier)
+    
+    if decode_workers > 1 and len(pending) > 1:
+        loaded.update(zip(pending, _get_decode_pool(decode_workers).map(loader, pending)))
+    else:
+        loaded.update((path, loader(path)) for path in pending)
+    return loaded
+
+
+class GridLayout:
+    """网格布局：计算画布尺寸与每行图块的位置"""
+    
+    def __init__(
+        self,
+        tile_sizes: list[tuple[int, int]],
+        cols: int,
+        spacing: int = 5,
+        rows: Optional[int] = None,
+        packed: bool = False
+    ):
+        """
+        初始化布局
+        
+        Args:
+            tile_sizes: 各图块的 (宽, 高)
+            cols: 每行列数
+            spacing: 图片之间的间距（像素）
+            rows: 行数，None 表示按图块数量自动计算；超出 rows * cols 的图块不显示
+            packed: 为 True 时同一行的图块按各自宽度紧密排列，否则使用统一的单元格宽度并居中
+        """
+        self.cols = max(1, cols)
+        self.rows = rows if rows is not None else math.ceil(len(tile_sizes) / self.cols)
+        self.spacing = spacing
+        self.packed = packed
+        self.tile_sizes = tile_sizes[:self.rows * self.cols]
+        
+        # 单元格尺寸取最大值保证对齐
+        self.cell_width = max((w for w, _ in self.tile_sizes), default=0)
+        self.cell_height = max((h for _, h in self.tile_sizes), default=0)
+        
+        if packed:
+            self.width = max(
+                (sum(w for w, _ in self._row_sizes(row)) + spacing * (len(self._row_sizes(row)) - 1)
+                 for row in range(self.rows)),
+                default=0,
+            )
+        else:
+            self.width = self.cols * self.cell_width + (self.cols - 1) * spacing
+        self.height = self.rows * self.cell_height + (self.rows - 1) * spacing
+    
+    def _row_sizes(self, row: int) -> list[tuple[int, int]]:
+        """获取某一行的图块尺寸"""
+        return self.tile_sizes[row * self.cols:(row + 1) * self.cols]
+    
+    def row_positions(self, row: int) -> list[tuple[int, int, int]]:
+        """
+        获取某一行中各图块的位置
+        
+        Args:
+            row: 行号
+            
+        Returns:
+            [(图块序号, 行内x坐标, 行内y坐标)]
+        """
+        positions = []
+        x = 0
+        for col, (width, height) in enumerate(self._row_sizes(row)):
+            idx = row * self.cols + col
+            offset_y = (self.cell_height - height) // 2
+            if self.packed:
+                positions.append((idx, x, offset_y))
+                x += width + self.spacing
+            else:
+                cell_x = col * (self.cell_width + self.spacing)
+                positions.append((idx, cell_x + (self.cell_width - width) // 2, offset_y))
+        return positions
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """构造一个 PNG 数据块"""
+    return (
+        struct.pack(">I", len(data)) + chunk_type + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+    )
+
+
+def _filter_strip(strip: PILImage.Image) -> bytes:
+    """
+    对一段RGB图像应用 PNG Sub 滤波并加上每行的滤波类型字节
+    
+    Sub 滤波即每个像素减去左侧像素（取模256），借助 ImageChops 在C层完成。
+    """
+    width, height = strip.size
+    shifted = PILImage.new('RGB', strip.size, (0, 0, 0))
+    if width > 1:
+        shifted.paste(strip.crop((0, 0, width - 1, height)), (1, 0))
+    data = ImageChops.subtract_modulo(strip, shifted).tobytes()
+    stride = width * 3
+    return b"".join(
+        b"\x01" + data[y * stride:(y + 1) * stride] for y in range(height)
+    )
+
+
+def render_grid(
+    tiles: list[PILImage.Image],
+    layout: GridLayout,
+    output_path: str,
+    background_color: tuple[int, int, int] = (255, 255, 255),
+    compress_level: int = 6
+) -> None:
+    """
+    按布局逐行合成图块并以流式方式编码为 PNG
+    
+    任意时刻只在内存中保留一行图块高度的画布，峰值内存与总行数无关。
+    
+    Args:
+        tiles: 图块列表
+        layout: 网格布局
+        output_path: 输出文件路径
+        background_color: 背景颜色 (R, G, B)
+        compress_level: zlib 压缩等级
+    """
+    width, height = layout.width, layout.height
+    compressor = zlib.compressobj(compress_level)
+    spacing_strip = None
+    if layout.spacing > 0:
+        spacing_strip = _filter_strip(PILImage.new('RGB', (width, layout.spacing), background_color))
+    
+    with open(output_path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        
+        for row in range(layout.rows):
+            if row > 0 and spacing_strip:
+                compressed = compressor.compress(spacing_strip)
+                if compressed:
+                    f.write(_png_chunk(b"IDAT", compressed))
+            
+            strip = PILImage.new('RGB', (width, layout.cell_height), background_color)
+            for idx, x, y in layout.row_positions(row):
+                strip.paste(tiles[idx], (x, y))
+            compressed = compressor.compress(_filter_strip(strip))
+            if compressed:
+                f.write(_png_chunk(b"IDAT", compressed))
+        
+        f.write(_png_chunk(b"IDAT", compressor.flush()))
+        f.write(_png_chunk(b"IEND", b""))
+
+
+def compose_grid(
+    tiles: list[PILImage.Image],
+    rows: Optional[int] = 2,
+    cols: int = 5,
+    spacing: int = 5,
+    background_color: tuple[int, int, int] = (255, 255, 255),
+    packed: bool = False
+) -> Optional[str]:
+    """
+    将已处理的图块按网格布局合成一张图片
+    
+    Args:
+        tiles: load_tile 生成的图块列表
+        rows: 行数，None 表示按图块数量自动计算
+        cols: 每行列数
+        spacing: 图片之间的间距（像素）
+        background_color: 背景颜色 (R, G, B)
+        packed: 同一行的图块是否按各自宽度紧密排列
+        
+    Returns:
+        合成图片的临时文件路径，如果没有图块则返回 None
+    """
+    if not tiles:
+        return None
+    
+    layout = GridLayout([tile.size for tile in tiles], cols, spacing, rows=rows, packed=packed)
+    
+    # 逐行合成并写入临时文件
+    temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
+    temp_file.close()
+    render_grid(tiles, layout, temp_file.name, background_color)
+    
+    return temp_file.name
 
 
 def create_grid_composite(
@@ -17,7 +492,9 @@ def create_grid_composite(
     cols: int = 5,
     spacing: int = 5,
     target_height: Optional[int] = None,
-    background_color: tuple[int, int, int] = (255, 255, 255)
+    background_color: tuple[int, int, int] = (255, 255, 255),
+    decode_workers: int = 0,
+    resample_tier: str = RESAMPLE_QUALITY
 ) -> Optional[str]:
     """
     将多张图片按网格布局合成一张图片
@@ -29,6 +506,8 @@ def create_grid_composite(
         spacing: 图片之间的间距（像素）
         target_height: 目标图片高度，None表示使用原始高度
         background_color: 背景颜色 (R, G, B)
+        decode_workers: 并行解码线程数，0 或 1 表示串行
+        resample_tier: 缩放质量档位
         
     Returns:
         合成图片的临时文件路径，如果失败则返回 None
@@ -36,80 +515,82 @@ def create_grid_composite(
     if not image_paths:
         return None
     
-    # 加载并处理所有图片
-    images = []
-    for path in image_paths:
-        if path and os.path.exists(path):
-            try:
-                img = PILImage.open(path)
-                # 转换为RGBA模式以支持透明背景
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                images.append(img)
-            except (IOError, OSError):
-                continue
-    
-    if not images:
-        return None
+    tiles = load_tiles(
+        image_paths, target_height,
+        decode_workers=decode_workers, background_color=background_color, resample_tier=resample_tier,
+    )
+    return compose_grid(tiles, rows, cols, spacing, background_color)
+
+
+def create_grid_composites(
+    requests: list[dict],
+    tile_cache: Optional[TileCache] = None,
+    decode_workers: int = 0
+) -> list[Optional[str]]:
+    """
+    批量合成多张网格图片
     
-    # 确定单个图片的尺寸
-    if target_height:
-        # 按目标高度缩放所有图片
-        resized_images = []
-        for img in images:
-            ratio = target_height / img.height
-            new_width = int(img.width * ratio)
-            img = img.resize((new_width, target_height), PILImage.Resampling.LANCZOS)
-            resized_images.append(img)
-        images = resized_images
-    
-    # 计算单个图片的尺寸（取最大值保证对齐）
-    cell_width = max(img.width for img in images)
-    cell_height = max(img.height for img in images)
-    
-    # 计算总尺寸
-    total_width = cols * cell_width + (cols - 1) * spacing
-    total_height = rows * cell_height + (rows - 1) * spacing
-    
-    # 创建背景图片
-    composite = PILImage.new('RGB', (total_width, total_height), background_color)
-    
-    # 按网格布局放置图片
-    for idx, img in enumerate(images):
-        if idx >= rows * cols:
-            break
-        
-        row = idx // cols
-        col = idx % cols
-        
-        x = col * (cell_width + spacing)
-        y = row * (cell_height + spacing)
-        
-        # 居中放置图片
-        offset_x = (cell_width - img.width) // 2
-        offset_y = (cell_height - img.height) // 2
-        
-        # 将RGBA图片粘贴到RGB背景上
-        if img.mode == 'RGBA':
-            bg = PILImage.new('RGB', img.size, background_color)
-            bg.paste(img, mask=img.split()[3])  # 使用alpha通道作为mask
-            composite.paste(bg, (x + offset_x, y + offset_y))
-        else:
-            composite.paste(img, (x + offset_x, y + offset_y))
+    同一批次中重复出现的图片（相同路径与目标高度）只加载和缩放一次。
     
-    # 保存为临时文件
-    temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-    composite.save(temp_file.name, 'PNG')
-    temp_file.close()
+    Args:
+        requests: 合成请求列表，每项包含 create_grid_composite 的参数
+                  image_paths、rows、cols、spacing、target_height，
+                  cached_only 为真时只使用缓存中的图块，缺少任一图块即视为失败；
+                  scale 小于 1 时将目标高度的图块（可命中缓存）再快速缩小后合成
+        tile_cache: 跨批次共享的图块缓存，None 表示只在批次内去重
+        decode_workers: 并行解码线程数，0 或 1 表示串行
+        
+    Returns:
+        与请求一一对应的临时文件路径列表，失败的请求对应 None
+    """
+    if tile_cache is None:
+        tile_cache = TileCache(max_entries=sum(len(r.get("image_paths", [])) for r in requests) or 1)
     
-    return temp_file.name
+    # 先按目标高度汇总整个批次需要的图片，每张只加载（并计入缓存命中率）一次
+    paths_by_height: dict[Optional[int], dict[str, None]] = {}
+    for request in requests:
+        if not request.get("cached_only"):
+            paths_by_height.setdefault(request.get("target_height"), {}).update(
+                dict.fromkeys(request.get("image_paths", []))
+            )
+    tiles_by_height = {
+        target_height: _load_tile_map(paths, target_height, tile_cache, decode_workers)
+        for target_height, paths in paths_by_height.items()
+    }
+    
+    outputs = []
+    for request in requests:
+        image_paths = request.get("image_paths", [])
+        cached_only = request.get("cached_only", False)
+        if cached_only:
+            tiles = load_tiles(image_paths, request.get("target_height"), tile_cache, cached_only=True)
+        else:
+            loaded = tiles_by_height[request.get("target_height")]
+            tiles = [loaded[path] for path in image_paths if loaded[path] is not None]
+        if cached_only and len(tiles) < len(image_paths):
+            outputs.append(None)
+            continue
+        scale = request.get("scale", 1.0)
+        spacing = request.get("spacing", 5)
+        if scale < 1:
+            tiles = [resize_to_height(tile, max(1, int(tile.height * scale)), RESAMPLE_FAST) for tile in tiles]
+            spacing = int(spacing * scale)
+        outputs.append(compose_grid(
+            tiles,
+            rows=request.get("rows", 2),
+            cols=request.get("cols", 5),
+            spacing=spacing,
+        ))
+    
+    return outputs
 
 
 def create_horizontal_composite(
     image_paths: list[str],
     spacing: int = 5,
     target_height: Optional[int] = None,
-    background_color: tuple[int, int, int] = (255, 255, 255)
+    background_color: tuple[int, int, int] = (255, 255, 255),
+    resample_tier: str = RESAMPLE_QUALITY
 ) -> Optional[str]:
     """
     将多张图片横向排列合成一张图片（兼容旧版）
@@ -119,6 +600,7 @@ def create_horizontal_composite(
         spacing: 图片之间的间距（像素）
         target_height: 目标图片高度，None表示使用原始高度
         background_color: 背景颜色 (R, G, B)
+        resample_tier: 缩放质量档位
         
     Returns:
         合成图片的临时文件路径，如果失败则返回 None
@@ -126,59 +608,19 @@ def create_horizontal_composite(
     if not image_paths:
         return None
     
-    # 加载所有图片
-    images = []
-    for path in image_paths:
-        if path and os.path.exists(path):
-            try:
-                img = PILImage.open(path)
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                images.append(img)
-            except (IOError, OSError):
-                continue
-    
-    if not images:
+    tiles = load_tiles(
+        image_paths, target_height, background_color=background_color, resample_tier=resample_tier
+    )
+    if not tiles:
         return None
     
-    # 统一高度
-    if target_height:
-        max_height = target_height
-    else:
-        max_height = max(img.height for img in images)
-    
-    # 调整所有图片为相同高度
-    resized_images = []
-    for img in images:
-        if img.height != max_height:
-            ratio = max_height / img.height
-            new_width = int(img.width * ratio)
-            img = img.resize((new_width, max_height), PILImage.Resampling.LANCZOS)
-        resized_images.append(img)
-    
-    # 计算总宽度
-    total_width = sum(img.width for img in resized_images) + spacing * (len(resized_images) - 1)
-    
-    # 创建背景图片
-    composite = PILImage.new('RGB', (total_width, max_height), background_color)
-    
-    # 依次粘贴图片
-    x_offset = 0
-    for img in resized_images:
-        if img.mode == 'RGBA':
-            bg = PILImage.new('RGB', img.size, background_color)
-            bg.paste(img, mask=img.split()[3])
-            composite.paste(bg, (x_offset, 0))
-        else:
-            composite.paste(img, (x_offset, 0))
-        x_offset += img.width + spacing
+    # 未指定目标高度时统一缩放到最高图片的高度
+    if not target_height:
+        max_height = max(tile.height for tile in tiles)
+        tiles = [resize_to_height(tile, max_height, resample_tier) for tile in tiles]
     
-    # 保存为临时文件
-    temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-    composite.save(temp_file.name, 'PNG')
-    temp_file.close()
-    
-    return temp_file.name
+    return compose_grid(tiles, rows=1, cols=len(tiles), spacing=spacing,
+                        background_color=background_color, packed=True)
 
 
 def cleanup_temp_file(file_path: Optional[str]) -> bool:
@@ -7,6 +7,8 @@
 from typing import Optional
 
 from .identities import get_rarity_display
+from .leaderboard import BOARD_SSS_COUNT, BOARD_SSS_RATE, BOARD_DROUGHT
+from .collection import SINNER_MASKS, popcount
 
 
 # 稀有度排序权重（用于排序显示）
@@ -75,7 +77,8 @@ def format_ten_pull_result(
     results: list[dict],
     rarity_count: dict[str, int],
     high_star_rarity: str = "SSS",
-    pool_name: Optional[str] = None
+    pool_name: Optional[str] = None,
+    title: str = "边狱巴士十连抽取"
 ) -> str:
     """
     格式化十连抽取结果（精简版）
@@ -87,6 +90,7 @@ def format_ten_pull_result(
         rarity_count: 各稀有度的数量统计
         high_star_rarity: 被视为"高星"的稀有度
         pool_name: 当前卡池名称
+        title: 标题文字（百连等多次十连时使用）
         
     Returns:
         格式化的结果字符串
@@ -95,9 +99,9 @@ def format_ten_pull_result(
     
     # 第一行：标题
     if pool_name:
-        lines.append(f"🎰 边狱巴士十连抽取 🎰\n【{pool_name}】")
+        lines.append(f"🎰 {title} 🎰\n【{pool_name}】")
     else:
-        lines.append("🎰 边狱巴士十连抽取 🎰")
+        lines.append(f"🎰 {title} 🎰")
     
     # 第二行：统计
     lines.append(f"统计：{format_statistics(rarity_count)}")
@@ -126,7 +130,10 @@ def format_unlucky_index(
     message: str,
     pulls_since_sss: int,
     total_pulls: int,
-    sss_rate: float
+    sss_rate: float,
+    rarer_percent: Optional[float] = None,
+    group_percent: Optional[float] = None,
+    server_percent: Optional[float] = None
 ) -> str:
     """
     格式化非酋指数结果
@@ -137,6 +144,9 @@ def format_unlucky_index(
         pulls_since_sss: 距离上次SSS的抽数
         total_pulls: 总抽卡次数
         sss_rate: SSS出率
+        rarer_percent: 按理论概率比多少百分比的玩家更非，None 表示不显示
+        group_percent: 比本群多少百分比的群友更非，None 表示不显示
+        server_percent: 比全服多少百分比的玩家更非，None 表示不显示
         
     Returns:
         格式化的结果字符串
@@ -148,6 +158,14 @@ def format_unlucky_index(
         f"距离上次★★★：{pulls_since_sss}抽",
         f"总计抽卡：{total_pulls}次",
         f"★★★出率：{sss_rate:.2f}%",
+    ]
+    if rarer_percent is not None:
+        lines.append(f"⚖️ 理论上比 {rarer_percent:.2f}% 的玩家更非")
+    if group_percent is not None:
+        lines.append(f"🏅 比本群 {group_percent:.1f}% 的群友更非")
+    if server_percent is not None:
+        lines.append(f"🌐 比全服 {server_percent:.1f}% 的玩家更非")
+    lines += [
         "─" * 18,
         f"💬 {message}"
     ]
@@ -160,7 +178,10 @@ def format_lucky_index(
     sss_count: int,
     window: int,
     total_pulls: int,
-    sss_rate: float
+    sss_rate: float,
+    rarer_percent: Optional[float] = None,
+    group_percent: Optional[float] = None,
+    server_percent: Optional[float] = None
 ) -> str:
     """
     格式化欧皇指数结果
@@ -172,6 +193,9 @@ def format_lucky_index(
         window: 统计窗口大小
         total_pulls: 总抽卡次数
         sss_rate: SSS出率
+        rarer_percent: 按理论概率比多少百分比的玩家更欧，None 表示不显示
+        group_percent: 比本群多少百分比的群友更欧，None 表示不显示
+        server_percent: 比全服多少百分比的玩家更欧，None 表示不显示
         
     Returns:
         格式化的结果字符串
@@ -183,6 +207,14 @@ def format_lucky_index(
         f"最近{window}抽★★★数：{sss_count}个",
         f"总计抽卡：{total_pulls}次",
         f"★★★出率：{sss_rate:.2f}%",
+    ]
+    if rarer_percent is not None:
+        lines.append(f"⚖️ 理论上比 {rarer_percent:.2f}% 的玩家更欧")
+    if group_percent is not None:
+        lines.append(f"🏅 比本群 {group_percent:.1f}% 的群友更欧")
+    if server_percent is not None:
+        lines.append(f"🌐 比全服 {server_percent:.1f}% 的玩家更欧")
+    lines += [
         "─" * 18,
         f"💬 {message}"
     ]
@@ -235,3 +267,341 @@ def format_pool_switch_result(pool_name: str, success: bool, message: str = "")
     if success:
         return f"✅ 已切换到卡池：{pool_name}\n{message}" if message else f"✅ 已切换到卡池：{pool_name}"
     return f"❌ 切换失败：{message}" if message else f"❌ 切换失败：卡池 {pool_name} 不存在"
+
+
+def format_leaderboard(
+    boards: dict[str, list[tuple[str, float]]],
+    user_names: dict[str, str],
+    min_pulls_for_rate: int
+) -> str:
+    """
+    格式化群排行榜
+    
+    Args:
+        boards: {排行类型: [(用户ID, 分数)]}
+        user_names: 用户昵称映射 {user_id: 昵称}
+        min_pulls_for_rate: 参与出率排行所需的最低抽数
+        
+    Returns:
+        格式化的排行榜字符串
+    """
+    sections = [
+        (BOARD_SSS_COUNT, "🌟 ★★★数量榜", "{:.0f}个"),
+        (BOARD_SSS_RATE, f"🍀 ★★★出率榜（≥{min_pulls_for_rate}抽）", "{:.2f}%"),
+        (BOARD_DROUGHT, "💀 当前未出★★★榜", "{:.0f}抽"),
+    ]
+    
+    lines = ["🏆 本群抽卡排行 🏆"]
+    for board_type, title, value_format in sections:
+        lines.append("─" * 18)
+        lines.append(title)
+        entries = boards.get(board_type, [])
+        if not entries:
+            lines.append("  暂无数据")
+            continue
+        for rank, (user_id, score) in enumerate(entries, start=1):
+            name = user_names.get(user_id, user_id)
+            lines.append(f"  {rank}. {name}  {value_format.format(score)}")
+    
+    return "\n".join(lines)
+
+
+def format_status(sections: dict[str, dict]) -> str:
+    """
+    格式化插件运行状态
+    
+    Args:
+        sections: {模块名称: {指标名称: 指标值}}
+        
+    Returns:
+        格式化的状态字符串
+    """
+    lines = ["⚙️ 插件运行状态 ⚙️"]
+    for section_name, metrics in sections.items():
+        lines.append("─" * 18)
+        lines.append(f"【{section_name}】")
+        for metric_name, value in metrics.items():
+            lines.append(f"  {metric_name}：{value}")
+    
+    return "\n".join(lines)
+
+
+def format_server_stats(
+    stats: dict,
+    pool_names: dict[int, str],
+    identities: list[dict],
+    days: int
+) -> str:
+    """
+    格式化全服抽卡统计
+    
+    Args:
+        stats: compute_stats 的统计结果
+        pool_names: 卡池ID到名称的映射
+        identities: 人格列表，人格编号即列表下标
+        days: 统计天数
+        
+    Returns:
+        格式化的统计字符串
+    """
+    lines = [f"🌐 全服抽卡统计（近{days}天） 🌐"]
+    total = stats["total"]
+    if total == 0:
+        lines.append("暂无抽卡记录")
+        return "\n".join(lines)
+    
+    lines.append(f"总抽数：{total}  参与人数：{stats['users']}")
+    
+    lines.append("─" * 18)
+    lines.append("📦 卡池分布")
+    pools = sorted(stats["pools"].items(), key=lambda item: item[1]["total"], reverse=True)
+    for pid, entry in pools:
+        name = pool_names.get(pid, f"已删除卡池({pid:08x})")
+        sss_rate = entry["sss"] / entry["total"] * 100
+        lines.append(f"  {name}：{entry['total']}抽  ★★★ {entry['sss']}个 ({sss_rate:.2f}%)")
+    
+    if stats["top_identities"]:
+        lines.append("─" * 18)
+        lines.append("🔥 最常抽到")
+        for rank, (identity_id, count) in enumerate(stats["top_identities"], start=1):
+            if identity_id < len(identities):
+                identity = identities[identity_id]
+                name = f"[{identity['sinner']}] {identity['name']}"
+            else:
+                name = "未知人格"
+            lines.append(f"  {rank}. {name}  {count}次")
+    
+    hourly = stats["hourly"]
+    peak_hour = max(range(24), key=lambda hour: hourly[hour])
+    lines.append("─" * 18)
+    lines.append(f"⏰ 最活跃时段：{peak_hour:02d}:00-{peak_hour:02d}:59（{hourly[peak_hour]}抽）")
+    
+    return "\n".join(lines)
+
+
+def format_rate_check(checks: list[dict]) -> str:
+    """
+    格式化概率校验结果
+    
+    多个分组的显著性水平 0.01 按分组数分摊（Bonferroni 校正）。
+    
+    Args:
+        checks: [{"label", "observed", "expected", "statistic", "dof", "p_value"}]
+        
+    Returns:
+        格式化的校验结果字符串
+    """
+    lines = ["🔬 出率校验（卡方拟合优度检验） 🔬"]
+    if not checks:
+        lines.append("暂无数据")
+        return "\n".join(lines)
+    threshold = 0.01 / len(checks)
+    for check in checks:
+        observed = check["observed"]
+        total = sum(observed.values())
+        lines.append("─" * 18)
+        lines.append(f"【{check['label']}】样本 {total} 抽")
+        if total == 0:
+            lines.append("  暂无数据")
+            continue
+        
+        for rarity, rate in check["expected"].items():
+            actual = observed.get(rarity, 0) / total
+            lines.append(f"  {get_rarity_display(rarity)}：实际 {actual * 100:.2f}%  配置 {rate * 100:.2f}%")
+        unexpected = observed.get("unknown", 0)
+        if unexpected:
+            lines.append(f"  未知稀有度：{unexpected}次")
+        
+        p_value = check["p_value"]
+        verdict = "⚠️ 显著偏离配置概率" if p_value < threshold else "✅ 与配置概率一致"
+        lines.append(f"  χ²={check['statistic']:.2f}  自由度={check['dof']}  p={p_value:.4f}  {verdict}")
+    
+    return "\n".join(lines)
+
+
+def _format_pull_count(pulls: int, sss: int) -> str:
+    """格式化抽数与★★★数"""
+    if pulls == 0:
+        return "0抽"
+    return f"{pulls}抽  ★★★ {sss}个 ({sss / pulls * 100:.2f}%)"
+
+
+def format_daily_activity(
+    user_today: tuple[int, int],
+    group_today: Optional[tuple[int, int]] = None
+) -> str:
+    """
+    格式化今日抽卡统计
+    
+    Args:
+        user_today: 用户今天的 (抽数, ★★★数)
+        group_today: 本群今天的 (抽数, ★★★数)，私聊时为 None
+        
+    Returns:
+        格式化的统计字符串
+    """
+    lines = ["📅 今日抽卡统计 📅"]
+    pulls, sss = user_today
+    lines.append(f"你的抽数：{_format_pull_count(pulls, sss)}")
+    
+    if group_today is not None:
+        group_pulls, group_sss = group_today
+        lines.append("─" * 18)
+        lines.append(f"本群总抽数：{_format_pull_count(group_pulls, group_sss)}")
+        if group_pulls:
+            lines.append(f"你贡献了本群 {pulls / group_pulls * 100:.1f}% 的抽数")
+    
+    if pulls == 0:
+        lines.append("\n今天还没有抽过卡，快去抽几发吧！")
+    return "\n".join(lines)
+
+
+def format_weekly_activity(
+    user_days: list[tuple[int, int]],
+    group_days: Optional[list[tuple[int, int]]] = None
+) -> str:
+    """
+    格式化本周抽卡统计
+    
+    Args:
+        user_days: 用户本周一至今天每天的 (抽数, ★★★数)
+        group_days: 本群本周一至今天每天的 (抽数, ★★★数)，私聊时为 None
+        
+    Returns:
+        格式化的统计字符串
+    """
+    weekday_names = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+    lines = ["📆 本周抽卡统计 📆"]
+    for name, (pulls, sss) in zip(weekday_names, user_days):
+        lines.append(f"  {name}：{_format_pull_count(pulls, sss)}")
+    
+    total_pulls = sum(pulls for pulls, _ in user_days)
+    total_sss = sum(sss for _, sss in user_days)
+    lines.append("─" * 18)
+    lines.append(f"本周合计：{_format_pull_count(total_pulls, total_sss)}")
+    
+    if group_days is not None:
+        group_pulls = sum(pulls for pulls, _ in group_days)
+        group_sss = sum(sss for _, sss in group_days)
+        lines.append(f"本群本周：{_format_pull_count(group_pulls, group_sss)}")
+    return "\n".join(lines)
+
+
+def _format_size(size: int) -> str:
+    """格式化文件大小"""
+    if size < 1024:
+        return f"{size}B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f}KB"
+    return f"{size / 1024 / 1024:.1f}MB"
+
+
+def format_export_summary(summary: dict) -> str:
+    """
+    格式化抽卡记录导出结果
+    
+    Args:
+        summary: export_user_pulls 返回的汇总
+        
+    Returns:
+        格式化的结果字符串
+    """
+    lines = ["📤 抽卡记录导出 📤"]
+    total = summary["total"]
+    lines.append(f"记录范围：{summary['first_time']} ~ {summary['last_time']}")
+    lines.append(f"总抽数：{_format_pull_count(total, summary['rarity'].get('SSS', 0))}")
+    lines.append(f"最长连续未出★★★：{summary['longest_drought']}抽")
+    lines.append("─" * 18)
+    if summary["truncated"]:
+        lines.append(f"⚠️ 超出文件大小上限，已导出前 {summary['exported']}/{total} 条记录（文件末尾的汇总覆盖全部记录）")
+    else:
+        lines.append(f"已导出全部 {total} 条记录")
+    lines.append(f"文件大小：{_format_size(summary['bytes'])}（gzip 压缩）")
+    return "\n".join(lines)
+
+
+def format_collection(
+    user_collection,
+    identities: list[dict],
+    pool_name: str,
+    progress: tuple[int, int],
+    expected_remaining: float,
+    sinner: Optional[str] = None,
+    top_dups: int = 5
+) -> str:
+    """
+    格式化人格图鉴
+    
+    Args:
+        user_collection: 用户的收集记录（UserCollection）
+        identities: 人格列表，人格编号即列表下标
+        pool_name: 当前卡池名称
+        progress: 当前卡池的 (已收集数, 卡池人格总数)
+        expected_remaining: 集齐当前卡池还需的期望抽数
+        sinner: 只查看该罪人的人格，None 表示查看总览
+        top_dups: 显示重复次数最多的前几个人格
+        
+    Returns:
+        格式化的图鉴字符串
+    """
+    owned = user_collection.owned
+    dups = user_collection.dups
+    
+    if sinner is not None:
+        mask = SINNER_MASKS.get(sinner, 0)
+        lines = [f"📖 {sinner} 的人格图鉴 📖"]
+        lines.append(f"已收集：{popcount(owned & mask)}/{popcount(mask)}")
+        lines.append("─" * 18)
+        for identity_id, identity in enumerate(identities):
+            if not mask >> identity_id & 1:
+                continue
+            if owned >> identity_id & 1:
+                dup_text = f"  重复×{dups[identity_id]}" if dups[identity_id] else ""
+                lines.append(f"✅ {get_rarity_display(identity['rarity'])} {identity['name']}{dup_text}")
+            else:
+                lines.append(f"❌ {get_rarity_display(identity['rarity'])} {identity['name']}")
+        return "\n".join(lines)
+    
+    lines = ["📖 人格图鉴 📖"]
+    lines.append(f"总进度：{popcount(owned)}/{len(identities)}")
+    
+    rarity_totals: dict[str, list[int]] = {}
+    for identity_id, identity in enumerate(identities):
+        entry = rarity_totals.setdefault(identity["rarity"], [0, 0])
+        entry[0] += owned >> identity_id & 1
+        entry[1] += 1
+    lines.append("  ".join(
+        f"{get_rarity_display(rarity)} {got}/{total}" for rarity, (got, total) in rarity_totals.items()
+    ))
+    
+    lines.append("─" * 18)
+    lines.append("👥 罪人完成度")
+    for name, mask in SINNER_MASKS.items():
+        got, total = popcount(owned & mask), popcount(mask)
+        mark = " 🏅" if total and got == total else ""
+        lines.append(f"  {name}：{got}/{total}{mark}")
+    
+    ranked = sorted(
+        (identity_id for identity_id in range(len(identities)) if dups[identity_id]),
+        key=lambda identity_id: dups[identity_id],
+        reverse=True
+    )[:top_dups]
+    if ranked:
+        lines.append("─" * 18)
+        lines.append("🔁 重复最多")
+        for identity_id in ranked:
+            identity = identities[identity_id]
+            lines.append(f"  [{identity['sinner']}] {identity['name']}  重复×{dups[identity_id]}")
+    
+    lines.append("─" * 18)
+    got, total = progress
+    lines.append(f"🎯 当前卡池【{pool_name}】：{got}/{total}")
+    if got >= total:
+        lines.append("  已全部集齐！")
+    elif expected_remaining == float("inf"):
+        lines.append("  当前概率配置下无法集齐")
+    else:
+        lines.append(f"  集齐预计还需约 {expected_remaining:.0f} 抽")
+    lines.append("💡 /tq图鉴 罪人名 查看单个罪人的人格")
+    
+    return "\n".join(lines)
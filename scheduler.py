@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+优先级通道调度模块
+
+将插件内的工作分为两条通道：
+- 快速通道：指数查询、卡池列表等纯文字指令，在事件循环中直接完成；
+- 渲染通道：合成图、图片转码、统计扫描等重型工作，在通道专属的线程池中执行。
+
+每条通道有独立的并发上限与等待队列，并分别统计等待时间。渲染通道的线程数受限，
+重型工作不会占满默认线程池或与事件循环争抢 GIL，文字指令在渲染高峰期间也能即时响应。
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+
+# 通道名称
+LANE_FAST = "fast"
+LANE_RENDER = "render"
+
+LANE_NAMES = {
+    LANE_FAST: "快速通道",
+    LANE_RENDER: "渲染通道",
+}
+
+
+class Lane:
+    """单条通道：并发上限、等待队列与等待时间统计"""
+
+    def __init__(self, name: str, concurrency: int, workers: int = 0, sample_size: int = 1024):
+        """
+        初始化通道
+
+        Args:
+            name: 通道名称
+            concurrency: 同时执行的任务数上限
+            workers: 通道专属线程池的线程数，0 表示阻塞任务使用默认线程池
+            sample_size: 计算等待时间分位数时保留的最近样本数
+        """
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.executor: Optional[ThreadPoolExecutor] = None
+        if workers > 0:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"limbus-{name}")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # 指标
+        self.running = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent_waits: deque[float] = deque(maxlen=sample_size)
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个执行名额，名额不足时排队等待"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        enqueued_at = time.perf_counter()
+        if self._semaphore.locked():
+            # 名额已满，进入等待队列
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        wait = time.perf_counter() - enqueued_at
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._recent_waits.append(wait)
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def shutdown(self) -> None:
+        """关闭通道专属线程池"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取通道指标
+
+        Returns:
+            指标字典
+        """
+        recent = sorted(self._recent_waits)
+        p95 = recent[int(len(recent) * 0.95)] if len(recent) >= 20 else (recent[-1] if recent else 0.0)
+        avg_wait = self.total_wait / self.completed * 1000 if self.completed else 0
+        return {
+            "执行中/上限": f"{self.running}/{self.concurrency}",
+            "排队": self.waiting,
+            "峰值排队": self.peak_waiting,
+            "完成": self.completed,
+            "平均等待(ms)": round(avg_wait, 2),
+            "P95等待(ms)": round(p95 * 1000, 2),
+            "最大等待(ms)": round(self.max_wait * 1000, 2),
+        }
+
+
+class LaneScheduler:
+    """快速通道与渲染通道的调度器"""
+
+    def __init__(self, fast_concurrency: int = 32, render_concurrency: int = 3):
+        """
+        初始化调度器
+
+        Args:
+            fast_concurrency: 快速通道的并发上限
+            render_concurrency: 渲染通道的并发上限（同时也是其线程池的线程数）
+        """
+        self.lanes = {
+            LANE_FAST: Lane(LANE_FAST, fast_concurrency),
+            LANE_RENDER: Lane(LANE_RENDER, render_concurrency, workers=render_concurrency),
+        }
+
+    def lane(self, name: str):
+        """
+        占用指定通道的一个执行名额
+
+        用法：async with scheduler.lane(LANE_FAST): ...
+
+        Args:
+            name: 通道名称
+        """
+        return self.lanes[name].slot()
+
+    async def run(self, name: str, func: Callable, *args):
+        """
+        在指定通道中执行阻塞函数
+
+        Args:
+            name: 通道名称，未配专属线程池的通道使用默认线程池
+            func: 阻塞函数
+            *args: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        lane = self.lanes[name]
+        async with lane.slot():
+            return await asyncio.get_running_loop().run_in_executor(lane.executor, func, *args)
+
+    def shutdown(self) -> None:
+        """关闭各通道的线程池（插件卸载时调用）"""
+        for lane in self.lanes.values():
+            lane.shutdown()
+
+    def get_metrics(self) -> dict[str, dict[str, float]]:
+        """
+        获取各通道指标
+
+        Returns:
+            {通道显示名称: 指标字典}
+        """
+        return {LANE_NAMES[name]: lane.get_metrics() for name, lane in self.lanes.items()}
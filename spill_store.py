@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+冷用户溢出存储模块
+
+将长时间不活跃的用户抽卡记录以紧凑的二进制格式写入磁盘，
+在用户下次使用指令时再读回内存。
+
+溢出存储只是内存的延伸而非持久化：每次启动清空，写入不同步落盘，
+写操作在同一事务中累积，由调用方在每轮淘汰结束时统一提交。
+"""
+import sqlite3
+import struct
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+# 稀有度编码（每条历史记录占 1 字节）
+RARITY_CODES = {
+    "unknown": 0,
+    "S": 1,
+    "SS": 2,
+    "SSS": 3,
+}
+CODE_RARITIES = {code: rarity for rarity, code in RARITY_CODES.items()}
+
+# 记录头：总抽数、000总数、距离上次000的抽数、其中保底抽取的次数、历史长度
+_HEADER = struct.Struct("<IIIII")
+
+
+def _mask_bytes(mask: int, bits: int) -> bytes:
+    """将保底位图编码为 ceil(bits / 8) 个字节（小端）"""
+    return mask.to_bytes((bits + 7) // 8, "little")
+
+
+def encode_user(
+    history: list[str],
+    total_pulls: int,
+    sss_count: int,
+    pulls_since_sss: int,
+    pity_since_sss: int,
+    recent_pity: int
+) -> bytes:
+    """
+    将用户记录编码为紧凑的二进制格式（记录头、每条历史1字节、按历史长度对齐的保底位图）
+
+    Args:
+        history: 稀有度历史列表
+        total_pulls: 总抽数
+        sss_count: 000总数
+        pulls_since_sss: 距离上次000的抽数
+        pity_since_sss: 距离上次000的抽数中保底抽取的次数
+        recent_pity: 最近各抽是否为保底抽取的位图（第0位为最近一抽）
+
+    Returns:
+        编码后的字节串
+    """
+    body = bytes(RARITY_CODES.get(rarity, 0) for rarity in history)
+    header = _HEADER.pack(total_pulls, sss_count, pulls_since_sss, pity_since_sss, len(history))
+    return header + body + _mask_bytes(recent_pity, len(history))
+
+
+def decode_user(data: bytes) -> tuple[list[str], int, int, int, int, int]:
+    """
+    解码用户记录
+
+    Args:
+        data: encode_user 生成的字节串
+
+    Returns:
+        (稀有度历史列表, 总抽数, 000总数, 距离上次000的抽数, 其中保底抽取的次数, 保底位图)
+    """
+    total_pulls, sss_count, pulls_since_sss, pity_since_sss, length = _HEADER.unpack_from(data)
+    body = data[_HEADER.size:_HEADER.size + length]
+    history = [CODE_RARITIES.get(code, "unknown") for code in body]
+    recent_pity = int.from_bytes(data[_HEADER.size + length:], "little")
+    return history, total_pulls, sss_count, pulls_since_sss, pity_since_sss, recent_pity
+
+
+# 计数器模式记录：种子、已抽次数、总抽数、000总数、距离上次000的抽数、其中保底抽取的次数、概率纪元分段数，
+# 之后为各分段的 (起始序号, 纪元) 与保底位图
+_COUNTER_RECORD = struct.Struct("<QQIIIIH")
+_EPOCH_SEGMENT = struct.Struct("<QI")
+
+
+def encode_counter_user(
+    seed: int,
+    count: int,
+    epochs: list[tuple[int, int]],
+    total_pulls: int,
+    sss_count: int,
+    pulls_since_sss: int,
+    pity_since_sss: int,
+    recent_pity: int
+) -> bytes:
+    """
+    将计数器模式的用户记录编码为二进制格式
+
+    Args:
+        seed: 用户种子
+        count: 已抽次数（下一抽的序号）
+        epochs: 概率纪元分段 [(起始序号, 纪元)]
+        total_pulls: 总抽数
+        sss_count: 000总数
+        pulls_since_sss: 距离上次000的抽数
+        pity_since_sss: 距离上次000的抽数中保底抽取的次数
+        recent_pity: 最近各抽是否为保底抽取的位图（第0位为最近一抽）
+
+    Returns:
+        编码后的字节串
+    """
+    header = _COUNTER_RECORD.pack(
+        seed, count, total_pulls, sss_count, pulls_since_sss, pity_since_sss, len(epochs)
+    )
+    segments = b"".join(_EPOCH_SEGMENT.pack(start, epoch) for start, epoch in epochs)
+    return header + segments + _mask_bytes(recent_pity, recent_pity.bit_length())
+
+
+def decode_counter_user(data: bytes) -> tuple[int, int, list[tuple[int, int]], int, int, int, int, int]:
+    """
+    解码计数器模式的用户记录
+
+    Args:
+        data: encode_counter_user 生成的字节串
+
+    Returns:
+        (种子, 已抽次数, 概率纪元分段, 总抽数, 000总数, 距离上次000的抽数, 其中保底抽取的次数, 保底位图)
+    """
+    seed, count, total_pulls, sss_count, pulls_since_sss, pity_since_sss, segment_count = (
+        _COUNTER_RECORD.unpack_from(data)
+    )
+    offset = _COUNTER_RECORD.size
+    epochs = [
+        _EPOCH_SEGMENT.unpack_from(data, offset + i * _EPOCH_SEGMENT.size) for i in range(segment_count)
+    ]
+    recent_pity = int.from_bytes(data[offset + segment_count * _EPOCH_SEGMENT.size:], "little")
+    return seed, count, epochs, total_pulls, sss_count, pulls_since_sss, pity_since_sss, recent_pity
+
+
+class SpillStore:
+    """基于 SQLite 的冷用户溢出存储"""
+
+    def __init__(self, db_path: Path):
+        """
+        初始化溢出存储
+
+        每次启动都会清空旧数据，行为与纯内存存储保持一致。
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(str(db_path))
+        # 溢出数据每次启动都会清空，无需为崩溃一致性付出同步写盘的代价
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.execute("DROP TABLE IF EXISTS spill")
+        # data 为 encode_user / encode_counter_user 的结果，groups 为换行分隔的群ID，collection 为图鉴记录，
+        # name 为用户昵称，activity 为按日活跃度计数
+        self._conn.execute(
+            "CREATE TABLE spill (user_id TEXT PRIMARY KEY, data BLOB NOT NULL, "
+            "groups TEXT NOT NULL DEFAULT '', collection BLOB, name TEXT NOT NULL DEFAULT '', activity BLOB)"
+        )
+        self._conn.commit()
+        # 已溢出的用户ID（表在启动时清空，集合即为完整索引），未溢出的用户无需查询数据库
+        self._user_ids: set[str] = set()
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._user_ids
+
+    def put(
+        self,
+        user_id: str,
+        data: bytes,
+        groups: Iterable[str] = (),
+        collection: Optional[bytes] = None,
+        name: str = "",
+        activity: Optional[bytes] = None
+    ) -> None:
+        """
+        写入用户记录（调用 commit 后提交）
+
+        Args:
+            user_id: 用户ID
+            data: 编码后的用户记录
+            groups: 用户参与过的群ID
+            collection: 编码后的图鉴记录，没有时为 None
+            name: 用户昵称
+            activity: 编码后的按日活跃度计数，没有时为 None
+        """
+        self._conn.execute(
+            "INSERT OR REPLACE INTO spill (user_id, data, groups, collection, name, activity) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, data, "\n".join(groups), collection, name, activity),
+        )
+        self._user_ids.add(user_id)
+
+    def pop(
+        self,
+        user_id: str
+    ) -> Optional[tuple[bytes, list[str], Optional[bytes], str, Optional[bytes]]]:
+        """
+        读取并删除用户记录（删除在调用 commit 后提交）
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            (编码后的用户记录, 参与过的群ID列表, 编码后的图鉴记录, 用户昵称, 编码后的活跃度计数)，
+            不存在时返回 None
+        """
+        if user_id not in self._user_ids:
+            return None
+        row = self._conn.execute(
+            "SELECT data, groups, collection, name, activity FROM spill WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        self._conn.execute("DELETE FROM spill WHERE user_id = ?", (user_id,))
+        self._user_ids.discard(user_id)
+        if row is None:
+            return None
+        data, groups, collection, name, activity = row
+        return (
+            bytes(data),
+            groups.split("\n") if groups else [],
+            bytes(collection) if collection else None,
+            name,
+            bytes(activity) if activity else None,
+        )
+
+    def names(self, user_ids: Iterable[str]) -> dict[str, str]:
+        """
+        查询已溢出用户的昵称（不载入用户记录）
+
+        Args:
+            user_ids: 用户ID
+
+        Returns:
+            {用户ID: 昵称}，只包含已溢出且有昵称的用户
+        """
+        spilled = [user_id for user_id in user_ids if user_id in self._user_ids]
+        if not spilled:
+            return {}
+        placeholders = ",".join("?" * len(spilled))
+        rows = self._conn.execute(
+            f"SELECT user_id, name FROM spill WHERE user_id IN ({placeholders}) AND name != ''", spilled
+        ).fetchall()
+        return dict(rows)
+
+    def delete(self, user_id: str) -> None:
+        """
+        删除用户记录（调用 commit 后提交）
+
+        Args:
+            user_id: 用户ID
+        """
+        if user_id in self._user_ids:
+            self._conn.execute("DELETE FROM spill WHERE user_id = ?", (user_id,))
+            self._user_ids.discard(user_id)
+
+    def commit(self) -> None:
+        """提交累积的写操作"""
+        if self._conn.in_transaction:
+            self._conn.commit()
+
+    def count(self) -> int:
+        """
+        获取已溢出的用户数
+
+        Returns:
+            用户数
+        """
+        return len(self._user_ids)
+
+    def close(self) -> None:
+        """提交未完成的写操作并关闭存储"""
+        self.commit()
+        self._conn.close()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+抽卡限流模块
+
+按用户与按群分别维护令牌桶，令牌耗尽的请求在抽取与渲染之前即被拒绝。
+同一个桶在连续被拒期间只提示一次，避免刷屏时提示消息本身也刷屏。
+"""
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+# 拒绝原因
+SCOPE_USER = "user"
+SCOPE_GROUP = "group"
+
+
+class TokenBuckets:
+    """容量受限的令牌桶集合，按最近使用顺序淘汰不活跃的桶"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        """
+        初始化令牌桶集合
+
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量（允许的突发请求数）
+            max_keys: 最多同时跟踪的桶数量
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # 桶状态：{key: [令牌数, 上次补充时间, 本轮是否已提示]}
+        self._buckets: OrderedDict[str, list] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _refill(self, key: str, now: float) -> list:
+        """补充令牌并返回桶状态，不存在时创建满桶"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now, False]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def peek(self, key: str, cost: float, now: float) -> float:
+        """
+        查询令牌是否足够
+
+        Args:
+            key: 桶标识
+            cost: 需要的令牌数
+            now: 当前时间
+
+        Returns:
+            还需等待的秒数，0 表示令牌足够
+        """
+        tokens = self._refill(key, now)[0]
+        cost = min(cost, self.burst)
+        if tokens >= cost:
+            return 0.0
+        return (cost - tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def consume(self, key: str, cost: float) -> None:
+        """
+        扣除令牌（调用前应先用 peek 确认令牌足够）
+
+        Args:
+            key: 桶标识
+            cost: 扣除的令牌数
+        """
+        bucket = self._buckets[key]
+        bucket[0] -= min(cost, self.burst)
+        bucket[2] = False
+
+    def mark_notified(self, key: str) -> bool:
+        """
+        标记本轮拒绝已提示
+
+        Args:
+            key: 桶标识
+
+        Returns:
+            本轮是否为首次拒绝（需要发送提示）
+        """
+        bucket = self._buckets[key]
+        first = not bucket[2]
+        bucket[2] = True
+        return first
+
+
+class Throttler:
+    """按用户与按群的抽卡限流器"""
+
+    def __init__(
+        self,
+        user_rate: float = 0.5,
+        user_burst: float = 5,
+        group_rate: float = 3,
+        group_burst: float = 20,
+        max_keys: int = 10000
+    ):
+        """
+        初始化限流器
+
+        Args:
+            user_rate: 每位用户每秒补充的令牌数
+            user_burst: 每位用户的桶容量
+            group_rate: 每个群每秒补充的令牌数
+            group_burst: 每个群的桶容量
+            max_keys: 每类桶最多跟踪的数量
+        """
+        self.user_buckets = TokenBuckets(user_rate, user_burst, max_keys)
+        self.group_buckets = TokenBuckets(group_rate, group_burst, max_keys)
+
+        # 指标
+        self.allowed_count = 0
+        self.rejected = {SCOPE_USER: 0, SCOPE_GROUP: 0}
+        self.notice_count = 0
+
+    def acquire(
+        self,
+        user_id: str,
+        group_id: Optional[str],
+        cost: float = 1
+    ) -> tuple[bool, Optional[str], float]:
+        """
+        尝试为一次请求获取令牌，用户桶与群桶都足够时才同时扣除
+
+        Args:
+            user_id: 用户ID
+            group_id: 群ID，私聊时为 None
+            cost: 本次请求消耗的令牌数
+
+        Returns:
+            (是否放行, 被拒绝时需要发送提示的范围, 预计需要等待的秒数)，
+            同一桶连续被拒时只有第一次返回提示范围，其余为 None
+        """
+        now = time.monotonic()
+        checks = [(SCOPE_USER, self.user_buckets, user_id)]
+        if group_id:
+            checks.append((SCOPE_GROUP, self.group_buckets, group_id))
+
+        for scope, buckets, key in checks:
+            wait = buckets.peek(key, cost, now)
+            if wait > 0:
+                self.rejected[scope] += 1
+                if buckets.mark_notified(key):
+                    self.notice_count += 1
+                    return False, scope, wait
+                return False, None, wait
+
+        for _, buckets, key in checks:
+            buckets.consume(key, cost)
+        self.allowed_count += 1
+        return True, None, 0.0
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取限流指标
+
+        Returns:
+            指标字典
+        """
+        return {
+            "放行": self.allowed_count,
+            "用户限流": self.rejected[SCOPE_USER],
+            "群限流": self.rejected[SCOPE_GROUP],
+            "提示消息": self.notice_count,
+            "跟踪用户/群": f"{len(self.user_buckets)}/{len(self.group_buckets)}",
+        }
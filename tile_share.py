@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+跨进程共享图块模块
+
+同一台机器上运行多个 AstrBot 进程时，每个进程都会各自解码、缩放同一批人格图片。
+这里把十连布局的全部图块以原始像素写入一个共享文件，各进程只读 mmap 映射后直接引用其中的像素，
+图块占用的内存由操作系统页缓存共享，不再随进程数增长。
+
+文件头记录格式版本与指纹（图片文件名、大小、修改时间以及目标高度、缩放档位），
+指纹不一致或文件损坏时视为过期，由发现过期的进程重新发布；发布时先写临时文件再原子替换，
+已映射旧文件的进程不受影响。
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+
+from PIL import Image as PILImage
+
+
+# 文件格式：魔数、格式版本、指纹、目标高度、图块数、索引偏移
+MAGIC = b"LTSH"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sH32sIIQ")
+# 索引项：数据偏移、宽、高、图片名长度，其后紧跟 UTF-8 图片名
+INDEX_ENTRY = struct.Struct("<QIIH")
+
+# 共享图块以 RGBX 存储，PIL 可以零拷贝地直接引用映射内存
+TILE_MODE = "RGBX"
+TILE_BYTES_PER_PIXEL = 4
+
+
+def tiles_fingerprint(
+    images_dir: Path,
+    image_names: list[str],
+    target_height: Optional[int],
+    resample_tier: str,
+    asset_pack=None
+) -> bytes:
+    """
+    计算图块集合的指纹，图片或布局任一变化都会得到不同的指纹
+
+    Args:
+        images_dir: 图片目录
+        image_names: 图片文件名列表（相对图片目录）
+        target_height: 目标图片高度
+        resample_tier: 缩放质量档位
+        asset_pack: 图片资源包（AssetPack），包含的图片使用其内容哈希
+
+    Returns:
+        32 字节指纹
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(f"{FORMAT_VERSION}\x1f{target_height}\x1f{resample_tier}".encode("utf-8"))
+    for image_name in dict.fromkeys(image_names):
+        packed_hash = asset_pack.content_hash(str(images_dir / image_name)) if asset_pack is not None else None
+        if packed_hash is not None:
+            digest.update(f"\x1e{image_name}\x1fpack:{packed_hash}".encode("utf-8"))
+            continue
+        try:
+            stat = os.stat(images_dir / image_name)
+            signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            signature = "missing"
+        digest.update(f"\x1e{image_name}\x1f{signature}".encode("utf-8"))
+    return digest.digest()
+
+
+class SharedTileSet:
+    """只读映射的共享图块集合"""
+
+    def __init__(self, mapped: mmap.mmap, tiles: dict[str, PILImage.Image], target_height: Optional[int]):
+        """
+        初始化共享图块集合，应通过 attach 创建
+
+        Args:
+            mapped: 只读内存映射
+            tiles: {图片路径: 引用映射内存的图块}
+            target_height: 图块的目标高度
+        """
+        self._mapped = mapped
+        self._tiles = tiles
+        self.target_height = target_height
+        self.size_bytes = len(mapped)
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    @classmethod
+    def attach(cls, path: Path, images_dir: Path, fingerprint: bytes) -> Optional["SharedTileSet"]:
+        """
+        只读映射共享图块文件
+
+        Args:
+            path: 共享文件路径
+            images_dir: 本进程的图片目录，图块按其中的完整路径索引
+            fingerprint: 期望的指纹
+
+        Returns:
+            共享图块集合，文件不存在、已过期或损坏时返回 None
+        """
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        tiles = cls._read_index(mapped, images_dir, fingerprint)
+        if tiles is None:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+            return None
+        target_height = HEADER.unpack_from(mapped, 0)[3]
+        return cls(mapped, tiles, target_height or None)
+
+    @staticmethod
+    def _read_index(
+        mapped: mmap.mmap,
+        images_dir: Path,
+        fingerprint: bytes
+    ) -> Optional[dict[str, PILImage.Image]]:
+        """校验文件头并读取索引，任何不一致都返回 None"""
+        size = len(mapped)
+        if size < HEADER.size:
+            return None
+        magic, version, file_fingerprint, _, count, index_offset = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or file_fingerprint != fingerprint:
+            return None
+
+        tiles = {}
+        view = memoryview(mapped)
+        position = index_offset
+        for _ in range(count):
+            if position + INDEX_ENTRY.size > size:
+                return None
+            offset, width, height, name_length = INDEX_ENTRY.unpack_from(mapped, position)
+            position += INDEX_ENTRY.size
+            end = offset + width * height * TILE_BYTES_PER_PIXEL
+            if position + name_length > size or end > index_offset:
+                return None
+            image_name = bytes(mapped[position:position + name_length]).decode("utf-8")
+            position += name_length
+            tiles[str(images_dir / image_name)] = PILImage.frombuffer(
+                TILE_MODE, (width, height), view[offset:end], "raw", TILE_MODE, 0, 1
+            )
+        return tiles
+
+    def get(self, path: str) -> Optional[PILImage.Image]:
+        """
+        获取共享图块
+
+        Args:
+            path: 图片路径
+
+        Returns:
+            图块，不在共享集合中时返回 None
+        """
+        return self._tiles.get(path)
+
+
+def publish_tiles(
+    path: Path,
+    images_dir: Path,
+    image_names: list[str],
+    target_height: Optional[int],
+    fingerprint: bytes,
+    load: Callable[[str, Optional[int]], Optional[PILImage.Image]]
+) -> int:
+    """
+    生成共享图块文件，先写入同目录的临时文件再原子替换
+
+    Args:
+        path: 共享文件路径
+        images_dir: 图片目录
+        image_names: 图片文件名列表（相对图片目录）
+        target_height: 目标图片高度
+        fingerprint: 图块集合的指纹
+        load: 加载单个图块的函数，参数为 (图片路径, 目标高度)
+
+    Returns:
+        写入的图块数
+
+    Raises:
+        OSError: 写入或替换文件失败
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(bytes(HEADER.size))
+            index = []
+            offset = HEADER.size
+            for image_name in dict.fromkeys(image_names):
+                tile = load(str(images_dir / image_name), target_height)
+                if tile is None:
+                    continue
+                data = tile.convert(TILE_MODE).tobytes()
+                f.write(data)
+                index.append((offset, tile.width, tile.height, image_name.encode("utf-8")))
+                offset += len(data)
+
+            for entry_offset, width, height, encoded_name in index:
+                f.write(INDEX_ENTRY.pack(entry_offset, width, height, len(encoded_name)))
+                f.write(encoded_name)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, fingerprint, target_height or 0, len(index), offset))
+        # mkstemp 创建的文件仅所有者可读，放宽为其他进程也可只读映射
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return len(index)
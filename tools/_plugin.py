@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+工具脚本公共模块
+
+插件模块之间使用相对导入，这里将插件目录作为包导入，供 tools/ 下的脚本复用。
+"""
+import importlib
+import sys
+from pathlib import Path
+
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_plugin_module(name: str):
+    """
+    导入插件中的模块
+
+    Args:
+        name: 模块名，如 "render_image"
+
+    Returns:
+        模块对象
+    """
+    parent = str(PLUGIN_DIR.parent)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+    return importlib.import_module(f"{PLUGIN_DIR.name}.{name}")
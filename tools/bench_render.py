@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+网格合成基准测试
+
+比较 create_grid_composite 在缓存未命中路径下串行解码与并行解码的耗时。
+
+用法：
+    python tools/bench_render.py --tiles 10 --rounds 20 --workers 4
+"""
+import argparse
+import random
+import statistics
+import time
+
+from _plugin import PLUGIN_DIR, import_plugin_module
+
+
+def bench(render_image, image_paths: list[str], rows: int, cols: int, rounds: int, workers: int) -> tuple[list[float], list[float]]:
+    """
+    执行若干轮测试
+
+    Returns:
+        (仅解码缩放耗时列表, 完整合成耗时列表)，单位毫秒
+    """
+    decode_timings = []
+    total_timings = []
+    for _ in range(rounds):
+        started_at = time.perf_counter()
+        render_image.load_tiles(image_paths, 120, decode_workers=workers)
+        decode_timings.append((time.perf_counter() - started_at) * 1000)
+
+        started_at = time.perf_counter()
+        path = render_image.create_grid_composite(
+            image_paths, rows=rows, cols=cols, target_height=120, decode_workers=workers
+        )
+        total_timings.append((time.perf_counter() - started_at) * 1000)
+        render_image.cleanup_temp_file(path)
+    return decode_timings, total_timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网格合成串行/并行解码基准")
+    parser.add_argument("--tiles", type=int, default=10, help="每张合成图的图块数量")
+    parser.add_argument("--cols", type=int, default=5, help="每行列数")
+    parser.add_argument("--rounds", type=int, default=20, help="测试轮数")
+    parser.add_argument("--workers", type=int, default=4, help="并行解码线程数")
+    args = parser.parse_args()
+
+    identities = import_plugin_module("identities")
+    render_image = import_plugin_module("render_image")
+
+    images_dir = PLUGIN_DIR / identities.IMAGES_DIR
+    all_paths = [str(images_dir / identity["image"]) for identity in identities.IDENTITIES]
+    rng = random.Random(0)
+    image_paths = [rng.choice(all_paths) for _ in range(args.tiles)]
+    rows = (args.tiles + args.cols - 1) // args.cols
+
+    # 预先跑一轮，排除首次导入解码器的开销
+    bench(render_image, image_paths, rows, args.cols, 1, 0)
+
+    print(f"图块={args.tiles} 轮数={args.rounds}（中位数，单位ms）")
+    for label, workers in (("串行", 0), (f"并行{args.workers}线程", args.workers)):
+        decode_timings, total_timings = bench(render_image, image_paths, rows, args.cols, args.rounds, workers)
+        print(
+            f"{label}: 解码缩放={statistics.median(decode_timings):.2f} "
+            f"完整合成={statistics.median(total_timings):.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+缩放质量档位基准测试
+
+对全部人格图片分别使用各缩放档位生成图块，统计耗时，
+并以 quality 档为基准计算其他档位的 PSNR。
+
+用法：
+    python tools/bench_resample.py --height 120
+    python tools/bench_resample.py --height 120 --source-scale 8   # 模拟大尺寸源图
+"""
+import argparse
+import math
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image as PILImage, ImageChops, ImageStat
+
+from _plugin import PLUGIN_DIR, import_plugin_module
+
+
+def psnr(reference: PILImage.Image, candidate: PILImage.Image) -> float:
+    """计算两张RGB图片的 PSNR（dB），尺寸不同时先对齐到参考图"""
+    if candidate.size != reference.size:
+        candidate = candidate.resize(reference.size, PILImage.Resampling.BILINEAR)
+    diff = ImageChops.difference(reference, candidate)
+    mse = sum(ImageStat.Stat(diff).sum2) / (reference.width * reference.height * 3)
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255 ** 2 / mse)
+
+
+def prepare_sources(image_paths: list[str], scale: int, temp_dir: Path) -> list[str]:
+    """将源图放大 scale 倍另存为 JPEG，用于模拟远大于图块的源图"""
+    if scale <= 1:
+        return image_paths
+    sources = []
+    for idx, path in enumerate(image_paths):
+        img = PILImage.open(path).convert('RGB')
+        img = img.resize((img.width * scale, img.height * scale), PILImage.Resampling.BICUBIC)
+        target = temp_dir / f"{idx}.jpg"
+        img.save(target, 'JPEG', quality=90)
+        sources.append(str(target))
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缩放质量档位耗时与 PSNR 对比")
+    parser.add_argument("--height", type=int, default=120, help="目标图块高度")
+    parser.add_argument("--source-scale", type=int, default=1, help="源图放大倍数（模拟大尺寸源图）")
+    args = parser.parse_args()
+
+    identities = import_plugin_module("identities")
+    render_image = import_plugin_module("render_image")
+
+    images_dir = PLUGIN_DIR / identities.IMAGES_DIR
+    image_paths = sorted({
+        str(images_dir / identity["image"])
+        for identity in identities.IDENTITIES
+        if (images_dir / identity["image"]).exists()
+    })
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sources = prepare_sources(image_paths, args.source_scale, Path(temp_dir))
+        tiers = [render_image.RESAMPLE_QUALITY, render_image.RESAMPLE_FAST]
+        tiles: dict[str, list] = {}
+
+        print(f"图片数={len(sources)} 目标高度={args.height} 源图放大={args.source_scale}x")
+        for tier in tiers:
+            started_at = time.perf_counter()
+            tiles[tier] = [render_image.load_tile(path, args.height, resample_tier=tier) for path in sources]
+            elapsed = (time.perf_counter() - started_at) * 1000
+
+            if tier == render_image.RESAMPLE_QUALITY:
+                print(f"{tier:<8} 总耗时={elapsed:8.1f}ms 单张={elapsed / len(sources):6.2f}ms (PSNR 基准)")
+                continue
+
+            scores = [
+                psnr(reference, candidate)
+                for reference, candidate in zip(tiles[render_image.RESAMPLE_QUALITY], tiles[tier])
+                if reference is not None and candidate is not None
+            ]
+            finite = [score for score in scores if math.isfinite(score)]
+            mean_psnr = sum(finite) / len(finite) if finite else math.inf
+            min_psnr = min(scores) if scores else math.inf
+            print(
+                f"{tier:<8} 总耗时={elapsed:8.1f}ms 单张={elapsed / len(sources):6.2f}ms "
+                f"平均PSNR={mean_psnr:6.2f}dB 最低PSNR={min_psnr:6.2f}dB"
+            )
+
+
+if __name__ == "__main__":
+    main()
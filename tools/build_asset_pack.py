@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+图片资源包生成工具
+
+将 identities.py 引用的全部人格图片（以及默认占位图片）按原始编码打包为单个文件，
+生成后重新映射并逐条校验内容哈希。
+
+用法：
+    python tools/build_asset_pack.py
+    python tools/build_asset_pack.py --output /path/to/images.pack
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from _plugin import PLUGIN_DIR, import_plugin_module
+
+
+def main():
+    asset_pack = import_plugin_module("asset_pack")
+    identities = import_plugin_module("identities")
+
+    parser = argparse.ArgumentParser(description="生成图片资源包")
+    parser.add_argument(
+        "--output", type=Path, default=PLUGIN_DIR / asset_pack.DEFAULT_PACK_NAME, help="资源包输出路径"
+    )
+    args = parser.parse_args()
+
+    images_dir = PLUGIN_DIR / identities.IMAGES_DIR
+    image_names = [identity["image"] for identity in identities.IDENTITIES]
+    if (images_dir / identities.DEFAULT_IMAGE).exists():
+        image_names.append(identities.DEFAULT_IMAGE)
+
+    started_at = time.perf_counter()
+    count, missing = asset_pack.build_pack(images_dir, image_names, args.output)
+    elapsed = time.perf_counter() - started_at
+    size = args.output.stat().st_size
+    print(f"已打包 {count} 张图片 → {args.output}（{size / 1024 / 1024:.1f}MB，耗时 {elapsed * 1000:.0f}ms）")
+    for image_name in missing:
+        print(f"  缺失：{image_name}")
+
+    pack = asset_pack.AssetPack.open(args.output, images_dir)
+    if pack is None:
+        print("资源包无法映射")
+        sys.exit(1)
+    corrupt = pack.verify()
+    for path in corrupt:
+        print(f"  哈希不一致：{path}")
+    print("校验通过" if not corrupt else f"{len(corrupt)} 张图片校验失败")
+    sys.exit(1 if corrupt else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+计数器随机数等价性检查
+
+1. 用 Random123 公布的已知答案向量校验 Philox4x32-10 实现；
+2. 分别用 GachaCore.determine_rarity 与计数器模式大量抽取，
+   对普通/保底抽取的稀有度分布做卡方拟合优度检验（对照 effective_rates）与同质性检验（两种模式互相对照）；
+3. 计数器模式下记录抽卡后，校验 LuckTracker 重新生成的历史与实际抽取结果逐条一致。
+
+用法：
+    python tools/check_counter_rng.py --samples 200000
+"""
+import argparse
+import random
+import sys
+from collections import Counter
+
+import yaml
+
+from _plugin import PLUGIN_DIR, import_plugin_module
+
+
+# Random123 philox4x32_10 已知答案向量：(计数器, 密钥, 期望输出)
+KNOWN_ANSWERS = [
+    ((0, 0, 0, 0), (0, 0), (0x6627E8D5, 0xE169C58D, 0xBC57AC4C, 0x9B00DBD8)),
+    ((0xFFFFFFFF,) * 4, (0xFFFFFFFF,) * 2, (0x408F276D, 0x41C83B0E, 0xA20BC7C6, 0x6D5451FD)),
+    (
+        (0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344),
+        (0xA4093822, 0x299F31D0),
+        (0xD16CFE09, 0x94FDCCEB, 0x5001E420, 0x24126EA1),
+    ),
+]
+
+# 判定显著偏离的 p 值阈值
+ALPHA = 0.001
+
+
+def load_core(gacha_core):
+    """按 config.yaml 创建抽卡引擎"""
+    with open(PLUGIN_DIR / "config.yaml", "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    pity_config = config.get("pity", {})
+    return gacha_core.GachaCore(
+        rarity_rates=config["rarity_rates"],
+        pity_rates=pity_config.get("pity_rates"),
+        pity_enabled=pity_config.get("enabled", True),
+        pity_guarantee_rarity=pity_config.get("guarantee_rarity", "SS"),
+    )
+
+
+def homogeneity_test(rate_check, first: Counter, second: Counter) -> float:
+    """两组稀有度计数的卡方同质性检验，返回 p 值"""
+    categories = sorted(set(first) | set(second))
+    total_first = sum(first.values())
+    total_second = sum(second.values())
+    total = total_first + total_second
+    statistic = 0.0
+    for category in categories:
+        column = first[category] + second[category]
+        for observed, row_total in ((first[category], total_first), (second[category], total_second)):
+            expected = column * row_total / total
+            statistic += (observed - expected) ** 2 / expected
+    return rate_check.chi_square_sf(statistic, len(categories) - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="计数器随机数与 determine_rarity 的等价性检查")
+    parser.add_argument("--samples", type=int, default=200000, help="每种抽取方式的样本数")
+    parser.add_argument("--seed", type=int, default=20240601, help="随机种子")
+    args = parser.parse_args()
+
+    counter_rng = import_plugin_module("counter_rng")
+    gacha_core = import_plugin_module("gacha_core")
+    rate_check = import_plugin_module("rate_check")
+    core = load_core(gacha_core)
+    failures = 0
+
+    for counter, key, expected in KNOWN_ANSWERS:
+        ok = counter_rng.philox4x32(counter, key) == expected
+        failures += not ok
+        print(f"已知答案向量 {key[0]:08x}/{counter[0]:08x}: {'通过' if ok else '失败'}")
+
+    random.seed(args.seed)
+    rng_seed = random.getrandbits(64)
+    for label, is_pity in (("普通抽取", False), ("保底抽取", True)):
+        baseline = Counter(core.determine_rarity(is_pity) for _ in range(args.samples))
+        counter_samples = Counter(
+            core.rarity_from_uniform(counter_rng.uniform_pair(rng_seed, index)[0] * 100, is_pity)
+            for index in range(args.samples)
+        )
+        expected_rates = core.effective_rates(is_pity)
+        _, _, p_baseline = rate_check.chi_square_test(baseline, expected_rates)
+        _, _, p_counter = rate_check.chi_square_test(counter_samples, expected_rates)
+        p_same = homogeneity_test(rate_check, baseline, counter_samples)
+        failures += p_counter < ALPHA or p_same < ALPHA
+        print(f"【{label}】期望分布 {', '.join(f'{k}={v:.4f}' for k, v in expected_rates.items())}")
+        print(f"  determine_rarity 拟合 p={p_baseline:.4f}  计数器拟合 p={p_counter:.4f}  两者同质 p={p_same:.4f}")
+
+    tracker = gacha_core.LuckTracker(max_history=500, rarity_at=core.rarity_at)
+    pool = [{"rarity": rarity, "name": rarity} for rarity in core.rarity_order]
+    drawn = []
+    for _ in range(50):
+        seed, start = tracker.get_counter_state("audit")
+        results = [core.draw_counter(pool, seed, start + i) for i in range(10)]
+        tracker.record_pulls("audit", results)
+        drawn.extend(result["rarity"] for result in results)
+    regenerated = tracker.user_history["audit"][:]
+    ok = regenerated == drawn and tracker.get_total_pulls("audit") == len(drawn)
+    failures += not ok
+    print(f"历史重新生成 {len(drawn)} 抽：{'一致' if ok else '不一致'}")
+
+    print("全部通过" if failures == 0 else f"{failures} 项检查失败")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+媒体引用缓存检查
+
+用本地的假适配器代替真实平台，模拟大量单抽请求：
+1. 统计上传次数与命中率（约 160 张图片，命中率应接近 100%）；
+2. 随机让部分发送失败，校验失败的引用被作废并重新上传；
+3. 校验并发请求同一图片时只上传一次、有效期到期与超出容量时的淘汰行为。
+
+用法：
+    python tools/check_media_cache.py --pulls 20000
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+from _plugin import import_plugin_module
+
+media_cache_module = import_plugin_module("media_cache")
+
+
+class FakeUploader(media_cache_module.MediaUploader):
+    """假适配器：记录上传次数，返回递增的文件ID"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.uploads = 0
+        self.valid: set[str] = set()
+
+    async def upload(self, path: str) -> str:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.uploads += 1
+        handle = f"fake-file-{self.uploads}"
+        self.valid.add(handle)
+        return handle
+
+    def expire(self, handle: str) -> None:
+        """模拟平台侧引用失效"""
+        self.valid.discard(handle)
+
+
+async def simulate(media_cache, identities, platform, uploader, pulls, failure_rate):
+    """模拟单抽：按引用发送，失败时作废并重新上传"""
+    failures = 0
+    for _ in range(pulls):
+        image_name = random.choice(identities)["image"]
+        handle = await media_cache.resolve(platform, image_name, image_name)
+        if random.random() < failure_rate:
+            uploader.expire(handle)
+        if handle not in uploader.valid:
+            failures += 1
+            media_cache.invalidate(platform, image_name)
+            handle = await media_cache.resolve(platform, image_name, image_name)
+        assert handle in uploader.valid
+    return failures
+
+
+async def check_concurrency():
+    """并发请求同一图片时只上传一次"""
+    uploader = FakeUploader(delay=0.05)
+    cache = media_cache_module.MediaHandleCache()
+    cache.register("fake", uploader)
+    handles = await asyncio.gather(*(cache.resolve("fake", "same", "same.webp") for _ in range(20)))
+    return uploader.uploads == 1 and len(set(handles)) == 1
+
+
+async def check_expiry():
+    """有效期到期后重新上传，超出容量时淘汰最久未使用的引用"""
+    uploader = FakeUploader()
+    cache = media_cache_module.MediaHandleCache(max_entries=2, ttl=0.05)
+    cache.register("fake", uploader)
+    await cache.resolve("fake", "a", "a.webp")
+    await asyncio.sleep(0.1)
+    await cache.resolve("fake", "a", "a.webp")
+    expired_ok = uploader.uploads == 2
+
+    await cache.resolve("fake", "b", "b.webp")
+    await cache.resolve("fake", "a", "a.webp")
+    await cache.resolve("fake", "c", "c.webp")
+    before = uploader.uploads
+    await cache.resolve("fake", "a", "a.webp")
+    await cache.resolve("fake", "b", "b.webp")
+    evicted_ok = uploader.uploads == before + 1
+    return expired_ok and evicted_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单抽媒体引用缓存检查")
+    parser.add_argument("--pulls", type=int, default=20000, help="模拟的单抽次数")
+    parser.add_argument("--failure-rate", type=float, default=0.001, help="引用发送失败的比例")
+    parser.add_argument("--seed", type=int, default=20240601, help="随机种子")
+    args = parser.parse_args()
+
+    identities = import_plugin_module("identities").IDENTITIES
+    random.seed(args.seed)
+    failed = 0
+
+    uploader = FakeUploader()
+    media_cache = media_cache_module.MediaHandleCache(ttl=86400)
+    media_cache.register("fake", uploader)
+    failures = asyncio.run(
+        simulate(media_cache, identities, "fake", uploader, args.pulls, args.failure_rate)
+    )
+    images = len({identity["image"] for identity in identities})
+    hit_rate = media_cache.hits / (media_cache.hits + media_cache.misses)
+    print(f"单抽 {args.pulls} 次，图片 {images} 张：上传 {uploader.uploads} 次，"
+          f"发送失败 {failures} 次，命中率 {hit_rate * 100:.2f}%")
+    ok = uploader.uploads == images + failures and media_cache.invalidated == failures
+    failed += not ok
+    print(f"  上传次数 = 图片数 + 失败重传：{'通过' if ok else '失败'}")
+
+    ok = media_cache.supports("fake") and not media_cache.supports("other")
+    failed += not ok
+    print(f"未注册适配器不使用缓存：{'通过' if ok else '失败'}")
+
+    ok = asyncio.run(check_concurrency())
+    failed += not ok
+    print(f"并发请求只上传一次：{'通过' if ok else '失败'}")
+
+    ok = asyncio.run(check_expiry())
+    failed += not ok
+    print(f"有效期与容量淘汰：{'通过' if ok else '失败'}")
+
+    print("全部通过" if failed == 0 else f"{failed} 项检查失败")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
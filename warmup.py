@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+资源预热模块
+
+插件启动后在后台校验全部人格图片，并按十连布局预先解码、缩放，
+填充渲染用的图块缓存，避免重启后的首次十连承担全部冷启动开销。
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import Optional
+
+from .render_image import TileCache
+from .scheduler import LaneScheduler, LANE_RENDER
+
+
+# 预热状态
+WARMUP_PENDING = "未开始"
+WARMUP_RUNNING = "进行中"
+WARMUP_DONE = "已完成"
+
+
+class AssetWarmup:
+    """后台资源预热任务"""
+
+    def __init__(
+        self,
+        images_dir: Path,
+        tile_cache: TileCache,
+        target_height: Optional[int],
+        scheduler: Optional[LaneScheduler] = None
+    ):
+        """
+        初始化预热任务
+
+        Args:
+            images_dir: 图片目录
+            tile_cache: 需要预先填充的图块缓存
+            target_height: 十连布局的目标图片高度
+            scheduler: 通道调度器，None 表示在默认线程池中处理
+        """
+        self.images_dir = images_dir
+        self.tile_cache = tile_cache
+        self.target_height = target_height
+        self.scheduler = scheduler
+
+        self.state = WARMUP_PENDING
+        self.total = 0
+        self.processed = 0
+        self.missing: list[str] = []
+        self.corrupt: list[str] = []
+        self.elapsed = 0.0
+        self.slowest: tuple[str, float] = ("", 0.0)
+
+    async def run(self, image_names: list[str]) -> None:
+        """
+        逐张校验并预热图片，每张图片在线程池中处理，不阻塞事件循环
+
+        Args:
+            image_names: identities.py 中的 image 字段列表
+        """
+        loop = asyncio.get_running_loop()
+        unique_names = list(dict.fromkeys(image_names))
+        self.state = WARMUP_RUNNING
+        self.total = len(unique_names)
+        started_at = time.perf_counter()
+
+        for image_name in unique_names:
+            path = self.images_dir / image_name
+            if not path.exists() and not self._in_pack(path):
+                self.missing.append(image_name)
+            else:
+                tile_started_at = time.perf_counter()
+                if self.scheduler is not None:
+                    tile = await self.scheduler.run(
+                        LANE_RENDER, self.tile_cache.get_or_load, str(path), self.target_height
+                    )
+                else:
+                    tile = await loop.run_in_executor(
+                        None, self.tile_cache.get_or_load, str(path), self.target_height
+                    )
+                cost = time.perf_counter() - tile_started_at
+                if tile is None:
+                    self.corrupt.append(image_name)
+                elif cost > self.slowest[1]:
+                    self.slowest = (image_name, cost)
+            self.processed += 1
+
+        self.elapsed = time.perf_counter() - started_at
+        self.state = WARMUP_DONE
+
+    def _in_pack(self, path: Path) -> bool:
+        """图片是否包含在图块缓存使用的资源包中"""
+        asset_pack = self.tile_cache.asset_pack
+        return asset_pack is not None and str(path) in asset_pack
+
+    def format_report(self) -> str:
+        """
+        生成预热报告
+
+        Returns:
+            报告文本
+        """
+        lines = [
+            f"资源预热完成：{self.total}张图片，耗时{self.elapsed * 1000:.0f}ms，"
+            f"缺失{len(self.missing)}张，损坏{len(self.corrupt)}张"
+        ]
+        if self.slowest[0]:
+            lines.append(f"最慢：{self.slowest[0]} ({self.slowest[1] * 1000:.1f}ms)")
+        if self.missing:
+            lines.append(f"缺失文件：{', '.join(self.missing)}")
+        if self.corrupt:
+            lines.append(f"无法解码：{', '.join(self.corrupt)}")
+        return "\n".join(lines)
+
+    def get_metrics(self) -> dict[str, float]:
+        """
+        获取预热进度
+
+        Returns:
+            指标字典
+        """
+        return {
+            "状态": self.state,
+            "进度": f"{self.processed}/{self.total}",
+            "缺失": len(self.missing),
+            "损坏": len(self.corrupt),
+            "耗时(ms)": round(self.elapsed * 1000),
+        }